@@ -0,0 +1,21 @@
+# ASGI deployment: gunicorn managing uvicorn workers.
+#   gunicorn -c gunicorn_asgi.conf.py ticketanywhere.asgi:application
+# Single process equivalent for development:
+#   uvicorn ticketanywhere.asgi:application --host 0.0.0.0 --port 8000
+# ticketanywhere.asgi turns on ASYNC_VIEWS, so catalog reads and auth endpoints run on the event loop and
+# slow clients only cost an idle coroutine instead of a whole worker. Persistent connections are off
+# under ASGI (every request runs in a new thread), set DB_POOL=True with psycopg 3 to reuse connections,
+# and point CACHE_* at Redis so the workers share the catalog cache and throttles.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+# one event loop per core is enough, each worker serves many connections at once
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 20
+keepalive = 5
+# recycle workers now and then to bound memory growth
+max_requests = 10000
+max_requests_jitter = 1000
@@ -10,10 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram lookups for event search
     'ticketapp',
     'rest_framework',
     'rest_framework.authtoken',
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ticketapp.metrics.instrument',  # first, so it times everything below (ticketapp/metrics.py)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ticketapp.routers.primary_for_writes',
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -79,20 +84,73 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ticketanywhere.wsgi.application'
 
+# Serve the catalog reads and auth endpoints with the async views (ticketapp/async_views.py).
+# ticketanywhere/asgi.py turns this on, under WSGI the sync DRF views are faster.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are reused between requests: DB_POOL=True uses Django's connection pool, which needs the
+# psycopg 3 driver and psycopg_pool (pip install "psycopg[binary,pool]", in requirements.txt), otherwise each
+# worker thread keeps its connection for DB_CONN_MAX_AGE seconds. Persistent connections are off by default
+# under ASGI, where every request runs in a new thread, use the pool there.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+if DB_POOL:
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('DB_POOL=True needs the psycopg 3 driver and its pool: pip install "psycopg[binary,pool]".')
+
+def database(prefix, **defaults):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv(f"{prefix}_NAME", defaults.get('NAME')),
+        'USER': os.getenv(f"{prefix}_USER", defaults.get('USER')),
+        'PASSWORD': os.getenv(f"{prefix}_PASSWORD", defaults.get('PASSWORD')),
+        'HOST': os.getenv(f"{prefix}_HOST", defaults.get('HOST')),
+        'PORT': os.getenv(f"{prefix}_PORT", defaults.get('PORT')),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': True,  # a reused connection that went away is replaced instead of failing the request
+        # how close a misspelt word must be to a word of an event name for ?search= (ticketapp/search.py), 0.5 by default
+        'OPTIONS': {'options': f"-c pg_trgm.word_similarity_threshold={os.getenv('SEARCH_TYPO_THRESHOLD', '0.5')}"},
+    }
+    if DB_POOL:
+        config['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    return config
+
 DATABASES = {
+    'default': database('DB'),
+}
+# Optional read replica (DB_REPLICA_HOST, other DB_REPLICA_* default to the primary's), used by
+# ticketapp.routers.ReplicaRouter for catalog reads and admin reporting. In tests it mirrors default.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = database('DB_REPLICA', **{key: DATABASES['default'][key] for key in ('NAME', 'USER', 'PASSWORD', 'PORT')})
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['ticketapp.routers.ReplicaRouter']
+# catalog models written less than this many seconds ago are read from the primary, covering replica lag
+REPLICA_LAG_SECONDS = int(os.getenv('REPLICA_LAG_SECONDS', 5))
+
+# Cache
+# locmem is per process, point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis) when running several workers
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv("DB_NAME"),
-        'USER': os.getenv("DB_USER"),
-        'PASSWORD': os.getenv("DB_PASSWORD"),
-        'HOST': os.getenv("DB_HOST"),
-        'PORT': os.getenv("DB_PORT"),
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'ticketanywhere'),
     }
 }
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))  # seconds, entries are also invalidated on every change
+# web worker processes (gunicorn reads the same variable): with more than one, `manage.py check` refuses a locmem
+# cache, whose catalog versions would only be bumped in the worker (or management command) that wrote
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -112,6 +170,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing policy (ticketapp/passwords.py). PASSWORD_HASHER hashes new passwords, the others only check
+# existing hashes; a login with a hash of another hasher or cost is rehashed with the policy in the background.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')  # pbkdf2, scrypt or argon2 (pip install argon2-cffi)
+PASSWORD_HASHER_PATHS = {
+    'pbkdf2': 'ticketapp.passwords.PBKDF2PasswordHasher',
+    'scrypt': 'ticketapp.passwords.ScryptPasswordHasher',
+    'argon2': 'ticketapp.passwords.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_PATHS[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_PATHS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 1_000_000))  # Django's default
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+# OWASP's argon2id minimum; one lane per hash, the hashing pool already runs logins side by side
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_KIB = int(os.getenv('PASSWORD_ARGON2_MEMORY_KIB', 19456))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 1))
+# Threads hashing login passwords per process (set it to cores / processes with several workers), and logins
+# that may wait for one before the rest are answered 503
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
+LOGIN_CACHE_SECONDS = int(os.getenv('LOGIN_CACHE_SECONDS', 300))  # a repeated login with the same password skips the hash, 0 to disable
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -129,6 +212,23 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files. Images (ticketapp/images.py) go to the 'images' storage: the local filesystem under
+# MEDIA_ROOT unless IMAGE_STORAGE_BACKEND names another Django storage class (with IMAGE_STORAGE_OPTIONS as JSON)
+MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'images': {
+        'BACKEND': os.getenv('IMAGE_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage'),
+        'OPTIONS': json.loads(os.getenv('IMAGE_STORAGE_OPTIONS', '{}')),
+    },
+}
+SERVE_MEDIA = os.getenv('SERVE_MEDIA', str(DEBUG)) == 'True'  # Django serves MEDIA_URL itself, for want of a web server
+# Processes resizing uploaded images, and the largest upload accepted
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 1))
+IMAGE_MAX_UPLOAD_MB = int(os.getenv('IMAGE_MAX_UPLOAD_MB', 20))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -139,9 +239,29 @@ AUTH_USER_MODEL = 'ticketapp.Customer'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication', 
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'ticketapp.authentication.ClaimsJWTAuthentication',  # JWTAuthentication without the per-request user query
     ),
     'DEFAULT_PERMISSION_CLASSES': [],  # Changed from IsAuthenticated to allow views to control permissions
+    # JSONRenderer that counts its time in the request metrics (ticketapp/metrics.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'ticketapp.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # Cursor (keyset) pagination for all list endpoints, clients may ask for ?page_size= up to MAX_PAGE_SIZE
+    'DEFAULT_PAGINATION_CLASS': 'ticketapp.pagination.DefaultCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
+    'MAX_PAGE_SIZE': int(os.getenv('API_MAX_PAGE_SIZE', 500)),
+    # Auth endpoint throttles (ticketapp/throttles.py), per client IP and per email address
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': os.getenv('THROTTLE_LOGIN_EMAIL', '10/min'),
+        'otp_send_ip': os.getenv('THROTTLE_OTP_SEND_IP', '20/hour'),
+        'otp_send_email': os.getenv('THROTTLE_OTP_SEND_EMAIL', '5/hour'),
+        'otp_verify_ip': os.getenv('THROTTLE_OTP_VERIFY_IP', '60/hour'),
+        'otp_verify_email': os.getenv('THROTTLE_OTP_VERIFY_EMAIL', '10/hour'),
+    },
+    # number of reverse proxies in front of the app, used to read the client IP from X-Forwarded-For
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
 SIMPLE_JWT = {
@@ -149,7 +269,11 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(minutes=3),
     'ROTATE_REFRESH_TOKENS' : True,
     'BLACKLIST_AFTER_ROTATION' : True,
+    'TOKEN_USER_CLASS': 'ticketapp.authentication.ClaimsUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'ticketapp.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'ticketapp.authentication.CheckedTokenRefreshSerializer',
 }
+AUTH_TOKEN_VERSION_CACHE_SECONDS = int(os.getenv('AUTH_TOKEN_VERSION_CACHE_SECONDS', 60))
 
 LOGIN_REDIRECT_URL = '/api/' 
 
@@ -158,4 +282,45 @@ EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER') 
-EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  
\ No newline at end of file
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+# Outbox: views only queue emails, `python manage.py send_queued_mail` delivers them
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+EMAIL_OUTBOX_CLAIM_SECONDS = int(os.getenv('EMAIL_OUTBOX_CLAIM_SECONDS', 300))  # claimed mail a crashed dispatcher never reported on is retried after this
+
+SEAT_HOLD_TTL_SECONDS = int(os.getenv('SEAT_HOLD_TTL_SECONDS', 600))  # how long a held seat is reserved before checkout
+
+BULK_TICKET_MAX_BATCH = int(os.getenv('BULK_TICKET_MAX_BATCH', 5000))  # items per /api/tickets/bulk/ request
+
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', 600))  # 10 minutes
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', 5))  # wrong guesses before the code stops working
+
+CHECKOUT_MAX_TICKETS = int(os.getenv('CHECKOUT_MAX_TICKETS', 20))  # tickets per /api/orders/checkout/ request
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))  # how long a checkout can be replayed
+
+# Change feed (/api/sync/, ticketapp/sync.py): rows per resource and response, how far back each sync looks
+# again for writes committed late (longer transactions than this, or clocks further apart, can be missed), and
+# how long deletions are remembered: a client that last synced before that starts over
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 60))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 30))
+
+# Request metrics (ticketapp/metrics.py): the share of requests that also get a query and serializer breakdown,
+# a Server-Timing header and a log line, the time above which a request is always logged (ms), and the bearer
+# token Prometheus sends to /metrics (staff sessions can read it without one)
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.1))
+METRICS_SLOW_MS = int(os.getenv('METRICS_SLOW_MS', 1000))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# One JSON line per sampled (INFO) or slow (WARNING) request on stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'ticketapp.requests': {'handlers': ['console'], 'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'), 'propagate': False},
+    },
+}
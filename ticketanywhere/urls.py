@@ -14,9 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path,include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from ticketapp.metrics import metrics_view
+from ticketapp.images import media_view
 
 
 urlpatterns = [
@@ -27,4 +30,10 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     # Built-in login
     path('api-auth/', include('rest_framework.urls')),
+    # Request histograms in Prometheus text format (ticketapp/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if settings.SERVE_MEDIA:
+    # Uploaded images, with their immutable Cache-Control (a web server in front should serve MEDIA_ROOT instead)
+    urlpatterns.append(path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", media_view, name='media'))
@@ -1,9 +1,79 @@
-from django.contrib import admin
-from .models import Banner, Category, Event, Customer, Order, Ticket
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect, render
+from django.urls import path
+from .imports import FORMATS, ImportFileError, file_format, import_tickets
+from .models import Banner, Category, Event, Customer, Order, Ticket, OutboundEmail, Zone, Seat, EventSalesSummary
 
 admin.site.register(Banner)
 admin.site.register(Category)
 admin.site.register(Event)
 admin.site.register(Customer)
-admin.site.register(Order)
-admin.site.register(Ticket)
+admin.site.register(Zone)
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_select_related = ('customer',)  # Order.__str__ shows the customer
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    # bodies carry one-time and reset codes until sent: staff see the delivery state, never the text
+    exclude = ('body',)
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(Seat)
+class SeatAdmin(admin.ModelAdmin):
+    list_display = ('zone', 'row', 'number', 'status', 'hold_expires_at')
+    list_filter = ('status',)
+    list_select_related = ('zone__event',)
+
+@admin.register(EventSalesSummary)
+class EventSalesSummaryAdmin(admin.ModelAdmin):
+    list_display = ('event', 'status', 'ticket_count', 'revenue', 'updated_at')
+    list_select_related = ('event',)
+
+class TicketImportForm(forms.Form):
+    file = forms.FileField(help_text=f"{' or '.join(FORMATS).upper()}, columns as in the tickets export, matched on event and member_code.")
+    event = forms.ModelChoiceField(Event.objects.all(), required=False, help_text="For rows without an event column.")
+    dry_run = forms.BooleanField(required=False, help_text="Check the file and report errors without saving.")
+
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/ticketapp/ticket/change_list.html'
+    # error lines listed on the page, the counts cover all of them
+    MAX_ERRORS_SHOWN = 200
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='ticketapp_ticket_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a spreadsheet of allocations, see ticketapp.imports."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = TicketImportForm(request.POST or None, request.FILES or None)
+        report = None
+        if request.method == 'POST' and form.is_valid():
+            upload, event = form.cleaned_data['file'], form.cleaned_data['event']
+            try:
+                report = import_tickets(upload, file_format(upload.name), event=event.pk if event else None, dry_run=form.cleaned_data['dry_run'])
+            except ImportFileError as exc:
+                form.add_error('file', str(exc))
+            else:
+                summary = f"{report['created']} created, {report['updated']} updated, {report['unchanged']} unchanged, {len(report['errors'])} rows with errors."
+                if not report['errors'] and not form.cleaned_data['dry_run']:
+                    self.message_user(request, summary, messages.SUCCESS)
+                    return redirect('admin:ticketapp_ticket_changelist')
+                self.message_user(request, summary, messages.WARNING if report['errors'] else messages.INFO)
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta, title='Import tickets', form=form,
+            errors=sorted(report['errors'].items())[:self.MAX_ERRORS_SHOWN] if report else [],
+        )
+        return render(request, 'admin/ticketapp/ticket/import.html', context)
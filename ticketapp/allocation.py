@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict, deque
+from datetime import date
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .inventory import free_seats_q
+from .models import Seat, Ticket
+from .parsing import parse_date
+
+# Ballot allocation. Pending tickets without a zone are ranked by priority_date (earliest first, unreadable or
+# missing dates last, ties by id) and each gets its first, second or third preference zone that still has room.
+# Zones with a seat map give out their free seats in seat map order, so the winner also gets a seat; zones
+# without one take an explicit capacity. Everything is decided in memory, then written CHUNK_SIZE tickets at a
+# time in ranking order, each chunk in its own transaction. A run that stops half way leaves a prefix of the
+# ranking allocated, and running it again finishes with the same result.
+PREFERENCES = ('fst_pt', 'snd_pt', 'trd_pt')
+CHUNK_SIZE = 2000
+WAITING = Q(status='Pending') & (Q(zone__isnull=True) | Q(zone=''))  # tickets the allocation is for
+
+
+class AllocationError(Exception):
+    pass
+
+
+class AllocationConflict(AllocationError):
+    """Tickets or seats changed under a write. The chunks before it are saved, running again continues."""
+
+
+class Pool:
+    """Room left in one zone: its free seats in seat map order, or a count for a zone without a seat map."""
+    __slots__ = ('name', 'seats', 'left')
+
+    def __init__(self, name, seats=None, left=0):
+        self.name = name
+        self.seats = seats
+        self.left = len(seats) if seats is not None else left
+
+    def take(self):
+        self.left -= 1
+        return self.seats.popleft() if self.seats is not None else None
+
+
+def zone_key(name):
+    return name.strip().casefold() if name else ''
+
+
+def pools(event, capacity=None):
+    """zone key -> Pool. capacity gives {zone name: tickets} for zones without a seat map."""
+    free = defaultdict(deque)
+    seats = (
+        Seat.objects.filter(free_seats_q(), event=event)
+        .order_by('id')
+        .values_list('id', 'zone__name', 'row', 'number')
+    )
+    for seat_id, zone, row, number in seats.iterator(chunk_size=CHUNK_SIZE):
+        free[zone].append((seat_id, row, number))
+    result = {zone_key(zone): Pool(zone, queue) for zone, queue in free.items()}
+    seated = {zone_key(name) for name in event.zones.values_list('name', flat=True)}
+    for name, total in (capacity or {}).items():
+        if zone_key(name) in seated:
+            raise AllocationError(f"{name} has a seat map, its capacity is its free seats.")
+        # tickets already in the zone (from an earlier run or sold by hand) use up its capacity
+        taken = Ticket.objects.filter(event=event, zone=name).exclude(status='Cancelled').count()
+        result[zone_key(name)] = Pool(name, left=max(total - taken, 0))
+    return result
+
+
+def ranking(event):
+    """(ticket id, preferences) of the tickets waiting for a zone, in allocation order."""
+    dates = {}  # priority dates repeat a lot, parse each distinct one once
+    def rank(row):
+        text = row[1]
+        if text not in dates:
+            dates[text] = parse_date(text) or date.max
+        return dates[text], row[0]
+    rows = list(Ticket.objects.filter(WAITING, event=event).values_list('id', 'priority_date', *PREFERENCES).iterator(chunk_size=CHUNK_SIZE))
+    rows.sort(key=rank)
+    return [(row[0], row[2:]) for row in rows]
+
+
+def allocate(event, capacity=None, dry_run=False):
+    """
+    Allocate zones (and seats) to the event's pending tickets. Returns a report; with dry_run nothing is written.
+    Raises AllocationError for a capacity given to a seat map zone, AllocationConflict when rows changed under a write.
+    """
+    zones = pools(event, capacity)
+    applicants = ranking(event)
+    assignments = []  # (ticket id, zone name, seat or None), in ranking order
+    choices, per_zone = Counter(), Counter()
+    for ticket_id, preferences in applicants:
+        for choice, preference in enumerate(preferences, 1):
+            pool = zones.get(zone_key(preference))
+            if pool is not None and pool.left > 0:
+                assignments.append((ticket_id, pool.name, pool.take()))
+                choices[choice] += 1
+                per_zone[pool.name] += 1
+                break
+    if not dry_run:
+        for start in range(0, len(assignments), CHUNK_SIZE):
+            write(assignments[start:start + CHUNK_SIZE])
+    return {
+        'applicants': len(applicants),
+        'allocated': len(assignments),
+        'unallocated': len(applicants) - len(assignments),
+        'by_preference': {name: choices[choice] for choice, name in enumerate(PREFERENCES, 1)},
+        'zones': {pool.name: {'allocated': per_zone[pool.name], 'left': pool.left} for pool in zones.values()},
+        'dry_run': dry_run,
+    }
+
+
+@transaction.atomic
+def write(assignments):
+    ticket_ids = [ticket_id for ticket_id, _, _ in assignments]
+    seat_ids = [seat[0] for _, _, seat in assignments if seat is not None]
+    # the rows must still be as they were read: the ticket waiting for a zone, the seat free
+    if len(Ticket.objects.select_for_update().filter(WAITING, id__in=ticket_ids).values_list('id')) != len(ticket_ids):
+        raise AllocationConflict("Tickets changed while allocating, run the allocation again to continue.")
+    if len(Seat.objects.select_for_update().filter(free_seats_q(), id__in=seat_ids).values_list('id')) != len(seat_ids):
+        raise AllocationConflict("Seats were taken while allocating, run the allocation again to continue.")
+    now = timezone.now()
+    update_rows(Ticket, ['zone', 'row', 'seat', 'updated_at'], [
+        (ticket_id, zone) + ((seat[1], seat[2]) if seat is not None else (None, None)) + (now,)
+        for ticket_id, zone, seat in assignments
+    ])
+    update_rows(Seat, ['status', 'ticket', 'held_by', 'hold_expires_at'], [
+        (seat[0], Seat.STATUS_SOLD, ticket_id, None, None)
+        for ticket_id, _, seat in assignments if seat is not None
+    ])
+
+
+def update_rows(model, fields, rows):
+    """
+    Set fields to different values per row, rows being (pk, value, ...). bulk_update builds a CASE WHEN per field
+    and row, which costs several times more Python than the database spends on it; on PostgreSQL a single
+    UPDATE ... FROM (VALUES ...) does the same.
+    """
+    if not rows:
+        return
+    meta = model._meta
+    columns = [meta.pk] + [meta.get_field(name) for name in fields]
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql':
+        objs = [model(**{field.attname: value for field, value in zip(columns, row)}) for row in rows]
+        model.objects.bulk_update(objs, fields, batch_size=500)
+        return
+    quote = connection.ops.quote_name
+    row_sql = '(' + ', '.join(f'%s::{field.db_type(connection)}' for field in columns) + ')'
+    aliases = ', '.join(f'c{index}' for index in range(len(columns)))
+    sets = ', '.join(f'{quote(field.column)} = v.c{index}' for index, field in enumerate(columns) if index)
+    table = quote(meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {sets} FROM (VALUES {", ".join([row_sql] * len(rows))}) AS v({aliases}) '
+            f'WHERE {table}.{quote(meta.pk.column)} = v.c0',
+            [field.get_db_prep_save(value, connection) for row in rows for field, value in zip(columns, row)],
+        )
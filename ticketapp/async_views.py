@@ -0,0 +1,207 @@
+import json
+import math
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from .authentication import tokens_for
+from .cache import acached_response
+from .outbox import aqueue_mail
+from .passwords import PasswordHashingBusy, acheck_password
+from .serializers import CustomerSerializer, OTPVerificationSerializer, ResendOTPSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
+from .throttles import LoginIPThrottle, LoginEmailThrottle, OTPSendIPThrottle, OTPSendEmailThrottle, OTPVerifyIPThrottle, OTPVerifyEmailThrottle
+
+Customer = get_user_model()
+
+# Async versions of the public catalog reads and the auth flows, routed instead of the DRF views
+# when ASYNC_VIEWS is on (the default under ticketanywhere.asgi). Database calls use the async ORM,
+# mail goes to the outbox with one INSERT, and password hashing runs in a worker thread so it never
+# blocks the event loop. Responses and throttles are the same as the DRF views in views.py.
+
+
+def catalog_view(viewset, actions):
+    """
+    GET/HEAD served from the catalog cache (or answered 304) on the event loop. Cache misses, writes and
+    browsable API requests go to the DRF viewset in a thread, which also fills the cache.
+    """
+    drf_view = sync_to_async(viewset.as_view(actions))
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and 'format' not in request.GET and 'text/html' not in request.headers.get('Accept', ''):
+            response = await acached_response(viewset.queryset.model, request)
+            if response is not None:
+                return response
+        return await drf_view(request, *args, **kwargs)
+
+    return csrf_exempt(view)
+
+
+class AsyncAPIView(View):
+    """Minimal async counterpart of APIView: JSON or form body as request.data, DRF throttles, 400 on ValidationError."""
+    http_method_names = ['post', 'options']
+    throttle_classes = []
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # token based endpoints, like the DRF views
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+        except ValueError as exc:
+            return JsonResponse({'detail': f'JSON parse error - {exc}'}, status=400)
+        for throttle in [throttle_class() for throttle_class in self.throttle_classes]:
+            # the throttles only read request.META and request.data, so they work on the plain HttpRequest
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                # the wait rounded up, as DRF's Throttled exception does
+                wait = throttle.wait()
+                if wait is None:
+                    return JsonResponse({'detail': 'Request was throttled.'}, status=429)
+                response = JsonResponse({'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'}, status=429)
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except ValidationError as exc:
+            return JsonResponse(exc.detail, status=400, safe=False)
+
+    def validated(self, serializer_class, request):
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+class AsyncUserRegisterView(AsyncAPIView):
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
+
+    async def post(self, request):
+        # the unique email check and password hashing are sync, run them in a thread
+        user = await sync_to_async(self.register)(request.data)
+        otp_code = await user.agenerate_otp('verification')
+        await aqueue_mail(
+            'Verify your email - OTP code',
+            f'Your verification code is: {otp_code}\n\nDo not share this code with anyone.',
+            settings.EMAIL_HOST_USER,
+            [user.email],
+        )
+        return JsonResponse({
+            'message': 'Registration successful. Please verify your email using the OTP sent to your email address.',
+            'email': user.email
+        }, status=201)
+
+    def register(self, data):
+        serializer = CustomerSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+
+class AsyncVerifyEmailOTPView(AsyncAPIView):
+    throttle_classes = [OTPVerifyIPThrottle, OTPVerifyEmailThrottle]
+
+    async def post(self, request):
+        data = self.validated(OTPVerificationSerializer, request)
+        user = await Customer.objects.filter(email=data['email']).afirst()
+        if user is None:
+            return JsonResponse({'error': 'User not found.'}, status=404)
+        if user.email_verified:
+            return JsonResponse({"message": "Email already verified. You can login now."})
+        if await user.averify_otp(data['otp_code'], 'verification'):
+            user.email_verified = True
+            user.is_active = True
+            await user.asave(update_fields=['email_verified', 'is_active'])
+            await user.aclear_otp('verification')
+            return JsonResponse({"message": "Email verified successfully. You can now login."})
+        return JsonResponse({"error": "Invalid or expired OTP code."}, status=400)
+
+
+class AsyncResendOTPView(AsyncAPIView):
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
+
+    async def post(self, request):
+        data = self.validated(ResendOTPSerializer, request)
+        user = await Customer.objects.filter(email=data['email']).afirst()
+        if user is None:
+            return JsonResponse({"error": "User not found."}, status=404)
+        if user.email_verified:
+            return JsonResponse({"message": "Email already verified. You can login now."})
+        otp_code = await user.agenerate_otp('verification')
+        await aqueue_mail(
+            'Verify Your Email - New OTP Code',
+            f'Your new verification code is: {otp_code}\n\nThis code will expire in 10 minutes.\n\nDo not share this code with anyone.',
+            settings.EMAIL_HOST_USER,
+            [user.email],
+        )
+        return JsonResponse({"message": "New OTP code sent to your email."})
+
+
+class AsyncForgotPasswordView(AsyncAPIView):
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
+
+    async def post(self, request):
+        data = self.validated(ForgotPasswordSerializer, request)
+        user = await Customer.objects.filter(email=data['email']).afirst()
+        if user is None:
+            return JsonResponse({"error": "User not found."}, status=404)
+        if not user.email_verified:
+            return JsonResponse({"error": "Please verify your email first."}, status=403)
+        otp_code = await user.agenerate_otp('password_reset')
+        await aqueue_mail(
+            'Password Reset - OTP Code',
+            f'Your password reset code is: {otp_code}\n\nThis code will expire in 10 minutes.\n\nIf you did not request this, please ignore this email.',
+            settings.EMAIL_HOST_USER,
+            [user.email],
+        )
+        return JsonResponse({"message": "Password reset OTP sent to your email."})
+
+
+class AsyncResetPasswordView(AsyncAPIView):
+    throttle_classes = [OTPVerifyIPThrottle, OTPVerifyEmailThrottle]
+
+    async def post(self, request):
+        data = self.validated(ResetPasswordSerializer, request)
+        user = await Customer.objects.filter(email=data['email']).afirst()
+        if user is None:
+            return JsonResponse({"error": "User not found."}, status=404)
+        if await user.averify_otp(data['otp_code'], 'password_reset'):
+            await sync_to_async(user.set_password)(data['new_password'])
+            await user.asave(update_fields=['password'])
+            await user.aclear_otp('password_reset')
+            return JsonResponse({"message": "Password reset successful. You can now login with your new password."})
+        return JsonResponse({"error": "Invalid or expired OTP code."}, status=400)
+
+
+class AsyncLoginView(AsyncAPIView):
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
+
+    async def post(self, request):
+        email = request.data.get('email')
+        password = request.data.get('password')
+        if not email or not password:
+            return JsonResponse({'error': 'Email and password are required'}, status=400)
+        user = await Customer.objects.filter(email=email).afirst()
+        if user is None:
+            return JsonResponse({'error': 'Invalid credentials'}, status=401)
+        # not user.acheck_password(): Django runs the hasher inline there, which would stall the event loop
+        try:
+            if not await acheck_password(user, password):
+                return JsonResponse({'error': 'Invalid credentials'}, status=401)
+        except PasswordHashingBusy:
+            return JsonResponse({'error': 'Too many logins right now, please try again.'}, status=503, headers={'Retry-After': '1'})
+        if not user.email_verified:
+            return JsonResponse({'error': 'Please verify your email first'}, status=403)
+        refresh = tokens_for(user)
+        return JsonResponse({
+            'access_token': str(refresh.access_token),
+            'refresh_token': str(refresh),
+            'user': {
+                'id': user.id,
+                'email': user.email,
+                'name': user.name,
+                'is_staff': user.is_staff,
+                'is_superuser': user.is_superuser
+            }
+        })
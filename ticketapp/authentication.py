@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Claims copied into every token at login, enough to authorize a request without loading the user.
+# token_version is bumped (Customer.token_version) whenever one of them or the password changes,
+# which revokes all tokens issued before.
+USER_CLAIMS = ('email', 'is_staff', 'is_superuser', 'email_verified', 'token_version')
+REVOKED = -1
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def tokens_for(user):
+    """Refresh token (and its access token) carrying the user claims."""
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+def version_cache_key(user_id):
+    return f"auth:token_version:{user_id}"
+
+
+def current_token_version(user_id):
+    """
+    The user's token_version, from the cache or else one narrow query. Inactive or deleted users get REVOKED.
+    Changes delete the cache key; the timeout only bounds staleness with a per-process (locmem) cache.
+    """
+    from .models import Customer
+
+    key = version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        row = Customer.objects.filter(pk=user_id).values_list('token_version', 'is_active').first()
+        version = row[0] if row and row[1] else REVOKED
+        cache.set(key, version, settings.AUTH_TOKEN_VERSION_CACHE_SECONDS)
+    return version
+
+
+def forget_token_version(user_id):
+    cache.delete(version_cache_key(user_id))
+
+
+def check_not_revoked(token):
+    version = token.get('token_version')
+    if version is None:
+        return
+    if current_token_version(token[api_settings.USER_ID_CLAIM]) != version:
+        raise InvalidToken("Token has been revoked")
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user for JWT requests: everything comes from the token claims, no database row is loaded.
+    Code that needs the real model (e.g. to assign a foreign key) uses .customer, which is fetched on first use.
+    """
+    @property
+    def email_verified(self):
+        return self.token.get('email_verified', False)
+
+    @cached_property
+    def customer(self):
+        from .models import Customer
+        return Customer.objects.get(pk=self.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication without the per-request user query, for tokens issued by custom_login."""
+    def get_user(self, validated_token):
+        if 'token_version' not in validated_token:
+            # token from before claims were added (or from another issuer): load the user as usual
+            return super().get_user(validated_token)
+        check_not_revoked(validated_token)
+        return ClaimsUser(validated_token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class CheckedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens of users whose token_version moved on (password or role change, deactivation)."""
+    def validate(self, attrs):
+        check_not_revoked(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
+
+
+def customer_for(user):
+    """The Customer model instance behind request.user."""
+    return user.customer if isinstance(user, ClaimsUser) else user
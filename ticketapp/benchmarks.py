@@ -0,0 +1,375 @@
+import json
+import platform
+import random
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from statistics import median
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from .authentication import tokens_for
+from .cache import bump_version
+from .inventory import create_seats
+from .models import Category, Customer, Event, EventSalesSummary, Order, Seat, Ticket, Zone
+from .sales import rebuild
+from .search import update_vectors
+
+# Benchmark suite. seed() fills a database with a synthetic catalog and sales history that only depends on the
+# seed and the sizes: customers sharing one password hash, events with JSON image/date/price payloads, a few of
+# them on sale with a seat map, and orders with one to three tickets each for the others. run() replays the
+# SCENARIOS through the in-process test client inside a transaction that is rolled back, so purchases leave the
+# data as it was and every run sees the same rows. Each request is timed on its own and the report gives
+# throughput and p50/p95/p99 per endpoint, medians over a few rounds; compare() checks a report against a
+# stored one (a JSON baseline).
+# Catalog reads carry a query parameter that changes on every request, so they measure the view and not the
+# catalog cache (events.cached measures a cache hit). Baselines are only comparable on the same machine,
+# database and dataset sizes.
+BENCH_DOMAIN = 'bench.invalid'
+ADMIN_EMAIL = f'admin@{BENCH_DOMAIN}'
+PASSWORD = 'bench-password'
+CATEGORY_PREFIX = 'Bench '
+CATEGORIES = ['Concert', 'Theatre', 'Football', 'Comedy', 'Conference', 'Exhibition']
+CITIES = ['Yangon', 'Mandalay', 'Bangkok', 'Singapore', 'Kuala Lumpur', 'Hanoi', 'Manila', 'Jakarta']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ze', 'tu', 'no', 'vi', 'sha', 'pen']
+KINDS = ['Live', 'World Tour', 'Festival', 'Night', 'Showcase']
+ZONES = [('VIP', 250000), ('Zone A', 150000), ('Zone B', 80000)]
+SEAT_ROWS = [chr(ord('A') + index) for index in range(20)]
+SEATS_PER_ROW = 50
+ON_SALE_EVENTS = 10  # the first events, with a seat map per zone; the sales history goes to the others
+STATUSES = [('Paid', 70), ('Pending', 25), ('Cancelled', 5)]
+BATCH_SIZE = 5000
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def bench_customers():
+    return Customer.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+
+
+def bench_events():
+    return Event.objects.filter(category__category_name__startswith=CATEGORY_PREFIX)
+
+
+def dataset():
+    """Sizes of the bench data, stored with a report so baselines of different datasets are not compared blindly."""
+    return {
+        'customers': bench_customers().count(),
+        'events': bench_events().count(),
+        'orders': Order.objects.filter(customer__in=bench_customers()).count(),
+        'tickets': Ticket.objects.filter(event__in=bench_events()).count(),
+        'seats': Seat.objects.filter(event__in=bench_events()).count(),
+    }
+
+
+def seed(customers=5000, events=2000, orders=200000, seed=22, log=None):
+    """Create the bench data. bulk_create skips save() and the signals, so what they maintain is filled here."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    today = timezone.localdate()
+    with transaction.atomic():
+        start = time.perf_counter()
+        password = make_password(PASSWORD)  # hashing once: the login scenario pays the real cost per request
+        Customer.objects.bulk_create(
+            [Customer(email=ADMIN_EMAIL, name='Bench admin', password=password, is_active=True, email_verified=True, is_staff=True, is_superuser=True)]
+            + [
+                Customer(email=f'customer{index}@{BENCH_DOMAIN}', name=f'Bench Customer {index}', password=password, is_active=True, email_verified=True)
+                for index in range(customers)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        customer_ids = list(bench_customers().filter(is_staff=False).order_by('id').values_list('id', flat=True))
+        log(f"{len(customer_ids)} customers in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        categories = [Category.objects.create(category_name=CATEGORY_PREFIX + name, category_image={'icon': f'https://cdn.example.com/categories/{name.lower()}.png'}) for name in CATEGORIES]
+        artists = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+        rows = []
+        for index in range(events):
+            on_sale = index < ON_SALE_EVENTS
+            first_day = today + timedelta(days=rng.randint(30, 90) if on_sale else rng.randint(-365, 365))
+            days = rng.randint(1, 3)
+            event = Event(
+                event_name=f'{rng.choice(artists).title()} {rng.choice(KINDS)} {first_day.year}',
+                event_image={
+                    'thumbnail': f'https://cdn.example.com/events/{index}/thumb.jpg',
+                    'banner': f'https://cdn.example.com/events/{index}/banner.jpg',
+                    'gallery': [f'https://cdn.example.com/events/{index}/{photo}.jpg' for photo in range(rng.randint(1, 4))],
+                },
+                event_date=[(first_day + timedelta(days=day)).isoformat() for day in range(days)],
+                event_time=rng.choice(['18:00', '19:00', '19:30', '20:00']),
+                event_location=rng.choice(CITIES),
+                sale_date=(today - timedelta(days=7) if on_sale else first_day - timedelta(days=rng.randint(14, 90))).isoformat(),
+                ticket_price=[{'zone': zone, 'price': f'{price:,} MMK'} for zone, price in ZONES],
+                category=rng.choice(categories),
+            )
+            event.sync_typed_fields()
+            rows.append(event)
+        Event.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        for category in categories:
+            update_vectors(Event.objects.filter(category=category), category.category_name)
+        event_ids = list(bench_events().order_by('id').values_list('id', flat=True))
+        for event_id in event_ids[:ON_SALE_EVENTS]:
+            for zone, _ in ZONES:
+                create_seats(Zone.objects.create(event_id=event_id, name=zone), SEAT_ROWS, SEATS_PER_ROW)
+        log(f"{len(event_ids)} events, {ON_SALE_EVENTS} on sale with {len(ZONES) * len(SEAT_ROWS) * SEATS_PER_ROW} seats each, in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        history = event_ids[ON_SALE_EVENTS:]
+        statuses, weights = zip(*STATUSES)
+        prices = dict(ZONES)
+        tickets = 0
+        for offset in range(0, orders, BATCH_SIZE):
+            batch = Order.objects.bulk_create([
+                Order(customer_id=rng.choice(customer_ids), event_id=rng.choice(history))
+                for _ in range(min(BATCH_SIZE, orders - offset))
+            ])
+            rows = []
+            for order in batch:
+                for _ in range(rng.randint(1, 3)):
+                    preferences = rng.sample(list(prices), 3)
+                    status = rng.choices(statuses, weights)[0]
+                    paid = status == 'Paid'
+                    ticket = Ticket(
+                        passport_name=f'Bench Holder {tickets}', facebook_name=f'bench.holder.{tickets}',
+                        member_code=f'B{tickets:07d}', priority_date=(today - timedelta(days=rng.randint(0, 700))).isoformat(),
+                        fst_pt=preferences[0], snd_pt=preferences[1], trd_pt=preferences[2], status=status,
+                        zone=preferences[0] if paid else None, selling_price=f'{prices[preferences[0]]:,} MMK',
+                        customer_payment=f'{prices[preferences[0]]:,} MMK' if paid else None,
+                        payment_date=(today - timedelta(days=rng.randint(0, 365))).isoformat() if paid else None,
+                        event_id=order.event_id, order=order,
+                    )
+                    ticket.sync_typed_fields()
+                    rows.append(ticket)
+                    tickets += 1
+            Ticket.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        rebuild(history)
+        log(f"{orders} orders with {tickets} tickets in {time.perf_counter() - start:.1f}s")
+    analyze()
+    bump_version(Event)
+    bump_version(Category)
+
+
+def flush(log=None):
+    """Delete the bench data. Raw deletes for the big tables: their signals keep summaries and caches that go too."""
+    log = log or (lambda message: None)
+    with transaction.atomic():
+        events = bench_events()
+        orders = Order.objects.filter(customer__in=bench_customers())
+        Seat.objects.filter(event__in=events)._raw_delete(Seat.objects.db)
+        Ticket.objects.filter(order__in=orders)._raw_delete(Ticket.objects.db)
+        Ticket.objects.filter(event__in=events)._raw_delete(Ticket.objects.db)
+        log(f"{orders._raw_delete(Order.objects.db)} orders deleted")
+        EventSalesSummary.objects.filter(event__in=events).delete()
+        log(f"{events.delete()[0]} rows of events, zones and seats deleted")
+        Category.objects.filter(category_name__startswith=CATEGORY_PREFIX).delete()
+        log(f"{bench_customers().delete()[0]} rows of customers deleted")
+
+
+def analyze():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+class Context:
+    """The rows the scenarios pick from, loaded once per run."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.admin = bench_customers().get(email=ADMIN_EMAIL)
+        customers = list(bench_customers().filter(is_staff=False).order_by('id').only('id', 'email', 'name', 'token_version'))
+        rng.shuffle(customers)
+        self.customers = deque(customers)
+        self.events = list(bench_events().order_by('id').values_list('id', flat=True))
+        self.on_sale = deque(Zone.objects.filter(event__in=self.events).order_by('id').values_list('event_id', 'name'))
+        self.categories = list(Category.objects.filter(category_name__startswith=CATEGORY_PREFIX).values_list('id', flat=True))
+        self.words = [name.split()[0] for name in bench_events().order_by('id').values_list('event_name', flat=True)[:200]]  # artist names
+        self.requests = 0
+
+    def customer(self):
+        self.customers.rotate(-1)
+        return self.customers[0]
+
+    def unique(self):
+        """A new value for every request: defeats the catalog cache and the per IP/email login throttles."""
+        self.requests += 1
+        return self.requests
+
+    def bearer(self, user):
+        # minted for every iteration, outside the timings: access tokens only live a minute
+        return {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(user).access_token}'}
+
+
+def catalog(context, call):
+    rng, nocache = context.rng, context.unique()
+    page = call('events.list', 'get', f'/api/events/?page_size=20&bench={nocache}')
+    if page.status_code == 200 and page.json().get('next'):
+        call('events.next_page', 'get', page.json()['next'] + f'&bench={nocache}')
+    call('events.filtered', 'get', f'/api/events/?upcoming=true&category={rng.choice(context.categories)}&price_max=200000&bench={nocache}')
+    call('events.search', 'get', f'/api/events/?search={rng.choice(context.words)}&bench={nocache}')
+    call('events.detail', 'get', f'/api/events/{rng.choice(context.events)}/?bench={nocache}')
+    call('events.cached', 'get', '/api/events/?page_size=20')
+    call('events.availability', 'get', f'/api/events/{rng.choice(context.on_sale)[0]}/availability/')
+    call('categories.list', 'get', f'/api/categories/?bench={nocache}')
+
+
+def auth(context, call):
+    customer, ip = context.customer(), context.unique()
+    address = f'10.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}'
+    login = call('auth.login', 'post', '/api/auth/login/', {'email': customer.email, 'password': PASSWORD}, REMOTE_ADDR=address)
+    if login.status_code != 200:
+        return
+    refresh = call('auth.refresh', 'post', '/api/auth/refresh/', {'refresh': login.json()['refresh_token']}, REMOTE_ADDR=address)
+    if refresh.status_code == 200:
+        call('orders.mine', 'get', '/api/orders/', HTTP_AUTHORIZATION=f"Bearer {refresh.json()['access']}")
+
+
+def purchase(context, call):
+    customer = context.customer()
+    headers = context.bearer(customer)
+    context.on_sale.rotate(-1)
+    event_id, zone = context.on_sale[0]
+    hold = call('events.hold', 'post', f'/api/events/{event_id}/hold/', {'zone': zone, 'quantity': context.rng.randint(1, 4)}, **headers)
+    if hold.status_code != 201:
+        return
+    tickets = [
+        {'passport_name': customer.name, 'facebook_name': customer.email, 'zone': zone, 'row': seat['row'], 'seat': seat['number'], 'selling_price': f'{dict(ZONES)[zone]:,} MMK'}
+        for seat in hold.json()
+    ]
+    call('orders.checkout', 'post', '/api/orders/checkout/', {'event': event_id, 'tickets': tickets}, HTTP_IDEMPOTENCY_KEY=f'bench-{context.unique()}', **headers)
+
+
+def admin(context, call):
+    rng, headers = context.rng, context.bearer(context.admin)
+    call('tickets.list', 'get', '/api/tickets/', **headers)
+    call('tickets.paid', 'get', '/api/tickets/?status=Paid', **headers)
+    call('tickets.event', 'get', f'/api/tickets/?event={rng.choice(context.events[ON_SALE_EVENTS:])}', **headers)
+    call('orders.list', 'get', '/api/orders/', **headers)
+    call('customers.list', 'get', '/api/customers/', **headers)
+    call('events.sales', 'get', f'/api/events/{rng.choice(context.events[ON_SALE_EVENTS:])}/sales/', **headers)
+
+
+SCENARIOS = {'catalog': catalog, 'auth': auth, 'purchase': purchase, 'admin': admin}
+
+
+def summary(latencies, errors, seconds=None):
+    seconds = sum(latencies) if seconds is None else seconds
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'req_per_s': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def median_of(summaries):
+    """One summary from those of several rounds: requests and errors add up, the rates and latencies are medians."""
+    combined = {'requests': sum(row['requests'] for row in summaries), 'errors': sum(row['errors'] for row in summaries)}
+    for metric in ('req_per_s', 'p50_ms', 'p95_ms', 'p99_ms'):
+        combined[metric] = round(median(row[metric] for row in summaries), 2)
+    return combined
+
+
+def measure(context, scenario, client, iterations, warmup):
+    """One round of a scenario: (latencies per endpoint, errors per endpoint, seconds)."""
+    latencies, errors = defaultdict(list), defaultdict(int)
+    timed = False
+
+    def call(endpoint, method, path, data=None, **extra):
+        start = time.perf_counter()
+        if method == 'get':
+            response = client.get(path, **extra)
+        else:
+            response = client.post(path, data, format='json', **extra)
+        elapsed = time.perf_counter() - start
+        if timed:
+            latencies[endpoint].append(elapsed)
+            if response.status_code >= 400:
+                errors[endpoint] += 1
+        return response
+
+    for _ in range(warmup):
+        scenario(context, call)
+    timed = True
+    start = time.perf_counter()
+    for _ in range(iterations):
+        scenario(context, call)
+    return latencies, errors, time.perf_counter() - start
+
+
+def run(client, scenarios, iterations=50, rounds=3, warmup=5, seed=22):
+    """
+    Run each scenario `iterations` times per round after `warmup` untimed ones and return the report. Rounds
+    take turns between the scenarios and the report keeps the median of each metric over the rounds, so a
+    burst of background load in one round does not move it. Endpoints are keyed 'scenario/endpoint'; their
+    req_per_s is one client back to back (1 / mean latency), a scenario's counts its whole iterations.
+    The caller provides the transaction to roll back.
+    """
+    context = Context(random.Random(seed))
+    report = {
+        'created': timezone.now().isoformat(timespec='seconds'),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'dataset': dataset(),
+        'options': {'iterations': iterations, 'rounds': rounds, 'warmup': warmup, 'seed': seed},
+        'scenarios': {},
+        'endpoints': {},
+    }
+    per_round = defaultdict(list)  # scenario or 'scenario/endpoint' -> summary of each round
+    for number in range(rounds):
+        for name in scenarios:
+            latencies, errors, seconds = measure(context, SCENARIOS[name], client, iterations, warmup if number == 0 else 0)
+            requests = [value for values in latencies.values() for value in values]
+            per_round[name].append(summary(requests, sum(errors.values()), seconds))
+            for endpoint, values in latencies.items():
+                per_round[f'{name}/{endpoint}'].append(summary(values, errors[endpoint]))
+    for key, summaries in per_round.items():
+        report['endpoints' if '/' in key else 'scenarios'][key] = median_of(summaries)
+    return report
+
+
+def compare(baseline, report, tolerance=0.2, min_delta_ms=1.0):
+    """
+    (regressions, improvements, warnings) of report against baseline. An endpoint's p50 or p95 regresses when it
+    is more than `tolerance` slower and by at least min_delta_ms (sub-millisecond endpoints jitter by more than
+    20%), and when it answers more errors; a scenario when its throughput drops by more than `tolerance`.
+    p99 and the per endpoint throughput (one slow outlier moves the mean) are only reported.
+    """
+    regressions, improvements, warnings = [], [], []
+    for key in ('database', 'dataset', 'options'):
+        if baseline.get(key) != report.get(key):
+            warnings.append(f"{key} differs from the baseline: {json.dumps(baseline.get(key))} -> {json.dumps(report.get(key))}")
+    for name, now in report['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        if now['req_per_s'] * (1 + tolerance) < before['req_per_s']:
+            regressions.append((name, 'req_per_s', before['req_per_s'], now['req_per_s']))
+        elif before['req_per_s'] * (1 + tolerance) < now['req_per_s']:
+            improvements.append((name, 'req_per_s', before['req_per_s'], now['req_per_s']))
+    for endpoint, now in report['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            warnings.append(f"{endpoint} is not in the baseline")
+            continue
+        if now['errors'] > before['errors']:
+            regressions.append((endpoint, 'errors', before['errors'], now['errors']))
+        for metric in ('p50_ms', 'p95_ms'):
+            if now[metric] > before[metric] * (1 + tolerance) and now[metric] - before[metric] >= min_delta_ms:
+                regressions.append((endpoint, metric, before[metric], now[metric]))
+            elif before[metric] > now[metric] * (1 + tolerance) and before[metric] - now[metric] >= min_delta_ms:
+                improvements.append((endpoint, metric, before[metric], now[metric]))
+    for endpoint in sorted(baseline['endpoints'].keys() - report['endpoints'].keys()):
+        if endpoint.split('/')[0] in report['scenarios']:  # a scenario left out on purpose is not worth a warning
+            warnings.append(f"{endpoint} is in the baseline but was not run")
+    return regressions, improvements, warnings
@@ -0,0 +1,110 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def version_key(model):
+    return f"catalog:{model._meta.label_lower}:version"
+
+
+def get_version(model):
+    """
+    Current version of a model's data, a nanosecond timestamp so a cache that lost it never hands out an old one.
+    Versions must live in a cache every process shares (see checks.py): a bump elsewhere is otherwise never seen.
+    """
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(model):
+    key = version_key(model)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(model):
+    """Invalidate every cached response of a model by moving it to a new version."""
+    cache.set(version_key(model), time.time_ns(), None)
+
+
+def validators(model, version, request):
+    """
+    (etag, cache key) of a catalog response. No Last-Modified: to the second it would answer If-Modified-Since
+    with a 304 after a write made in the same second, the ETag carries the exact version.
+    """
+    # absolute url: the query string holds the cursor and pagination links embed the host
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = f"catalog:{model._meta.label_lower}:{version}:{url_hash}"
+    return f'W/"{version:x}-{url_hash}"', key
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    return response
+
+
+async def acached_response(model, request):
+    """
+    The async views' fast path: a 304 or the cached JSON of a catalog GET without a thread hop or query.
+    Returns None on a cache miss, the caller then runs the DRF view (which fills the cache).
+    """
+    etag, key = validators(model, await aget_version(model), request)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        data = await cache.aget(key)
+        if data is None:
+            return None
+        response = HttpResponse(JSONRenderer().render(data), content_type='application/json')
+        response['Vary'] = 'Accept'
+    return set_validators(response, etag)
+
+
+class CachedCatalogMixin:
+    """
+    Read-through cache for public list/retrieve actions.
+    Serialized data is stored under the model version, so a bump makes all old entries unreachable,
+    and conditional GETs (If-None-Match) are answered with 304 before touching the database.
+    """
+
+    def perform_authentication(self, request):
+        # catalog reads are AllowAny, authenticate lazily so a cache hit never loads the user
+        if request.method not in ('GET', 'HEAD'):
+            super().perform_authentication(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, action, request, *args, **kwargs):
+        model = self.queryset.model
+        etag, key = validators(model, get_version(model), request)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = Response(status=not_modified.status_code)
+        else:
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = action(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, CATALOG_CACHE_TIMEOUT)
+        return set_validators(response, etag)
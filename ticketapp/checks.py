@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def shared_version_cache(app_configs, **kwargs):
+    """Catalog versions (cache.py) in a per-process cache leave every other worker serving stale responses and 304s."""
+    if settings.WEB_CONCURRENCY > 1 and settings.CACHES['default']['BACKEND'] in PROCESS_CACHES:
+        return [Error(
+            f"WEB_CONCURRENCY is {settings.WEB_CONCURRENCY} but the default cache is per process.",
+            hint="Point CACHE_BACKEND/CACHE_LOCATION at a cache the workers share (e.g. Redis): catalog writes only invalidate the cache they are made in.",
+            id='ticketapp.E001',
+        )]
+    return []
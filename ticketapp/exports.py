@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from .filters import date_param, int_param
+from .models import Order, Ticket
+
+# Finance exports. Rows are read with .values_list().iterator(), which uses a server-side cursor on
+# PostgreSQL, and written out in batches, so memory stays flat however many rows an event has.
+# Columns: header label -> lookup.
+EXPORTS = {
+    'tickets': (Ticket, 'paid_on', {
+        'id': 'id', 'event': 'event_id', 'order': 'order_id', 'customer_email': 'order__customer__email',
+        'passport_name': 'passport_name', 'facebook_name': 'facebook_name', 'member_code': 'member_code',
+        'priority_date': 'priority_date', 'fst_pt': 'fst_pt', 'snd_pt': 'snd_pt', 'trd_pt': 'trd_pt',
+        'status': 'status', 'selling_price': 'selling_price', 'customer_payment': 'customer_payment',
+        'payment_date': 'payment_date', 'zone': 'zone', 'row': 'row', 'seat': 'seat',
+    }),
+    'orders': (Order, 'order_time', {
+        'id': 'id', 'order_time': 'order_time', 'event': 'event_id', 'event_name': 'event__event_name',
+        'customer': 'customer_id', 'customer_email': 'customer__email',
+    }),
+}
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 2000  # rows fetched per round trip and written per chunk
+# a CSV cell starting with one of these is run as a formula by spreadsheet apps, it is written with a leading '
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_range(model, field, date_from, date_to):
+    """
+    Filters for the days date_from to date_to, both included. A datetime column gets a half-open range from
+    midnight to midnight in the current time zone: __date would convert every row and skip the column's index.
+    """
+    if isinstance(model._meta.get_field(field), models.DateTimeField):
+        lookups = {f'{field}__gte': date_from and day_start(date_from), f'{field}__lt': date_to and day_start(date_to + timedelta(days=1))}
+    else:
+        lookups = {f'{field}__gte': date_from, f'{field}__lte': date_to}
+    return {lookup: value for lookup, value in lookups.items() if value}
+
+
+def csv_text(value):
+    """The text of an exported CSV cell, without the quote put before a formula character."""
+    return value[1:] if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES) else value
+
+
+def export_rows(kind, queryset=None, event=None, status=None, date_from=None, date_to=None):
+    """(header, rows iterator) for an export. Tickets are dated by paid_on, orders by order_time."""
+    model, date_field, columns = EXPORTS[kind]
+    queryset = model.objects.all() if queryset is None else queryset
+    if event is not None:
+        queryset = queryset.filter(event_id=event)
+    if status:
+        queryset = queryset.filter(status=status)
+    queryset = queryset.filter(**date_range(model, date_field, date_from, date_to))
+    rows = queryset.order_by('id').values_list(*columns.values()).iterator(chunk_size=CHUNK_SIZE)
+    return list(columns), rows
+
+
+def csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        # inline rather than a function call per cell, it runs for every cell of the export
+        writer.writerow(["'" + value if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value for value in row])
+        if count % CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(header, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(header, row)), default=str, ensure_ascii=False))
+        if len(lines) == CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def chunks(output, header, rows):
+    return csv_chunks(header, rows) if output == 'csv' else jsonl_chunks(header, rows)
+
+
+async def achunks(chunks):
+    """Pull a sync generator one chunk at a time. Given a sync iterator, Django's ASGI handler would read it all into memory first."""
+    next_chunk = sync_to_async(next)  # thread sensitive: every chunk comes from the thread holding the cursor
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def streaming_export(request, output, filename, header, rows):
+    content = chunks(output, header, rows)
+    if isinstance(request, ASGIRequest):
+        content = achunks(content)
+    response = StreamingHttpResponse(content, content_type=f'{FORMATS[output]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
+
+
+class ExportNegotiation(BaseContentNegotiation):
+    """The export picks its format from ?output=, so an Accept: text/csv header must not end in 406."""
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def export_response(request, kind, queryset):
+    """Streaming export for an API request: ?output=csv|jsonl ?event= ?status= ?date_from= ?date_to= (YYYY-MM-DD)."""
+    output = request.query_params.get('output', 'csv')
+    if output not in FORMATS:
+        raise ValidationError({'output': f"Use one of: {', '.join(FORMATS)}."})
+    header, rows = export_rows(
+        kind, queryset,
+        event=int_param(request, 'event'),
+        status=request.query_params.get('status') if kind == 'tickets' else None,
+        date_from=date_param(request, 'date_from'),
+        date_to=date_param(request, 'date_to'),
+    )
+    return streaming_export(request._request, output, kind, header, rows)
@@ -0,0 +1,98 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .search import search_events, search_words
+
+
+def date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+
+
+def decimal_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError({name: 'A number is required.'})
+    return number
+
+
+def int_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: 'An id is required.'})
+    return int(value)
+
+
+def flag_param(request, name):
+    return request.query_params.get(name) in ('1', 'true', 'True')
+
+
+class EventFilter(BaseFilterBackend):
+    """
+    ?date_from= / ?date_to=  events starting in a date range (YYYY-MM-DD)
+    ?upcoming=true           events that have not ended yet
+    ?on_sale=true            events whose sale date has passed
+    ?price_min= / ?price_max= events with a ticket price in range
+    ?category=<id>
+    ?search=<words>          name, location or category name, best match first (ticketapp/search.py)
+    """
+    def filter_queryset(self, request, queryset, view):
+        today = timezone.localdate()
+        filters = {}
+        if (value := date_param(request, 'date_from')) is not None:
+            filters['start_date__gte'] = value
+        if (value := date_param(request, 'date_to')) is not None:
+            filters['start_date__lte'] = value
+        if flag_param(request, 'upcoming'):
+            filters['end_date__gte'] = today
+        if flag_param(request, 'on_sale'):
+            filters['sale_starts_on__lte'] = today
+        if (value := decimal_param(request, 'price_min')) is not None:
+            filters['max_price__gte'] = value
+        if (value := decimal_param(request, 'price_max')) is not None:
+            filters['min_price__lte'] = value
+        if (value := int_param(request, 'category')) is not None:
+            filters['category_id'] = value
+        queryset = queryset.filter(**filters) if filters else queryset
+        if search_words(request.query_params.get('search')):
+            queryset = search_events(queryset, request.query_params['search'])
+        return queryset
+
+
+class TicketFilter(BaseFilterBackend):
+    """
+    ?event=<id>  ?status=Paid  ?zone=VIP
+    ?paid_from= / ?paid_to=    payment date range (YYYY-MM-DD)
+    ?price_min= / ?price_max=  selling price range
+    """
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        if (value := int_param(request, 'event')) is not None:
+            filters['event_id'] = value
+        for name in ('status', 'zone'):
+            if request.query_params.get(name):
+                filters[name] = request.query_params[name]
+        if (value := date_param(request, 'paid_from')) is not None:
+            filters['paid_on__gte'] = value
+        if (value := date_param(request, 'paid_to')) is not None:
+            filters['paid_on__lte'] = value
+        if (value := decimal_param(request, 'price_min')) is not None:
+            filters['selling_price_amount__gte'] = value
+        if (value := decimal_param(request, 'price_max')) is not None:
+            filters['selling_price_amount__lte'] = value
+        return queryset.filter(**filters) if filters else queryset
@@ -0,0 +1,147 @@
+import hashlib
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from .parsing import json_leaves
+
+# Images for the banner_image, category_image and event_image JSON fields. An upload is stored once per content
+# in the 'images' storage (settings.STORAGES, the local filesystem unless swapped for another Django storage)
+# as images/<sha256 prefix>-<width>x<height>.<ext>, next to WebP copies resized to the WIDTHS below. Names
+# never change for a content, so they are served with a year long immutable Cache-Control, and the variants'
+# names follow from the original's: the serializers turn every reference to an upload found in a JSON field
+# into a srcset without a query or a storage call (image_variants). Decoding and resizing run in a pool of
+# IMAGE_WORKERS processes, which also keeps Pillow's parsing of uploaded files out of the web workers.
+WIDTHS = (320, 640, 1024, 1600)  # an original narrower than a width gets its own width as the largest variant
+QUALITY = 80
+RECIPE = 1  # bump when WIDTHS, QUALITY or the resizing change: variants get new names, process_images makes them
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+NAME = re.compile(r'images/[0-9a-f]{20}-(\d+)x(\d+)\.(?:jpg|png|webp|gif)$')
+ORIENTATION = 0x0112  # EXIF tag, values 5 to 8 turn the picture a quarter
+
+
+class ImageError(Exception):
+    pass
+
+
+def variant_sizes(width, height):
+    widths = [size for size in WIDTHS if size < width]
+    if width <= WIDTHS[-1]:
+        widths.append(width)
+    return [(size, max(1, round(height * size / width))) for size in widths]
+
+
+def variant_name(name, width):
+    return f"{name.rsplit('.', 1)[0]}/{width}w-r{RECIPE}.webp"
+
+
+def render(data):
+    """
+    Worker process: (original name, [(variant name, WebP bytes)]) for an uploaded file, smallest variant first.
+    Raises ImageError for anything Pillow can't read.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise ImageError("Image variants need Pillow (pip install Pillow).")
+    try:
+        image = Image.open(io.BytesIO(data))
+        extension = FORMATS.get(image.format)
+        if extension is None:
+            raise ImageError(f"{image.format} images are not supported, use JPEG, PNG, WebP or GIF.")
+        width, height = image.size
+        if image.getexif().get(ORIENTATION, 1) >= 5:
+            width, height = height, width
+        sizes = variant_sizes(width, height)
+        # JPEG decodes at 1/2 to 1/8 scale when that is still larger than the largest variant
+        image.draft('RGB', (sizes[-1][0], sizes[-1][0]))
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+        name = f"images/{hashlib.sha256(data).hexdigest()[:20]}-{width}x{height}.{extension}"
+        variants = []
+        for size in reversed(sizes):  # each variant is resized from the next larger one
+            image = image.resize(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=QUALITY, method=4)
+            variants.append((variant_name(name, size[0]), buffer.getvalue()))
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise ImageError("Not a readable JPEG, PNG, WebP or GIF image.") from exc
+    return name, variants[::-1]
+
+
+# spawn: forking a web worker that runs threads (the password hashing pool) can leave locks held in the child
+executor = ProcessPoolExecutor(settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+
+def store(data, rendered):
+    """Save an original and those of its variants not stored yet. Returns the original's name."""
+    name, variants = rendered
+    storage = storages['images']
+    for variant, content in variants:
+        if not storage.exists(variant):
+            storage.save(variant, ContentFile(content))
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))  # last: an original in storage has its variants
+    return name
+
+
+def ingest(data):
+    """Store an upload with its variants. Returns its description (url, width, height, src, srcset)."""
+    return describe(store(data, executor.submit(render, data).result()))
+
+
+def ingest_many(blobs):
+    """ingest() for (key, bytes) pairs rendered side by side. Yields (key, description or ImageError)."""
+    futures = [(key, data, executor.submit(render, data)) for key, data in blobs]
+    for key, data, future in futures:
+        try:
+            yield key, describe(store(data, future.result()))
+        except ImageError as exc:
+            yield key, exc
+
+
+def describe(name):
+    return dict(url=storages['images'].url(name), **variants_of(name))
+
+
+@lru_cache(maxsize=4096)
+def variants_of(reference):
+    """src, srcset, width and height for a reference (name or URL) to an uploaded image, None for anything else."""
+    match = NAME.search(reference)
+    if match is None:
+        return None
+    width, height = int(match.group(1)), int(match.group(2))
+    storage = storages['images']
+    candidates = [(storage.url(variant_name(match.group(0), size)), size) for size, _ in variant_sizes(width, height)]
+    return {
+        'src': candidates[-1][0],
+        'srcset': ', '.join(f'{url} {size}w' for url, size in candidates),
+        'width': width,
+        'height': height,
+    }
+
+
+def image_variants(data):
+    """{reference: variants_of(reference)} for the uploaded images referenced anywhere in a JSON value."""
+    variants = {}
+    for _, value in json_leaves(data):
+        if isinstance(value, str) and value not in variants:
+            found = variants_of(value)
+            if found is not None:
+                variants[value] = found
+    return variants
+
+
+def media_view(request, path):
+    """MEDIA_ROOT for deployments without a web server in front (SERVE_MEDIA), uploaded images cached for good."""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if path.startswith('images/'):
+        patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
@@ -0,0 +1,213 @@
+import csv
+import io
+from contextlib import nullcontext
+from datetime import date, datetime, time
+from itertools import islice
+from django.db import transaction
+from .exports import csv_text
+from .inventory import SeatUnavailable, claim_seat, release_seat, release_seats, seated_zones
+from .models import Ticket
+from .sales import add_state, apply_deltas, new_deltas
+from .serializers import TicketImportSerializer
+from .sync import record_moved_tickets
+
+# Ticket allocations from operators' spreadsheets. Rows are read lazily and handled CHUNK_SIZE at a time:
+# one validation pass with related ids loaded in bulk, then one INSERT ... ON CONFLICT (event, member_code)
+# DO UPDATE per chunk. Columns are named as in the tickets export, so an export can be edited and imported
+# back; other columns (id, customer_email...) are ignored, and a column missing from the file is left alone
+# on tickets that already exist.
+COLUMNS = (
+    'event', 'order', 'passport_name', 'facebook_name', 'member_code', 'priority_date', 'fst_pt', 'snd_pt', 'trd_pt',
+    'status', 'selling_price', 'customer_payment', 'payment_date', 'zone', 'row', 'seat',
+)
+KEY = ('event', 'member_code')
+TYPED_COLUMNS = {'selling_price': 'selling_price_amount', 'customer_payment': 'customer_payment_amount', 'payment_date': 'paid_on'}
+FORMATS = ('csv', 'xlsx')
+CHUNK_SIZE = 2000
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def file_format(name):
+    extension = name.rsplit('.', 1)[-1].lower()
+    if extension not in FORMATS:
+        raise ImportFileError(f"Unsupported file type .{extension}, use one of: {', '.join(FORMATS)}.")
+    return extension
+
+
+def cell_text(value):
+    """A spreadsheet cell as the text a CSV would hold: 1001.0 -> '1001', a date -> '2025-03-01'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_rows(file):
+    """(header, iterator of (line number, row)) for a CSV file opened in binary mode."""
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    header = [name.strip() for name in next(reader, [])]
+    return header, ((reader.line_num, row) for row in reader)
+
+
+def xlsx_rows(file):
+    """(header, iterator of (row number, row)) for the first sheet of a workbook, read in openpyxl's streaming mode."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Reading .xlsx files needs openpyxl (pip install openpyxl).")
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    values = workbook.active.iter_rows(values_only=True)
+    header = [cell_text(cell).strip() for cell in next(values, ())]
+
+    def rows():
+        try:
+            for number, row in enumerate(values, 2):
+                yield number, [cell_text(cell) for cell in row]
+        finally:
+            workbook.close()
+    return header, rows()
+
+
+class TicketImport:
+    """
+    One import run. Errors are keyed by line (CSV) or row (XLSX) number; a row with errors is skipped and the
+    others are written. Each chunk commits on its own unless dry_run, which validates and writes everything in
+    a single transaction that is rolled back.
+    """
+
+    def __init__(self, header, event=None, dry_run=False):
+        missing = [name for name in KEY if name not in header and not (name == 'event' and event)]
+        if missing:
+            raise ImportFileError(f"Missing column(s): {', '.join(missing)}.")
+        self.columns = [(position, name) for position, name in enumerate(header) if name in COLUMNS]
+        names = {name for _, name in self.columns}
+        if {'zone', 'row', 'seat'} & names and not {'zone', 'row', 'seat'} <= names:
+            raise ImportFileError("The zone, row and seat columns go together.")
+        self.seating = 'zone' in names  # without them tickets keep their seats
+        self.update_fields = [name for name in COLUMNS if name in names and name not in KEY]
+        self.update_fields += [typed for column, typed in TYPED_COLUMNS.items() if column in names]
+        self.attnames = [Ticket._meta.get_field(name).attname for name in self.update_fields]
+        sources = {typed: column for column, typed in TYPED_COLUMNS.items()}
+        self.sources = [sources.get(name, name) for name in self.update_fields]  # the file column each field comes from
+        self.defaults = {'event': event} if event else {}
+        self.dry_run = dry_run
+        self.seen = {}  # (event id, member_code) -> first line, a key must not repeat anywhere in the file
+        self.report = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': {}}
+
+    def run(self, rows):
+        with transaction.atomic() if self.dry_run else nullcontext():
+            while chunk := list(islice(rows, CHUNK_SIZE)):
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.report
+
+    def row_data(self, row):
+        data = dict(self.defaults)
+        for position, name in self.columns:
+            value = csv_text(row[position]).strip() if position < len(row) else ''
+            if value:  # a blank cell stays unset: the model default on insert, the stored value on update (upsert)
+                data[name] = value
+        return data
+
+    def import_chunk(self, chunk):
+        lines = [number for number, _ in chunk]
+        serializer = TicketImportSerializer(data=[self.row_data(row) for _, row in chunk], many=True)
+        valid, errors = serializer.validate_each(labels=[f'line {line}' for line in lines], seen=self.seen)
+        tickets, blanks = {}, {}
+        for index, attrs in valid:
+            missing = {name: ['This field is required.'] for name in KEY if attrs.get(name) is None}
+            if missing:
+                errors[index] = missing
+                continue
+            ticket = Ticket(**attrs)
+            ticket.sync_typed_fields()  # bulk_create skips save() and signals
+            tickets[index] = ticket
+            blanks[index] = [attname for source, attname in zip(self.sources, self.attnames) if source not in attrs]
+        self.report['errors'].update((lines[index], detail) for index, detail in sorted(errors.items()))
+        if tickets:
+            self.upsert(tickets, lines, blanks)
+
+    def upsert(self, tickets, lines, blanks):
+        # lock the rows being replaced and read what the sales summary counts for them and the imported columns
+        existing = {
+            (event_id, member_code): (pk, (event_id, status, amount), values)
+            for pk, event_id, member_code, status, amount, *values in Ticket.objects.select_for_update()
+            .filter(event_id__in={t.event_id for t in tickets.values()}, member_code__in={t.member_code for t in tickets.values()})
+            .values_list('id', 'event_id', 'member_code', 'status', 'selling_price_amount', *self.attnames)
+        }
+        for index, ticket in list(tickets.items()):
+            previous = existing.get((ticket.event_id, ticket.member_code))
+            if not previous:
+                continue
+            # the upsert updates the same columns for every row: a blank cell writes back what is stored
+            stored = dict(zip(self.attnames, previous[2]))
+            for attname in blanks[index]:
+                setattr(ticket, attname, stored[attname])
+            # re-importing a sheet mostly repeats what is stored, only the rows that differ are written
+            if [getattr(ticket, name) for name in self.attnames] == previous[2]:
+                del tickets[index]
+                self.report['unchanged'] += 1
+        zones = seated_zones(tickets.values()) if self.seating else set()
+        seated = {index: t for index, t in tickets.items() if (t.event_id, t.zone) in zones}
+        plain = [t for index, t in tickets.items() if index not in seated]
+        if self.seating:
+            # a ticket moved out of a seat map gives its seat back
+            release_seats([existing[(t.event_id, t.member_code)][0] for t in plain if (t.event_id, t.member_code) in existing])
+        self.write(plain)
+        written = list(plain)
+        for index, ticket in seated.items():
+            try:
+                with transaction.atomic():
+                    self.write([ticket])
+                    release_seat(ticket)
+                    claim_seat(ticket)
+            except SeatUnavailable as exc:
+                self.report['errors'][lines[index]] = {'seat': [str(exc)]}
+            else:
+                written.append(ticket)
+        deltas, moves = new_deltas(), []
+        for ticket in written:
+            previous = existing.get((ticket.event_id, ticket.member_code))
+            state = ticket.sales_state()
+            if previous:
+                pk, (_, status, amount), values = previous
+                if 'order' in self.update_fields:
+                    # bulk_create sends no post_save, record_left_scope's tombstones are written here
+                    moves.append((pk, dict(zip(self.attnames, values))['order_id'], ticket.order_id))
+                add_state(deltas, previous[1], -1)
+                # columns missing from the file kept their stored values
+                state = (
+                    ticket.event_id,
+                    ticket.status if 'status' in self.update_fields else status,
+                    ticket.selling_price_amount if 'selling_price_amount' in self.update_fields else amount,
+                )
+            add_state(deltas, state, 1)
+            self.report['updated' if previous else 'created'] += 1
+        apply_deltas(deltas)
+        record_moved_tickets(moves)
+
+    def write(self, tickets):
+        # the primary keys come back from RETURNING, inserted or updated
+        Ticket.objects.bulk_create(
+            tickets, batch_size=CHUNK_SIZE,
+            update_conflicts=True, unique_fields=list(KEY), update_fields=self.update_fields + ['updated_at'],
+        )
+
+
+def import_tickets(file, file_type, event=None, dry_run=False):
+    """
+    Create or update tickets from a CSV or XLSX file opened in binary mode, matched on (event, member_code).
+    event fills the event column when the file has none. Returns {'created', 'updated', 'unchanged', 'errors': {line: errors}}.
+    """
+    header, rows = (xlsx_rows if file_type == 'xlsx' else csv_rows)(file)
+    return TicketImport(header, event, dry_run).run(rows)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Seat, Zone
+
+SEAT_HOLD_TTL = timedelta(seconds=getattr(settings, 'SEAT_HOLD_TTL_SECONDS', 600))
+
+
+class SeatUnavailable(Exception):
+    pass
+
+
+def free_seats_q(now=None):
+    """Seats that can be taken: available, or held with an expired hold."""
+    now = now or timezone.now()
+    return Q(status=Seat.STATUS_AVAILABLE) | Q(status=Seat.STATUS_HELD, hold_expires_at__lt=now)
+
+
+def create_seats(zone, rows, seats_per_row):
+    """Create the seats of a zone, rows is a list of row labels, seats are numbered from 1."""
+    return Seat.objects.bulk_create(
+        [
+            Seat(event_id=zone.event_id, zone=zone, row=row, number=str(number))
+            for row in rows
+            for number in range(1, seats_per_row + 1)
+        ],
+        batch_size=1000,
+    )
+
+
+def availability(event):
+    """Per zone seat counts for an event, in one grouped query."""
+    now = timezone.now()
+    free = free_seats_q(now)
+    return list(
+        Seat.objects.filter(event=event)
+        .values('zone__name')
+        .annotate(
+            available=Count('id', filter=free),
+            held=Count('id', filter=Q(status=Seat.STATUS_HELD, hold_expires_at__gte=now)),
+            sold=Count('id', filter=Q(status=Seat.STATUS_SOLD)),
+        )
+        .order_by('zone__name')
+    )
+
+
+def hold_seats(event, zone_name, quantity, customer=None, ttl=None):
+    """
+    Hold `quantity` free seats in a zone for `ttl`.
+    Rows already locked by a concurrent hold are skipped (SKIP LOCKED) instead of waited on,
+    so parallel buyers each get different seats without a global lock.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        seats = list(
+            Seat.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(free_seats_q(now), event=event, zone__name=zone_name)
+            .order_by('id')[:quantity]
+        )
+        if len(seats) < quantity:
+            raise SeatUnavailable(f"Only {len(seats)} seats left in {zone_name}.")
+        expires_at = now + (ttl or SEAT_HOLD_TTL)
+        customer_id = customer.pk if customer is not None else None
+        Seat.objects.filter(id__in=[seat.id for seat in seats]).update(
+            status=Seat.STATUS_HELD, held_by_id=customer_id, hold_expires_at=expires_at,
+        )
+    for seat in seats:
+        seat.status, seat.held_by_id, seat.hold_expires_at = Seat.STATUS_HELD, customer_id, expires_at
+    return seats
+
+
+def claim_seat(ticket, customer=None):
+    """
+    Mark the seat named by ticket.zone/row/seat as sold to the ticket.
+    A single conditional UPDATE decides the race: it only matches a free seat or one held by the same customer.
+    A ticket not inserted yet gets the seat sold without a link to it, link_seats adds the link after the insert.
+    Returns False for events without a seat map (free text zone/row/seat), raises SeatUnavailable otherwise.
+    """
+    if not (ticket.event_id and ticket.zone):
+        return False
+    zone_id = Zone.objects.filter(event_id=ticket.event_id, name=ticket.zone).values_list('id', flat=True).first()
+    if zone_id is None:
+        return False
+    if not (ticket.row and ticket.seat):
+        raise SeatUnavailable(f"Choose a row and seat in {ticket.zone}.")
+    held_by_customer = Q(status=Seat.STATUS_HELD, held_by_id=customer.pk) if customer is not None else Q(pk__in=[])
+    claimed = Seat.objects.filter(
+        free_seats_q() | held_by_customer,
+        zone_id=zone_id, row=ticket.row, number=ticket.seat,
+    ).update(status=Seat.STATUS_SOLD, ticket_id=ticket.pk, held_by=None, hold_expires_at=None)
+    if not claimed:
+        raise SeatUnavailable(f"Seat {ticket.zone} {ticket.row}-{ticket.seat} is not available.")
+    return True
+
+
+def link_seats(tickets):
+    """Point the seats claimed for tickets before they were inserted at the inserted tickets."""
+    for ticket in tickets:
+        Seat.objects.filter(
+            event_id=ticket.event_id, zone__name=ticket.zone, row=ticket.row, number=ticket.seat, status=Seat.STATUS_SOLD, ticket=None,
+        ).update(ticket=ticket)
+
+
+def seated_zones(tickets):
+    """(event_id, zone name) pairs with a seat map among the tickets' zones, in one query. Their tickets must claim a seat."""
+    return set(
+        Zone.objects.filter(event_id__in={ticket.event_id for ticket in tickets if ticket.zone})
+        .values_list('event_id', 'name')
+    )
+
+
+def release_seat(ticket):
+    """Put the seat sold to a ticket back on sale."""
+    return release_seats([ticket.pk])
+
+
+def release_seats(ticket_ids):
+    """Put the seats sold to these tickets back on sale, in one UPDATE."""
+    return Seat.objects.filter(ticket_id__in=ticket_ids).update(
+        status=Seat.STATUS_AVAILABLE, ticket=None, held_by=None, hold_expires_at=None,
+    )
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from ticketapp.benchmarks import SCENARIOS, bench_customers, compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the benchmark scenarios (catalog browsing, login/refresh churn, on-sale purchase, admin listing) "
+        "against the data from seed_bench_data, report throughput and p50/p95/p99 per endpoint, and compare with "
+        "a JSON baseline: exits with an error when an endpoint regressed. Purchases are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=list(SCENARIOS), help='only this scenario (repeatable)')
+        parser.add_argument('--iterations', type=int, default=50, help='timed runs of each scenario per round')
+        parser.add_argument('--rounds', type=int, default=3, help='the report keeps the median of the rounds')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=22)
+        parser.add_argument('--baseline', default='bench_baseline.json', help='JSON baseline to compare with (or to write)')
+        parser.add_argument('--save', action='store_true', help='write the report as the new baseline instead of comparing')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown that counts as a regression (0.2 = 20%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0, help='smaller latency changes never count')
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+    def handle(self, *args, **options):
+        if not bench_customers().exists():
+            raise CommandError("No bench data, run manage.py seed_bench_data first")
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            report = run(APIClient(), options['scenarios'] or list(SCENARIOS), options['iterations'], options['rounds'], options['warmup'], options['seed'])
+            transaction.set_rollback(True)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            out = self.stderr  # keep stdout parseable
+        else:
+            self.print_report(report)
+            out = self.stdout
+
+        path = Path(options['baseline'])
+        if options['save']:
+            path.write_text(json.dumps(report, indent=2) + '\n')
+            out.write(f"baseline written to {path}")
+            return
+        if not path.exists():
+            out.write(f"no baseline at {path}, run with --save to record one")
+            return
+        regressions, improvements, warnings = compare(json.loads(path.read_text()), report, options['tolerance'], options['min_delta_ms'])
+        for warning in warnings:
+            self.stderr.write(f"warning: {warning}")
+        for endpoint, metric, before, now in improvements:
+            out.write(self.style.SUCCESS(f"faster     {endpoint:<32} {metric:<10} {before} -> {now}"))
+        for endpoint, metric, before, now in regressions:
+            out.write(self.style.ERROR(f"regression {endpoint:<32} {metric:<10} {before} -> {now}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {path}")
+        out.write(f"no regressions against {path} (tolerance {options['tolerance']:.0%})")
+
+    def print_report(self, report):
+        self.stdout.write(f"{'':<32} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for section in ('scenarios', 'endpoints'):
+            for name, row in report[section].items():
+                self.stdout.write(
+                    f"{name:<32} {row['requests']:>8} {row['errors']:>6} {row['req_per_s']:>8} "
+                    f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}"
+                )
+            self.stdout.write('')
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from ticketapp.authentication import ClaimsJWTAuthentication, tokens_for
+from ticketapp.models import Customer
+from ticketapp.views import OrderViewSet
+
+
+class Command(BaseCommand):
+    help = "Compare req/s of GET /api/orders/ with SimpleJWT's JWTAuthentication and ClaimsJWTAuthentication (data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            user = Customer.objects.create_user('bench-auth@example.com', 'bench-password', name='Bench', is_active=True, email_verified=True)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for(user).access_token}')
+            original = OrderViewSet.authentication_classes
+            try:
+                for authentication in (JWTAuthentication, ClaimsJWTAuthentication):
+                    OrderViewSet.authentication_classes = [authentication]
+                    client.get('/api/orders/')  # warm up caches
+                    queries = []
+                    # counted with a wrapper: request_started resets connection.queries_log
+                    with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+                        client.get('/api/orders/')
+                    start = time.perf_counter()
+                    for _ in range(options['requests']):
+                        client.get('/api/orders/')
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{authentication.__name__:<26} {options['requests'] / elapsed:8.0f} req/s  "
+                        f"{len(queries)} queries/request"
+                    )
+            finally:
+                OrderViewSet.authentication_classes = original
+            transaction.set_rollback(True)
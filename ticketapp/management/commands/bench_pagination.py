@@ -0,0 +1,55 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from ticketapp.cache import bump_version
+from ticketapp.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the first page and a cursor page of /api/events/ as the table grows (data is rolled back afterwards). "
+        "The catalog cache is bypassed unless --cached: a repeated GET is otherwise a cache hit that never reaches the query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='comma separated table sizes')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--cached', action='store_true', help='time cache hits instead of the database')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',')]
+        client = APIClient()
+        url = f"/api/events/?page_size={options['page_size']}"
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            created = 0
+            for size in sizes:
+                Event.objects.bulk_create(
+                    [Event(event_name=f'Bench event {i}', event_location='Bench') for i in range(created, size)],
+                    batch_size=5000,
+                )
+                created = size
+                bump_version(Event)  # bulk_create sends no signal, cached pages would still show the smaller table
+                first = self.time_request(client, url, options['repeat'], options['cached'])
+                # walk a few pages in to time a request that carries a cursor
+                next_url = url
+                for _ in range(5):
+                    next_url = client.get(next_url).json()['next'] or next_url
+                cursor = self.time_request(client, next_url, options['repeat'], options['cached'])
+                self.stdout.write(f"{size:>9} rows  first page {first:7.2f} ms  cursor page {cursor:7.2f} ms")
+            transaction.set_rollback(True)
+        bump_version(Event)  # drop the pages cached from the rolled back rows
+
+    def time_request(self, client, url, repeat, cached=False):
+        if cached:
+            client.get(url)  # fill the cache
+        total = 0
+        for _ in range(repeat):
+            if not cached:
+                bump_version(Event)  # a new version is a cache miss: the request runs the query and serializes the page
+            start = time.perf_counter()
+            client.get(url)
+            total += time.perf_counter() - start
+        return total * 1000 / repeat
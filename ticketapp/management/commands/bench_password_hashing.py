@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password, verify_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from ticketapp import passwords
+from ticketapp.models import Customer
+
+PASSWORD = 'bench-Password-123'
+COST = ('iterations', 'work_factor', 'block_size', 'memory_cost', 'time_cost', 'parallelism')  # keys of hasher.decode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Password checks per second per core under each hashing policy (PASSWORD_HASHER with the cost settings), "
+        "on one thread and on --threads threads, and the cost of a login answered from the verified cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policies', default=','.join(settings.PASSWORD_HASHER_PATHS), help='comma separated PASSWORD_HASHER values')
+        parser.add_argument('--seconds', type=float, default=5, help='per policy and thread count')
+        parser.add_argument('--threads', type=int, default=settings.PASSWORD_HASH_WORKERS)
+
+    def handle(self, *args, **options):
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        self.stdout.write(f"{cores} cores available, {options['threads']} threads")
+        self.stdout.write(f"{'policy':<8} {'cost':<48} {'check ms':>9} {'1 thread/s':>11} {'n threads/s':>12} {'per core/s':>11} {'cached us':>10}")
+        for policy in options['policies'].split(','):
+            if policy not in settings.PASSWORD_HASHER_PATHS:
+                raise CommandError(f"Unknown policy {policy!r}, choose from {', '.join(settings.PASSWORD_HASHER_PATHS)}")
+            first = settings.PASSWORD_HASHER_PATHS[policy]
+            with override_settings(PASSWORD_HASHERS=[first] + [path for path in settings.PASSWORD_HASHERS if path != first]):
+                try:
+                    encoded = make_password(PASSWORD)
+                except ValueError as exc:  # argon2-cffi not installed
+                    self.stdout.write(f"{policy:<8} skipped: {exc}")
+                    continue
+                cost = ' '.join(f'{key}={value}' for key, value in identify_hasher(encoded).decode(encoded).items() if key in COST)
+                single = self.rate(encoded, 1, options['seconds'])
+                parallel = self.rate(encoded, options['threads'], options['seconds'])
+                self.stdout.write(
+                    f"{policy:<8} {cost:<48} {1000 / single:>9.1f} {single:>11.1f} {parallel:>12.1f} "
+                    f"{parallel / min(options['threads'], cores):>11.1f} {self.cached(encoded):>10.1f}"
+                )
+
+    def rate(self, encoded, threads, seconds):
+        """Checks per second with `threads` threads checking back to back."""
+        done = []
+        deadline = time.perf_counter() + seconds
+        lock = threading.Lock()
+
+        def check():
+            count = 0
+            while time.perf_counter() < deadline:
+                verify_password(PASSWORD, encoded)
+                count += 1
+            with lock:
+                done.append(count)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            for _ in range(threads):
+                pool.submit(check)
+        return sum(done) / (time.perf_counter() - start)
+
+    def cached(self, encoded):
+        """Microseconds per login that the verified cache answers (the first check fills it)."""
+        user = Customer(pk=0, email='bench@example.com', password=encoded)
+        with override_settings(LOGIN_CACHE_SECONDS=60):
+            passwords.check_password(user, PASSWORD)
+            start = time.perf_counter()
+            for _ in range(10000):
+                passwords.check_password(user, PASSWORD)
+            elapsed = time.perf_counter() - start
+        passwords.verified.clear()
+        return elapsed * 1e6 / 10000
@@ -0,0 +1,79 @@
+import random
+import time
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from ticketapp.models import Category, Event
+from ticketapp.search import SEARCH_CONFIG, search_vector, search_words, update_vectors
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ze', 'tu', 'no', 'vi', 'sha', 'pen']
+GROUPS = ['Orchestra', 'Band', 'Collective', 'Quartet', 'Choir', 'Ensemble']
+KINDS = ['Live', 'World Tour', 'Festival', 'Night', 'Showcase']
+CITIES = ['Yangon', 'Mandalay', 'Bangkok', 'Singapore', 'Kuala Lumpur', 'Hanoi', 'Manila', 'Jakarta']
+CATEGORIES = ['Concert', 'Theatre', 'Football', 'Comedy', 'Conference', 'Exhibition']
+TERMS = ['kalomi', 'kalo', 'kalmi', 'kalomi quartet', 'bangkok football', 'world tour', 'nothingmatches']
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ?search= on /api/events/ over synthetic events, and on PostgreSQL the same match with the "
+        "vectors computed at read time (data is rolled back afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(20)
+        names = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]  # 1000 made up artists
+        client = APIClient()
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            categories = [Category.objects.create(category_name=name) for name in CATEGORIES]
+            start = time.perf_counter()
+            Event.objects.bulk_create([
+                Event(
+                    event_name=f'{rng.choice(names).title()} {rng.choice(GROUPS)} {rng.choice(KINDS)} {2020 + i % 7}',
+                    event_location=rng.choice(CITIES), category=rng.choice(categories),
+                ) for i in range(options['events'])
+            ], batch_size=5000)
+            created = time.perf_counter() - start
+            start = time.perf_counter()
+            for category in categories:  # bulk_create skips save(), fill the vectors as the migration does
+                update_vectors(Event.objects.filter(category=category), category.category_name)
+            self.stdout.write(f"{options['events']} events created in {created:.1f}s, vectors written in {time.perf_counter() - start:.1f}s")
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE ticketapp_event')
+
+            for term in TERMS:
+                url = f'/api/events/?search={term}&page_size=20'
+                response = client.get(url)
+                top = [event['event_name'] for event in response.json()['results'][:2]]
+                line = f"{term!r:>20}  api {self.time_request(client, url, options['repeat']):7.2f} ms"
+                if connection.vendor == 'postgresql':
+                    line += f"  read time vectors {self.time_read_time(term, options['repeat']):8.2f} ms"
+                self.stdout.write(f"{line}  top: {top}")
+            transaction.set_rollback(True)
+
+    def time_request(self, client, url, repeat):
+        start = time.perf_counter()
+        for count in range(repeat):
+            client.get(f'{url}&nocache={count}')  # a new URL each time, or the catalog cache answers
+        return (time.perf_counter() - start) * 1000 / repeat
+
+    def time_read_time(self, term, repeat):
+        # the same ranked prefix match without the stored column: to_tsvector for every row on every request
+        query = SearchQuery(' & '.join(f"'{word}':*" for word in search_words(term)), search_type='raw', config=SEARCH_CONFIG)
+        vector = search_vector(F('event_name'), F('event_location'), F('category__category_name'))
+        queryset = (
+            Event.objects.annotate(document=vector).filter(document=query)
+            .annotate(rank=SearchRank(F('document'), query)).order_by('-rank', '-id').values('id', 'event_name')[:20]
+        )
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset)
+        return (time.perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,65 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from ticketapp.models import Event, Order, Ticket
+from ticketapp.readers import ValuesSerializer, values_serializer
+from ticketapp.serializers import TicketSerializer
+
+STATUSES = ['Pending', 'Paid', 'Cancelled']
+
+
+class Command(BaseCommand):
+    help = "Rows/sec serializing tickets with TicketSerializer vs .values() + ValuesSerializer (data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3, help='best of n runs')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['tickets'])
+            self.compare(options['tickets'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        event = Event.objects.create(event_name='Serializer bench', event_location='Yangon', ticket_price={'VIP': '150000 MMK'})
+        order = Order.objects.create(event=event)
+        tickets = [
+            Ticket(
+                passport_name=f'Passport {i}', facebook_name=f'Facebook {i}', member_code=f'M{i}', status=STATUSES[i % 3],
+                selling_price=f'{50000 + i % 7 * 1000} MMK', customer_payment='50,000', payment_date='2025-03-01',
+                zone='VIP', row=str(i % 40), seat=str(i % 60), event=event, order=order,
+            )
+            for i in range(count)
+        ]
+        for ticket in tickets:
+            ticket.sync_typed_fields()
+        Ticket.objects.bulk_create(tickets, batch_size=2000)
+
+    def best(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def compare(self, count, repeat):
+        queryset = Ticket.objects.order_by('-id')
+        fields = values_serializer(TicketSerializer).fields
+        columns = [column for _, column, _ in fields]
+        instances = list(queryset)
+        rows = list(queryset.values(*columns))
+        runs = {
+            'TicketSerializer, serialize only': lambda: TicketSerializer(instances, many=True).data,
+            'ValuesSerializer, serialize only': lambda: ValuesSerializer.represent(rows, fields),
+            'TicketSerializer, query + serialize': lambda: TicketSerializer(list(queryset), many=True).data,
+            'ValuesSerializer, query + serialize': lambda: ValuesSerializer.represent(queryset.values(*columns), fields),
+        }
+        outputs = {}
+        for name, function in runs.items():
+            elapsed, outputs[name] = self.best(function, repeat)
+            self.stdout.write(f"{name:<38} {count / elapsed:10.0f} rows/s  ({elapsed * 1000:.0f} ms)")
+        if [dict(item) for item in outputs['TicketSerializer, serialize only']] != outputs['ValuesSerializer, serialize only']:
+            raise CommandError("ValuesSerializer output differs from TicketSerializer")
+        self.stdout.write(self.style.SUCCESS("outputs identical"))
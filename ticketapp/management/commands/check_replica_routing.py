@@ -0,0 +1,62 @@
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from ticketapp.authentication import tokens_for
+from ticketapp.cache import bump_version
+from ticketapp.models import Customer, Event, Order
+from ticketapp.routers import REPLICA
+
+
+class Command(BaseCommand):
+    help = (
+        "Send API requests through ReplicaRouter and check which database alias each one's queries used. "
+        "Needs a 'replica' alias (DB_REPLICA_HOST), locally it can point at the primary database. "
+        "Rows it creates are deleted afterwards."
+    )
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError("no 'replica' database configured, set DB_REPLICA_HOST")
+        self.failures = []
+        customer = Customer.objects.create_user('routing-check@example.com', 'routing-check', name='Routing', is_active=True, is_staff=True, email_verified=True)
+        event = Event.objects.create(event_name='Routing check', event_location='Routing')
+        try:
+            self.run_checks(customer, event)
+        finally:
+            Order.objects.filter(customer=customer).delete()
+            event.delete()
+            customer.delete()
+        if self.failures:
+            raise CommandError(f"misrouted: {', '.join(self.failures)}")
+        self.stdout.write(self.style.SUCCESS("routing ok"))
+
+    def run_checks(self, customer, event):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for(customer).access_token}')
+        with override_settings(ALLOWED_HOSTS=['testserver'], REPLICA_LAG_SECONDS=0):
+            bump_version(Event)  # skip the catalog cache
+            self.expect('catalog list', lambda: client.get('/api/events/'), {REPLICA})
+            self.expect('catalog detail', lambda: client.get(f'/api/events/{event.pk}/'), {REPLICA})
+            self.expect('sales report', lambda: client.get(f'/api/events/{event.pk}/sales/'), {DEFAULT_DB_ALIAS, REPLICA})
+            self.expect('order create', lambda: client.post('/api/orders/', {'event': event.pk}), {DEFAULT_DB_ALIAS})
+            self.expect('order list after write', lambda: client.get('/api/orders/'), {DEFAULT_DB_ALIAS})
+        with override_settings(ALLOWED_HOSTS=['testserver'], REPLICA_LAG_SECONDS=60):
+            bump_version(Event)
+            self.expect('catalog list right after a change', lambda: client.get('/api/events/'), {DEFAULT_DB_ALIAS})
+
+    def expect(self, name, request, aliases):
+        used = Counter()
+        with ExitStack() as stack:
+            for alias in (DEFAULT_DB_ALIAS, REPLICA):
+                stack.enter_context(connections[alias].execute_wrapper(
+                    lambda execute, sql, params, many, context, alias=alias: used.update([alias]) or execute(sql, params, many, context)
+                ))
+            response = request()
+        ok = set(used) <= aliases and response.status_code < 400
+        if not ok:
+            self.failures.append(name)
+        self.stdout.write(f"{'ok  ' if ok else 'FAIL'}  {name:<36} HTTP {response.status_code}  {dict(used)}")
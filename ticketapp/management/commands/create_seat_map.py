@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from ticketapp.inventory import create_seats
+from ticketapp.models import Event, Zone
+
+
+class Command(BaseCommand):
+    help = "Create a zone with rows of numbered seats for an event, e.g. create_seat_map 3 VIP --rows A,B,C --seats-per-row 20"
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('zone')
+        parser.add_argument('--rows', required=True, help='comma separated row labels')
+        parser.add_argument('--seats-per-row', type=int, required=True)
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event_id']} does not exist")
+        rows = [row.strip() for row in options['rows'].split(',') if row.strip()]
+        with transaction.atomic():
+            zone, _ = Zone.objects.get_or_create(event=event, name=options['zone'])
+            seats = create_seats(zone, rows, options['seats_per_row'])
+        self.stdout.write(f"created {len(seats)} seats in {zone}")
@@ -0,0 +1,111 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from ticketapp.models import Customer, Event, Order, Ticket
+from ticketapp.views import OrderViewSet, TicketViewSet
+
+LARGE_TABLES = ('ticketapp_ticket', 'ticketapp_order', 'ticketapp_customer')
+STATUSES = ['Pending', 'Paid', 'Paid', 'Paid', 'Cancelled']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic volumes (rolled back afterwards), EXPLAIN the querysets OrderViewSet/TicketViewSet "
+        "run for their hot paths and fail if any of them sequentially scans a large table. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--tickets', type=int, default=300000)
+        parser.add_argument('--verbose-plans', action='store_true', help='print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("explain_hot_queries needs PostgreSQL, SQLite plans say nothing about production")
+        with transaction.atomic():
+            self.seed(options)
+            failures = self.check_plans(options['verbose_plans'])
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(f"sequential scan on a large table in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("all hot queries use indexes"))
+
+    def seed(self, options):
+        self.stdout.write("seeding...")
+        events = Event.objects.bulk_create(
+            [Event(event_name=f'Event {i}', event_location='Yangon') for i in range(50)]
+        )
+        Customer.objects.bulk_create(
+            [Customer(email=f'explain{i}@example.com', name=f'Customer {i}', password='!') for i in range(options['customers'])],
+            batch_size=5000,
+        )
+        customer_ids = list(Customer.objects.values_list('id', flat=True))
+        Order.objects.bulk_create(
+            [Order(customer_id=customer_ids[i % len(customer_ids)], event=events[i % len(events)]) for i in range(options['orders'])],
+            batch_size=5000,
+        )
+        order_ids = list(Order.objects.values_list('id', flat=True))
+        Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    passport_name=f'Passport {i}', facebook_name=f'Facebook {i}',
+                    status=STATUSES[i % len(STATUSES)], order_id=order_ids[i % len(order_ids)],
+                    event=events[i % len(events)], zone=f'Zone {i % 8}', row=str(i % 40), seat=str(i % 60),
+                )
+                for i in range(options['tickets'])
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            for table in LARGE_TABLES:
+                cursor.execute(f'ANALYZE {table}')
+        self.customer = Customer.objects.order_by('id')[len(customer_ids) // 2]
+        self.admin = Customer(id=0, email='admin@example.com', is_staff=True, is_superuser=True)
+        self.event = events[7]
+        self.order = Order.objects.filter(customer=self.customer).first()
+        self.ticket = Ticket.objects.filter(order=self.order).first()
+
+    def viewset_queryset(self, viewset, user, query='', pk=None):
+        """The queryset a ViewSet list (or detail, with pk) would run, including filters and the first page."""
+        request = APIRequestFactory().get(f'/?{query}')
+        view = viewset()
+        view.request = Request(request, authenticators=[])
+        view.request.user = user
+        view.format_kwarg = None
+        view.action = 'retrieve' if pk else 'list'
+        view.kwargs = {'pk': pk} if pk else {}
+        queryset = view.filter_queryset(view.get_queryset())
+        if pk:
+            return queryset.filter(pk=pk)
+        return queryset.order_by('-id')[:51]
+
+    def hot_queries(self):
+        return {
+            'customer order list': self.viewset_queryset(OrderViewSet, self.customer),
+            'customer order detail': self.viewset_queryset(OrderViewSet, self.customer, pk=self.order.pk),
+            'customer ticket list': self.viewset_queryset(TicketViewSet, self.customer),
+            'customer ticket detail': self.viewset_queryset(TicketViewSet, self.customer, pk=self.ticket.pk),
+            'admin ticket list by status': self.viewset_queryset(TicketViewSet, self.admin, 'status=Cancelled'),
+            'admin pending tickets of an event': self.viewset_queryset(TicketViewSet, self.admin, f'event={self.event.pk}&status=Pending'),
+            'tickets of an order by status': Ticket.objects.filter(order=self.order, status='Paid'),
+            'ticket by seat': Ticket.objects.filter(event=self.event, zone='Zone 3', row='11', seat='7'),
+            'orders in a time range': Order.objects.filter(order_time__gte=self.order.order_time).order_by('order_time')[:51],
+            'customer order history': Order.objects.filter(customer=self.customer).order_by('-order_time')[:51],
+        }
+
+    def check_plans(self, verbose):
+        failures = []
+        seq_scan = re.compile(r'Seq Scan on (%s)\b' % '|'.join(LARGE_TABLES))
+        for name, queryset in self.hot_queries().items():
+            plan = queryset.explain()
+            failed = seq_scan.search(plan)
+            if failed:
+                failures.append(name)
+            if failed or verbose:
+                self.stdout.write(f"{'FAIL' if failed else 'ok'}  {name}\n{plan}\n")
+            else:
+                self.stdout.write(f"ok    {name}")
+        return failures
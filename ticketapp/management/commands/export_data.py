@@ -0,0 +1,30 @@
+import sys
+from datetime import date
+from django.core.management.base import BaseCommand
+from ticketapp.exports import EXPORTS, FORMATS, chunks, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream tickets or orders as CSV or JSONL to a file or stdout, with constant memory (same columns as /api/<kind>/export/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--output', choices=list(FORMATS), default='csv')
+        parser.add_argument('--file', help='write here instead of stdout')
+        parser.add_argument('--event', type=int)
+        parser.add_argument('--status', help='tickets only')
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='YYYY-MM-DD, tickets by paid_on, orders by order_time')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        header, rows = export_rows(
+            options['kind'], event=options['event'], status=options['status'],
+            date_from=options['date_from'], date_to=options['date_to'],
+        )
+        out = open(options['file'], 'w', encoding='utf-8', newline='') if options['file'] else sys.stdout
+        try:
+            for chunk in chunks(options['output'], header, rows):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
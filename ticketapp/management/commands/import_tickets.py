@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ticketapp.imports import FORMATS, ImportFileError, file_format, import_tickets
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update tickets from a CSV or XLSX file, matched on (event, member_code). "
+        "Columns as in export_data tickets; rows with errors are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+        parser.add_argument('--event', type=int, help='event id for rows without an event column')
+        parser.add_argument('--dry-run', action='store_true', help='validate and write, then roll everything back')
+        parser.add_argument('--max-errors', type=int, default=100, help='row errors to print (all are counted)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            file_type = options['format'] or file_format(options['file'])
+            with open(options['file'], 'rb') as file:
+                report = import_tickets(file, file_type, event=options['event'], dry_run=options['dry_run'])
+        except (ImportFileError, OSError) as exc:
+            raise CommandError(exc)
+        errors = report['errors']
+        for line, detail in sorted(errors.items())[:options['max_errors']]:
+            self.stderr.write(f"line {line}: {detail}")
+        if len(errors) > options['max_errors']:
+            self.stderr.write(f"... {len(errors) - options['max_errors']} more")
+        summary = (
+            f"{report['created']} created, {report['updated']} updated, {report['unchanged']} unchanged, {len(errors)} rows with errors "
+            f"in {time.perf_counter() - start:.1f}s{' (dry run, rolled back)' if options['dry_run'] else ''}"
+        )
+        self.stdout.write(self.style.WARNING(summary) if errors else self.style.SUCCESS(summary))
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from ticketapp.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server (WSGI or ASGI deployment) with fast clients measuring latency while slow clients "
+        "trickle their requests byte by byte, the way mobile connections tie up sync workers. "
+        "Run it once against each deployment with the same options and compare the reports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='server base url, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--path', default='/api/events/', help='path the fast clients GET')
+        parser.add_argument('--clients', type=int, default=20, help='concurrent fast clients')
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument('--slow-delay', type=float, default=0.5, help='seconds between the bytes a slow client sends')
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--timeout', type=float, default=10, help='seconds before a fast request counts as failed')
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("url must look like http://host:port")
+        self.host, self.port = url.hostname, url.port or 80
+        report = asyncio.run(self.run(options))
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        for name, value in report.items():
+            self.stdout.write(f"{name:<18} {value}")
+
+    async def run(self, options):
+        latencies, errors = [], []
+        deadline = time.monotonic() + options['duration']
+        slow = [asyncio.create_task(self.slow_client(deadline, options['slow_delay'])) for _ in range(options['slow_clients'])]
+        await asyncio.sleep(min(2, options['duration'] / 4))  # let the slow clients occupy the server first
+        fast = [
+            asyncio.create_task(self.fast_client(deadline, options['path'], options['timeout'], latencies, errors))
+            for _ in range(options['clients'])
+        ]
+        await asyncio.gather(*fast)
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        elapsed = options['duration'] - min(2, options['duration'] / 4)
+        return {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'req_per_s': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(max(latencies, default=float('nan')) * 1000, 1),
+            'error_kinds': sorted(set(errors)),
+        }
+
+    def request_bytes(self, path):
+        return (
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            "Accept: application/json\r\nConnection: close\r\n\r\n"
+        ).encode()
+
+    async def fast_client(self, deadline, path, timeout, latencies, errors):
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                status = await asyncio.wait_for(self.fetch(path), timeout)
+            except (OSError, asyncio.TimeoutError) as exc:
+                errors.append(type(exc).__name__)
+                continue
+            if status == 200:
+                latencies.append(time.monotonic() - start)
+            else:
+                errors.append(f'HTTP {status}')
+
+    async def fetch(self, path):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(self.request_bytes(path))
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()  # Connection: close, read until EOF
+            return int(status_line.split()[1]) if status_line else 0
+        finally:
+            writer.close()
+
+    async def slow_client(self, deadline, delay):
+        # reconnects until the deadline, each connection sends one request a byte at a time
+        while time.monotonic() < deadline:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                for byte in self.request_bytes('/api/banners/'):
+                    writer.write(bytes([byte]))
+                    await writer.drain()
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                await reader.read()
+                writer.close()
+            except OSError:
+                await asyncio.sleep(delay)
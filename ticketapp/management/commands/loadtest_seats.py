@@ -0,0 +1,67 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ticketapp.inventory import SeatUnavailable, create_seats, hold_seats
+from ticketapp.models import Event, Seat, Zone
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent seat holds at a throwaway event until it sells out, then check that no seat was handed out twice. "
+        "Needs PostgreSQL: SQLite serialises writers and has no SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--quantity', type=int, default=2, help='seats per hold')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("loadtest_seats needs PostgreSQL")
+        event = Event.objects.create(event_name='Seat load test', event_location='Load test')
+        try:
+            zone = Zone.objects.create(event=event, name='LOAD')
+            per_row = 50
+            rows = [f'R{i}' for i in range(-(-options['seats'] // per_row))]
+            create_seats(zone, rows, per_row)
+            total = Seat.objects.filter(zone=zone).count()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['workers']) as pool:
+                results = list(pool.map(lambda _: self.buy_until_sold_out(event, options['quantity']), range(options['workers'])))
+            elapsed = time.perf_counter() - start
+
+            held = [seat_id for seat_ids, _ in results for seat_id in seat_ids]
+            attempts = sum(count for _, count in results)
+            duplicates = [seat_id for seat_id, count in Counter(held).items() if count > 1]
+            self.stdout.write(
+                f"{options['workers']} workers, {attempts} holds in {elapsed:.2f}s ({attempts / elapsed:.0f} holds/s), "
+                f"{len(held)}/{total} seats held"
+            )
+            if duplicates:
+                raise CommandError(f"{len(duplicates)} seats were held twice: {duplicates[:10]}")
+            if Seat.objects.filter(zone=zone, status=Seat.STATUS_HELD).count() != len(held):
+                raise CommandError("seat table does not match the holds handed out")
+            self.stdout.write(self.style.SUCCESS("no double booking"))
+        finally:
+            event.delete()
+
+    def buy_until_sold_out(self, event, quantity):
+        seat_ids, attempts = [], 0
+        try:
+            while True:
+                attempts += 1
+                try:
+                    seats = hold_seats(event, 'LOAD', quantity)
+                except SeatUnavailable:
+                    # seats may only be locked by another worker, retry one at a time before giving up
+                    if quantity == 1:
+                        return seat_ids, attempts
+                    quantity = 1
+                    continue
+                seat_ids.extend(seat.id for seat in seats)
+        finally:
+            connection.close()  # each worker thread opened its own connection
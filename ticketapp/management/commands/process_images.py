@@ -0,0 +1,113 @@
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ticketapp.cache import bump_version
+from ticketapp.images import NAME, ImageError, ingest_many, variant_name, variant_sizes
+from ticketapp.models import Banner, Category, Event
+from ticketapp.parsing import json_leaves
+from ticketapp.routers import primary
+
+IMAGE_FIELDS = ((Banner, 'banner_image'), (Category, 'category_image'), (Event, 'event_image'))
+
+
+def missing_variants(name):
+    """True when an uploaded image lacks one of the variants of the current recipe."""
+    storage = storages['images']
+    width, height = map(int, NAME.search(name).groups())
+    return any(not storage.exists(variant_name(name, size)) for size, _ in variant_sizes(width, height))
+
+
+def replace_leaves(data, replacements):
+    """A copy of a JSON value with the strings found in replacements swapped for their replacement."""
+    if isinstance(data, dict):
+        return {key: replace_leaves(value, replacements) for key, value in data.items()}
+    if isinstance(data, list):
+        return [replace_leaves(item, replacements) for item in data]
+    if isinstance(data, str):
+        return replacements.get(data, data)
+    return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the banner, category and event images into the image pipeline: remote http(s) images are "
+        "downloaded, stored with their resized WebP variants and their JSON field pointed at the stored copy; "
+        "uploaded images missing variants (after a recipe change) get them. Safe to run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='list what would be done without downloading or writing')
+        parser.add_argument('--download-threads', type=int, default=8)
+        parser.add_argument('--timeout', type=float, default=20, help='seconds per download')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with primary():
+            rows = [
+                (model, field, pk, data)
+                for model, field in IMAGE_FIELDS
+                for pk, data in model.objects.exclude(**{f'{field}__isnull': True}).values_list('pk', field)
+            ]
+        remote, uploaded = set(), set()
+        for _, _, _, data in rows:
+            for _, value in json_leaves(data):
+                if not isinstance(value, str):
+                    continue
+                match = NAME.search(value)
+                if match is not None:
+                    uploaded.add(match.group(0))
+                elif value.startswith(('http://', 'https://')):
+                    remote.add(value)
+        stale = sorted(name for name in uploaded if missing_variants(name))
+        self.stdout.write(f"{len(rows)} rows, {len(remote)} remote images, {len(uploaded)} uploaded ({len(stale)} missing variants)")
+        if options['dry_run']:
+            for reference in sorted(remote) + stale:
+                self.stdout.write(f"  {reference}")
+            return
+
+        blobs = []
+        for name in stale:
+            with storages['images'].open(name) as original:
+                blobs.append((name, original.read()))
+        with ThreadPoolExecutor(options['download_threads']) as pool:
+            downloads = list(pool.map(lambda url: (url, self.download(url, options['timeout'])), sorted(remote)))
+        blobs += [(url, data) for url, data in downloads if data is not None]
+        failed = len(remote) + len(stale) - len(blobs)
+
+        replacements, regenerated = {}, 0
+        for reference, image in ingest_many(blobs):
+            if isinstance(image, ImageError):
+                self.stderr.write(f"{reference}: {image}")
+                failed += 1
+            elif reference in remote:
+                replacements[reference] = image['url']
+            else:
+                regenerated += 1
+
+        changed = {}
+        with primary():
+            for model, field, pk, data in rows:
+                updated = replace_leaves(data, replacements)
+                if updated != data:
+                    # an UPDATE per row: Event.save() would rebuild the typed fields and search vector for nothing
+                    model.objects.filter(pk=pk).update(**{field: updated}, updated_at=timezone.now())
+                    changed[model] = changed.get(model, 0) + 1
+        for model in changed:
+            bump_version(model)
+        summary = ', '.join(f"{count} {model._meta.verbose_name_plural}" for model, count in changed.items()) or 'no rows'
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{len(replacements)} remote images stored, {regenerated} regenerated, {failed} failed, "
+            f"{summary} updated in {time.perf_counter() - start:.1f}s"
+        ))
+
+    def download(self, url, timeout):
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.read()
+        except (OSError, ValueError) as exc:
+            self.stderr.write(f"{url}: {exc}")
+            return None
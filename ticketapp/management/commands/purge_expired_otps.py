@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ticketapp.models import OneTimePassword
+
+
+class Command(BaseCommand):
+    help = "Delete expired OTPs (uses the expires_at index, safe to run from cron)."
+
+    def handle(self, *args, **options):
+        deleted = OneTimePassword.objects.purge_expired()
+        self.stdout.write(f"deleted {deleted} expired OTPs")
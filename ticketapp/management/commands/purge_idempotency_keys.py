@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ticketapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete checkout Idempotency-Keys older than IDEMPOTENCY_KEY_TTL_HOURS (safe to run from cron)."
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.objects.purge_expired()
+        self.stdout.write(f"deleted {deleted} expired idempotency keys")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ticketapp.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Delete /api/sync/ tombstones older than SYNC_TOMBSTONE_DAYS (safe to run from cron)."
+
+    def handle(self, *args, **options):
+        deleted = Tombstone.objects.purge_expired()
+        self.stdout.write(f"deleted {deleted} expired tombstones")
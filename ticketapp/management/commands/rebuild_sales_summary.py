@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ticketapp.sales import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild EventSalesSummary from the ticket table (all events, or --event ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='events', help='only this event (repeatable)')
+
+    def handle(self, *args, **options):
+        written = rebuild(options['events'])
+        self.stdout.write(f"wrote {written} summary rows")
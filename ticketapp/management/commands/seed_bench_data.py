@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from ticketapp.benchmarks import ON_SALE_EVENTS, bench_customers, dataset, flush, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with the synthetic data bench_api runs against (ticketapp/benchmarks.py): customers, "
+        "events with JSON image/price payloads, on-sale seat maps, orders and tickets. Use a local database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=200000, help='each with one to three tickets')
+        parser.add_argument('--seed', type=int, default=22, help='the same seed and sizes give the same data')
+        parser.add_argument('--flush', action='store_true', help='delete the existing bench data first')
+
+    def handle(self, *args, **options):
+        if options['events'] <= ON_SALE_EVENTS:
+            raise CommandError(f"--events must be more than {ON_SALE_EVENTS}, the first {ON_SALE_EVENTS} are on sale and take no orders")
+        if options['flush']:
+            flush(self.stdout.write)
+        elif bench_customers().exists():
+            raise CommandError("Bench data already exists, add --flush to replace it")
+        seed(options['customers'], options['events'], options['orders'], options['seed'], self.stdout.write)
+        self.stdout.write(f"bench data: {dataset()}")
@@ -0,0 +1,64 @@
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ticketapp.outbox import dispatch_batch, due_mail, open_connection
+
+
+class Command(BaseCommand):
+    help = "Deliver emails from the outbox. Each worker keeps its own SMTP connection open while there is mail to send."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='number of SMTP connections / worker threads')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=2.0, help='seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='send everything that is due, then exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent, failed = self.run_worker(options)
+            self.stdout.write(f"sent {sent}, failed {failed}")
+            return
+        threads = [
+            threading.Thread(target=self.run_worker, args=(options,), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stdout.write("stopping mail dispatcher")
+
+    def run_worker(self, options):
+        connection = None
+        total_sent = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                if due_mail().exists():
+                    if connection is None:
+                        try:
+                            connection = open_connection()
+                        except Exception as exc:
+                            self.stderr.write(f"could not connect to the mail server: {exc}")
+                            if options['once']:
+                                return total_sent, total_failed
+                            time.sleep(options['interval'])
+                            continue
+                    sent, failed = dispatch_batch(connection, options['batch_size'])
+                    total_sent += sent
+                    total_failed += failed
+                    if sent + failed:
+                        continue
+                # idle: mail servers drop sessions left open, close it rather than send into a dead one later
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                if options['once']:
+                    return total_sent, total_failed
+                time.sleep(options['interval'])
+        finally:
+            if connection is not None:
+                connection.close()
@@ -0,0 +1,173 @@
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.renderers import JSONRenderer
+
+# Request instrumentation. Every request adds its wall time and response size to in-process histograms
+# labelled by resolved view name, method and status, served in Prometheus text format at /metrics.
+# METRICS_SAMPLE_RATE of the requests also count their queries and database time (an execute_wrapper on
+# every connection, see signals.py) and the time spent serializing and rendering, answer with a
+# Server-Timing header and write a JSON log line; requests slower than METRICS_SLOW_MS are always logged.
+# Histograms are per process: with several workers each scrape sees the worker that answered it.
+# Streaming responses (exports) are timed up to their first byte.
+logger = logging.getLogger('ticketapp.requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class RequestStats:
+    """What a sampled request spent, filled in by record_query() and timer()."""
+    __slots__ = ('queries', 'db', 'serialize')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+
+# the sampled request being served (a ContextVar: sync_to_async threads under ASGI see the same stats)
+current = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., count above the last bucket, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(labels, list(values)) for labels, values in self.series.items()]
+        for (view, method, status), values in sorted(series):
+            labels = f'view="{escape(view)}",method="{method}",status="{status}"'
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                total += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {total}')
+        return lines
+
+
+DURATION = Histogram('http_request_duration_seconds', 'Wall time of requests, until the response is returned.', DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size (streaming responses are not counted).', SIZE_BUCKETS)
+QUERIES = Histogram('http_request_db_queries', 'Database queries per request, sampled requests only.', QUERY_BUCKETS)
+DB_TIME = Histogram('http_request_db_seconds', 'Time spent in database queries, sampled requests only.', DURATION_BUCKETS)
+SERIALIZE_TIME = Histogram('http_request_serialize_seconds', 'Time spent serializing and rendering, sampled requests only.', DURATION_BUCKETS)
+HISTOGRAMS = (DURATION, RESPONSE_SIZE, QUERIES, DB_TIME, SERIALIZE_TIME)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper for every connection, a plain call-through outside sampled requests."""
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db += time.perf_counter() - start
+        stats.queries += 1
+
+
+@contextmanager
+def timer():
+    """Count the block as serialization time of the current request, if it is sampled."""
+    stats = current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize += time.perf_counter() - start
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def start_request():
+    stats = RequestStats() if random.random() < settings.METRICS_SAMPLE_RATE else None
+    return time.perf_counter(), stats, current.set(stats)
+
+
+def finish_request(request, response, started):
+    start, stats, token = started
+    elapsed = time.perf_counter() - start
+    current.reset(token)
+    match = request.resolver_match
+    labels = (match.view_name if match else 'unresolved', request.method, str(response.status_code))
+    DURATION.observe(labels, elapsed)
+    size = None if response.streaming else len(response.content)
+    if size is not None:
+        RESPONSE_SIZE.observe(labels, size)
+    if stats is not None:
+        QUERIES.observe(labels, stats.queries)
+        DB_TIME.observe(labels, stats.db)
+        SERIALIZE_TIME.observe(labels, stats.serialize)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db * 1000:.1f};desc="{stats.queries} queries", '
+            f'serialize;dur={stats.serialize * 1000:.1f}, total;dur={elapsed * 1000:.1f}'
+        )
+    level = logging.WARNING if elapsed * 1000 >= settings.METRICS_SLOW_MS else logging.INFO
+    if (stats is not None or level == logging.WARNING) and logger.isEnabledFor(level):
+        entry = {'view': labels[0], 'method': labels[1], 'path': request.path, 'status': response.status_code, 'ms': round(elapsed * 1000, 1), 'bytes': size}
+        if stats is not None:
+            entry.update(queries=stats.queries, db_ms=round(stats.db * 1000, 1), serialize_ms=round(stats.serialize * 1000, 1))
+        logger.log(level, json.dumps(entry))
+    return response
+
+
+@sync_and_async_middleware
+def instrument(get_response):
+    """Records every request in the histograms, sampled ones in detail (first in MIDDLEWARE, to time the rest)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = start_request()
+            return finish_request(request, await get_response(request), started)
+    else:
+        def middleware(request):
+            started = start_request()
+            return finish_request(request, get_response(request), started)
+    return middleware
+
+
+def metrics_view(request):
+    """Prometheus text format, for staff sessions or Authorization: Bearer <METRICS_TOKEN>."""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and hmac.compare_digest(authorization, f'Bearer {token}'))):
+        return HttpResponseForbidden()
+    lines = [line for histogram in HISTOGRAMS for line in histogram.expose()]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0003_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zones', to='ticketapp.event')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Seat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.CharField(max_length=100)),
+                ('number', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('available', 'Available'), ('held', 'Held'), ('sold', 'Sold')], default='available', max_length=20)),
+                ('hold_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='ticketapp.event')),
+                ('held_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='allocated_seat', to='ticketapp.ticket')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='ticketapp.zone')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='zone',
+            constraint=models.UniqueConstraint(fields=('event', 'name'), name='unique_zone_per_event'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(fields=['event', 'zone', 'status'], name='seat_availability_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='seat',
+            constraint=models.UniqueConstraint(fields=('zone', 'row', 'number'), name='unique_seat_per_zone'),
+        ),
+    ]
@@ -0,0 +1,135 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# A copy of ticketapp/parsing.py as it was when this migration was written: later changes to the app's
+# parsing must not change what this backfill does.
+
+# Formats seen in the free text date columns, day first
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y/%m/%d',
+    '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
+    '%d %B %Y', '%d %b %Y', '%d %B, %Y', '%d %b, %Y',
+    '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y',
+    '%a, %d %b %Y', '%A, %d %B %Y', '%A, %B %d, %Y',
+]
+AMOUNT_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+MAX_AMOUNT = Decimal('9999999999.99')  # fits DecimalField(max_digits=12, decimal_places=2)
+
+
+def parse_date(value):
+    """Best effort date from a string (or date/datetime), None when it can't be read."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value):
+    """First number in a price string such as '150,000 MMK' or '$ 45.50', None when there is none."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        amount = Decimal(str(value))
+    else:
+        match = AMOUNT_RE.search(str(value))
+        if not match:
+            return None
+        try:
+            amount = Decimal(match.group().replace(',', ''))
+        except InvalidOperation:
+            return None
+    if amount < 0 or amount > MAX_AMOUNT:
+        return None
+    return amount.quantize(Decimal('0.01'))
+
+
+def json_leaves(data, key=None):
+    """Yield (key, value) for every scalar in a JSON value, key being the nearest dict key."""
+    if isinstance(data, dict):
+        for k, v in data.items():
+            yield from json_leaves(v, k)
+    elif isinstance(data, list):
+        for item in data:
+            yield from json_leaves(item, key)
+    elif data is not None:
+        yield key, data
+
+
+def dates_in(data):
+    """All dates found in a JSON value (a string, a list of strings, {'start': ..., 'end': ...}, ...)."""
+    return [d for d in (parse_date(value) for _, value in json_leaves(data)) if d is not None]
+
+
+def amounts_in(data):
+    """
+    All prices found in a JSON value. Inside objects only keys mentioning price/amount are read,
+    so labels like {'zone': 'Zone 1', 'price': '50,000'} don't count as prices.
+    """
+    amounts = []
+    for key, value in json_leaves(data):
+        if key is not None and not any(word in str(key).lower() for word in ('price', 'amount')):
+            continue
+        amount = parse_amount(value)
+        if amount is not None:
+            amounts.append(amount)
+    return amounts
+
+
+def backfill(apps, schema_editor):
+    # historical models have no save()/sync_typed_fields(), so the parsing above is used instead
+    Event = apps.get_model('ticketapp', 'Event')
+    Ticket = apps.get_model('ticketapp', 'Ticket')
+
+    batch = []
+    for event in Event.objects.only('event_date', 'sale_date', 'ticket_price').iterator(chunk_size=BATCH_SIZE):
+        dates = dates_in(event.event_date)
+        prices = amounts_in(event.ticket_price)
+        event.start_date = min(dates, default=None)
+        event.end_date = max(dates, default=None)
+        event.sale_starts_on = parse_date(event.sale_date)
+        event.min_price = min(prices, default=None)
+        event.max_price = max(prices, default=None)
+        batch.append(event)
+        if len(batch) >= BATCH_SIZE:
+            Event.objects.bulk_update(batch, ['start_date', 'end_date', 'sale_starts_on', 'min_price', 'max_price'])
+            batch = []
+    Event.objects.bulk_update(batch, ['start_date', 'end_date', 'sale_starts_on', 'min_price', 'max_price'])
+
+    batch = []
+    for ticket in Ticket.objects.only('selling_price', 'customer_payment', 'payment_date').iterator(chunk_size=BATCH_SIZE):
+        ticket.selling_price_amount = parse_amount(ticket.selling_price)
+        ticket.customer_payment_amount = parse_amount(ticket.customer_payment)
+        ticket.paid_on = parse_date(ticket.payment_date)
+        batch.append(ticket)
+        if len(batch) >= BATCH_SIZE:
+            Ticket.objects.bulk_update(batch, ['selling_price_amount', 'customer_payment_amount', 'paid_on'])
+            batch = []
+    Ticket.objects.bulk_update(batch, ['selling_price_amount', 'customer_payment_amount', 'paid_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0005_typed_price_and_date_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
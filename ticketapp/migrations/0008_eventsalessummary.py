@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def build_summaries(apps, schema_editor):
+    Ticket = apps.get_model('ticketapp', 'Ticket')
+    EventSalesSummary = apps.get_model('ticketapp', 'EventSalesSummary')
+    rows = (
+        Ticket.objects.filter(event__isnull=False)
+        .values('event_id', 'status')
+        .annotate(tickets=Count('id'), amount=Coalesce(Sum('selling_price_amount'), Value(Decimal('0.00'))))
+        .order_by()
+    )
+    EventSalesSummary.objects.bulk_create(
+        [EventSalesSummary(event_id=row['event_id'], status=row['status'], ticket_count=row['tickets'], revenue=row['amount']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0007_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('ticket_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='ticketapp.event')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('event', 'status'), name='unique_sales_per_event_status')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
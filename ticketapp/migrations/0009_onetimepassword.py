@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0008_eventsalessummary'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customer',
+            name='otp_code',
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='otp_created_at',
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='otp_type',
+        ),
+        migrations.CreateModel(
+            name='OneTimePassword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(max_length=20)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='otps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('customer', 'purpose'), name='unique_otp_per_purpose')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    # fail with the offending keys instead of a bare IntegrityError from CREATE UNIQUE INDEX
+    Ticket = apps.get_model('ticketapp', 'Ticket')
+    duplicates = list(
+        Ticket.objects.filter(event__isnull=False, member_code__isnull=False)
+        .values('event_id', 'member_code')
+        .annotate(tickets=Count('id'))
+        .filter(tickets__gt=1)
+        .order_by('event_id', 'member_code')[:20]
+    )
+    if duplicates:
+        keys = ', '.join(f"event {row['event_id']} / {row['member_code']!r} ({row['tickets']} tickets)" for row in duplicates)
+        raise RuntimeError(f"Tickets share a member code within an event, fix them before migrating: {keys}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(fields=('event', 'member_code'), name='unique_member_code_per_event'),
+        ),
+    ]
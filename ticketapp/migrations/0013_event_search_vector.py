@@ -0,0 +1,57 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# GIN indexes only exist on PostgreSQL, so they are created here rather than declared in Event.Meta:
+# SQLite (tests) gets the column and no index, and never meets them when it rebuilds the table.
+INDEXES = {
+    'event_search_vector_idx': 'USING gin (search_vector)',
+    'event_name_trgm_idx': 'USING gin (event_name gin_trgm_ops)',
+}
+# search_vector as ticketapp/search.py built it when this migration was written (name A, location B, category C)
+BACKFILL = '''
+    UPDATE ticketapp_event SET search_vector =
+        setweight(to_tsvector('simple', COALESCE(event_name, '')), 'A')
+        || setweight(to_tsvector('simple', COALESCE(event_location, '')), 'B')
+        || setweight(to_tsvector('simple', COALESCE(
+            (SELECT category_name FROM ticketapp_category WHERE ticketapp_category.id = ticketapp_event.category_id), ''
+        )), 'C')
+'''
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX {name} ON ticketapp_event {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def backfill(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0012_unique_member_code_per_event'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def blank_bodies(apps, schema_editor):
+    # sent and failed mail no longer keeps its text (one-time and reset codes), rows from before lose it here
+    OutboundEmail = apps.get_model('ticketapp', 'OutboundEmail')
+    OutboundEmail.objects.filter(status__in=['sent', 'failed']).exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketapp', '0014_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_bodies, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,14 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-import random
+import hashlib
+import hmac
+import secrets
 from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
+from .parsing import amounts_in, dates_in, parse_amount, parse_date
+from .search import event_vector
 
 class CustomerManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -27,10 +33,7 @@ class Customer(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=False) # default to False until email is verified
     is_staff = models.BooleanField(default=False)
     email_verified = models.BooleanField(default=False)
-    # OTP fields (for sign up and forgot password)
-    otp_code = models.CharField(max_length=6, null=True, blank=True)
-    otp_created_at = models.DateTimeField(null=True, blank=True)
-    otp_type = models.CharField(max_length=20, null=True, blank=True)  # 'signup' or 'forgot_password'
+    token_version = models.PositiveIntegerField(default=0)  # bumped to revoke issued JWTs, see ticketapp.authentication
 
     objects = CustomerManager()
 
@@ -39,42 +42,134 @@ class Customer(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.name
+
+    # fields copied into JWT claims, changing one of them (or the password) revokes issued tokens
+    AUTH_STATE_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser', 'email_verified', 'email')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(cls.AUTH_STATE_FIELDS) <= set(field_names):
+            instance._auth_state = instance.auth_state()
+        return instance
+
+    def auth_state(self):
+        return tuple(getattr(self, field) for field in self.AUTH_STATE_FIELDS)
     
+    # OTPs live in OneTimePassword so issuing or checking one never rewrites the customer row
     def generate_otp(self, otp_type='verification'):
-        """Generate a 6-digit OTP and save it with the current timestamp and type."""
-        self.otp_code = str(random.randint(100000, 999999))
-        self.otp_created_at = timezone.now()
-        self.otp_type = otp_type
-        self.save()
-        return self.otp_code
+        """Generate a 6-digit OTP of the given type ('verification' or 'password_reset'), replacing any previous one."""
+        return OneTimePassword.objects.issue(self, otp_type)
     
     def verify_otp(self, otp_code, otp_type='verification'):
-        """Verify OTP code (expires in 10 minutes)."""
-        if not self.otp_code or not self.otp_created_at or self.otp_code != otp_code or self.otp_type != otp_type:
+        """Verify OTP code (expires in 10 minutes, limited number of attempts)."""
+        return OneTimePassword.objects.verify(self, otp_code, otp_type)
+    
+    def clear_otp(self, otp_type=None):
+        """Delete OTPs after successful verification."""
+        self.otps_of(otp_type).delete()
+
+    def otps_of(self, otp_type=None):
+        otps = OneTimePassword.objects.filter(customer=self)
+        if otp_type:
+            otps = otps.filter(purpose=otp_type)
+        return otps
+
+    # async variants for the ASGI views (ticketapp/async_views.py)
+    async def agenerate_otp(self, otp_type='verification'):
+        return await OneTimePassword.objects.aissue(self, otp_type)
+
+    async def averify_otp(self, otp_code, otp_type='verification'):
+        return await OneTimePassword.objects.averify(self, otp_code, otp_type)
+
+    async def aclear_otp(self, otp_type=None):
+        await self.otps_of(otp_type).adelete()
+
+class OneTimePasswordManager(models.Manager):
+    def hash_code(self, customer_id, purpose, code):
+        message = f"{customer_id}:{purpose}:{code}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    # one INSERT ... ON CONFLICT DO UPDATE: a resend replaces the previous code in place
+    UPSERT = dict(update_conflicts=True, unique_fields=['customer', 'purpose'], update_fields=['code_hash', 'attempts', 'created_at', 'expires_at'])
+
+    def new_code(self, customer, purpose):
+        """A random code and the (unsaved) row holding its hash."""
+        code = f"{secrets.randbelow(1000000):06d}"
+        now = timezone.now()
+        return code, self.model(
+            customer=customer, purpose=purpose, code_hash=self.hash_code(customer.pk, purpose, code),
+            attempts=0, created_at=now, expires_at=now + timedelta(seconds=settings.OTP_TTL_SECONDS),
+        )
+
+    def issue(self, customer, purpose):
+        code, otp = self.new_code(customer, purpose)
+        self.bulk_create([otp], **self.UPSERT)
+        return code
+
+    async def aissue(self, customer, purpose):
+        code, otp = self.new_code(customer, purpose)
+        await self.abulk_create([otp], **self.UPSERT)
+        return code
+
+    def live(self, customer, purpose):
+        return self.filter(customer=customer, purpose=purpose, expires_at__gt=timezone.now()).values_list('id', 'code_hash')
+
+    def attempt(self, otp_id):
+        # count the attempt first, the conditional update keeps the limit exact under concurrent guesses
+        return self.filter(id=otp_id, attempts__lt=settings.OTP_MAX_ATTEMPTS)
+
+    def verify(self, customer, code, purpose):
+        otp = self.live(customer, purpose).first()
+        if otp is None or not self.attempt(otp[0]).update(attempts=models.F('attempts') + 1):
             return False
-        # Check if OTP is expired (10 minutes validity)
-        expiry_time = self.otp_created_at + timedelta(minutes=10)
-        if timezone.now() > expiry_time:
+        return hmac.compare_digest(otp[1], self.hash_code(customer.pk, purpose, str(code)))
+
+    async def averify(self, customer, code, purpose):
+        otp = await self.live(customer, purpose).afirst()
+        if otp is None or not await self.attempt(otp[0]).aupdate(attempts=models.F('attempts') + 1):
             return False
-        # OTP is valid
-        return True
-    
-    def clear_otp(self):
-        """Clear OTP fields after successful verification."""
-        self.otp_code = None
-        self.otp_created_at = None
-        self.otp_type = None
-        self.save()
+        return hmac.compare_digest(otp[1], self.hash_code(customer.pk, purpose, str(code)))
+
+    def purge_expired(self):
+        return self.filter(expires_at__lte=timezone.now()).delete()[0]
+
+class OneTimePassword(models.Model):
+    """Hashed OTP for sign up verification or password reset, one per customer and purpose."""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='otps')
+    purpose = models.CharField(max_length=20)  # 'verification' or 'password_reset'
+    code_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = OneTimePasswordManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'purpose'], name='unique_otp_per_purpose'),
+        ]
+
+    def __str__(self):
+        return f"{self.purpose} OTP for {self.customer_id}"
 
 class Banner(models.Model):
     banner_name = models.CharField(max_length=100)
     banner_image = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # what /api/sync/ pages by, writes that skip save() set it too
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='banner_updated_idx')]
     def __str__(self):
         return self.banner_name
 
 class Category(models.Model):
     category_name = models.CharField(max_length=100)
     category_image = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='category_updated_idx')]
     def __str__(self):
         return self.category_name
     
@@ -87,16 +182,94 @@ class Event(models.Model):
     sale_date = models.CharField(max_length=100, null=True, blank=True)
     ticket_price = models.JSONField(null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    # Typed copies of the free text/JSON columns above, filled on save, used for filtering and ordering in SQL
+    start_date = models.DateField(null=True, blank=True, db_index=True)
+    end_date = models.DateField(null=True, blank=True, db_index=True)
+    sale_starts_on = models.DateField(null=True, blank=True, db_index=True)
+    min_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, db_index=True)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Name, location and category name for ?search=, filled on save (PostgreSQL only, GIN indexed by migration 0013)
+    search_vector = SearchVectorField(null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='event_updated_idx')]
     def __str__(self):
         return self.event_name
+    def sync_typed_fields(self):
+        dates = dates_in(self.event_date)
+        self.start_date = min(dates, default=None)
+        self.end_date = max(dates, default=None)
+        self.sale_starts_on = parse_date(self.sale_date)
+        prices = amounts_in(self.ticket_price)
+        self.min_price = min(prices, default=None)
+        self.max_price = max(prices, default=None)
+    def save(self, *args, **kwargs):
+        self.sync_typed_fields()
+        self.search_vector = event_vector(self)
+        super().save(*args, **kwargs)
      
 class Order(models.Model):
     order_time = models.DateTimeField(auto_now_add=True)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null =True)
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # created is order_time
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_time'], name='order_time_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+            # a customer's order history, newest first
+            models.Index(fields=['customer', '-order_time'], name='order_customer_time_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer}"
 
+class Zone(models.Model):
+    """A section of an event's seat map (e.g. VIP, Zone A)."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='zones')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'name'], name='unique_zone_per_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} - {self.name}"
+
+class Seat(models.Model):
+    """One sellable seat. Allocation only ever moves a seat forward with row locks or conditional updates."""
+    STATUS_AVAILABLE = 'available'
+    STATUS_HELD = 'held'
+    STATUS_SOLD = 'sold'
+    STATUS_CHOICES = [
+        (STATUS_AVAILABLE, 'Available'),
+        (STATUS_HELD, 'Held'),
+        (STATUS_SOLD, 'Sold'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='seats')  # copy of zone.event for fast lookups
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='seats')
+    row = models.CharField(max_length=100)
+    number = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_AVAILABLE)
+    held_by = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    ticket = models.OneToOneField('Ticket', on_delete=models.SET_NULL, null=True, blank=True, related_name='allocated_seat')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'row', 'number'], name='unique_seat_per_zone'),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'zone', 'status'], name='seat_availability_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.zone.name} {self.row}-{self.number}"
+
 class Ticket(models.Model):
     passport_name = models.CharField(max_length=255)
     facebook_name = models.CharField(max_length=255)
@@ -114,5 +287,146 @@ class Ticket(models.Model):
     seat = models.CharField(max_length=100, null=True, blank=True)
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True)
     order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True)
+    # Typed copies of selling_price, customer_payment and payment_date, filled on save
+    selling_price_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, db_index=True)
+    customer_payment_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    paid_on = models.DateField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='ticket_updated_idx'),
+            # admin listing filtered by status, newest first (?status=Paid)
+            models.Index(fields=['status', '-id'], name='ticket_status_idx'),
+            models.Index(fields=['order', 'status'], name='ticket_order_status_idx'),
+            models.Index(fields=['event', 'zone', 'row', 'seat'], name='ticket_seat_idx'),
+            # most tickets end up Paid, the Pending ones per event are what ops look at
+            models.Index(fields=['event', '-id'], condition=models.Q(status='Pending'), name='ticket_pending_idx'),
+        ]
+        constraints = [
+            # natural key of an allocation, ticket imports upsert on it (ticketapp.imports); NULL codes never collide
+            models.UniqueConstraint(fields=['event', 'member_code'], name='unique_member_code_per_event'),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.id} - {self.passport_name}"
+    def sales_state(self):
+        return (self.event_id, self.status, self.selling_price_amount)
+    def sync_typed_fields(self):
+        self.selling_price_amount = parse_amount(self.selling_price)
+        self.customer_payment_amount = parse_amount(self.customer_payment)
+        self.paid_on = parse_date(self.payment_date)
+    def save(self, *args, **kwargs):
+        self.sync_typed_fields()
+        # one transaction from the locked read of the previous row (pre_save) to the summary update (post_save)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+class EventSalesSummary(models.Model):
+    """Ticket count and revenue per event and ticket status, maintained incrementally by ticketapp.sales."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='sales')
+    status = models.CharField(max_length=20)
+    ticket_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'status'], name='unique_sales_per_event_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} - {self.status}: {self.ticket_count}"
+
+class OutboundEmail(models.Model):
+    """Email waiting in the outbox, delivered by the send_queued_mail command."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the dispatcher only ever looks for due pending mail
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+class IdempotencyKeyManager(models.Manager):
+    def claim(self, customer_id, key, request_hash):
+        """
+        Insert the key, or return the row a previous request stored under it.
+        Call inside the transaction that does the work: a concurrent request with the same key blocks on the
+        unique index until that transaction ends, then either sees the stored response or (after a rollback) claims the key.
+        """
+        try:
+            with transaction.atomic():
+                self.create(customer_id=customer_id, key=key, request_hash=request_hash)
+        except IntegrityError:
+            return self.get(customer_id=customer_id, key=key)
+        return None
+
+    def purge_expired(self):
+        cutoff = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        return self.filter(created_at__lt=cutoff).delete()[0]
+
+class IdempotencyKey(models.Model):
+    """Idempotency-Key of a checkout and the response it produced, replayed when the client retries."""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)  # sha256 of the request body, a reused key with another body is refused
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = IdempotencyKeyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'key'], name='unique_idempotency_key_per_customer'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.customer_id})"
+
+class TombstoneManager(models.Manager):
+    def purge_expired(self):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        return self.filter(deleted_at__lt=cutoff).delete()[0]
+
+class Tombstone(models.Model):
+    """A row that /api/sync/ clients must drop: deleted, or (left_scope) no longer among the customer's."""
+    resource = models.CharField(max_length=20)  # key of ticketapp.sync.RESOURCES
+    object_id = models.BigIntegerField()
+    # whose orders or tickets it was, only they (and staff) are told; NULL for catalog rows
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True)
+    left_scope = models.BooleanField(default=False)  # the row still exists, staff keep it
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resource', 'deleted_at'], name='tombstone_resource_idx'),
+        ]
+
     def __str__(self):
-        return f"Ticket {self.id} - {self.passport_name}"
\ No newline at end of file
+        return f"{self.resource} {self.object_id} ({self.deleted_at:%Y-%m-%d %H:%M})"
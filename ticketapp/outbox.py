@@ -0,0 +1,91 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+CLAIM_SECONDS = getattr(settings, 'EMAIL_OUTBOX_CLAIM_SECONDS', 300)
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Store an email in the outbox instead of sending it inline (same arguments as send_mail)."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        to=list(recipient_list),
+    )
+
+
+async def aqueue_mail(subject, message, from_email, recipient_list):
+    """queue_mail for async views: one INSERT, delivery stays with send_queued_mail."""
+    return await OutboundEmail.objects.acreate(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        to=list(recipient_list),
+    )
+
+
+def due_mail():
+    return OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+
+
+def claim_batch(batch_size):
+    """
+    Take up to batch_size due emails and commit: the attempt is counted and next_attempt_at moved CLAIM_SECONDS
+    ahead, so other dispatchers (SKIP LOCKED lets several share the queue) leave them alone while they are sent
+    outside the transaction, and they come due again if this dispatcher dies before recording the outcome.
+    """
+    with transaction.atomic():
+        batch = list(due_mail().select_for_update(skip_locked=True).order_by('next_attempt_at', 'id')[:batch_size])
+        lease = timezone.now() + timedelta(seconds=CLAIM_SECONDS)
+        OutboundEmail.objects.filter(id__in=[email.id for email in batch]).update(attempts=F('attempts') + 1, next_attempt_at=lease)
+    for email in batch:
+        email.attempts += 1
+        email.next_attempt_at = lease
+    return batch
+
+
+def dispatch_batch(connection, batch_size=50):
+    """
+    Send one batch of due emails over an open connection. Returns (sent, failed).
+    Bodies hold one-time and reset codes in clear: they are blanked once an email is sent or given up on.
+    """
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    # no transaction (or row lock) is held while talking to the mail server
+    for email in batch:
+        message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+        try:
+            connection.open()  # no-op on a live session, a new one after a failure closed it
+            message.send()
+        except Exception as exc:
+            # the session may be broken: the rest of the batch goes over a new one
+            connection.close()
+            email.last_error = str(exc)
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = OutboundEmail.STATUS_FAILED
+                email.body = ''
+            else:
+                # exponential backoff: 30s, 60s, 120s, ...
+                email.next_attempt_at = timezone.now() + timedelta(seconds=BACKOFF_SECONDS * 2 ** (email.attempts - 1))
+            failed += 1
+        else:
+            email.status = OutboundEmail.STATUS_SENT
+            email.sent_at = timezone.now()
+            email.last_error = None
+            email.body = ''
+            sent += 1
+    OutboundEmail.objects.bulk_update(batch, ['status', 'last_error', 'next_attempt_at', 'sent_at', 'body'])
+    return sent, failed
+
+
+def open_connection():
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    return connection
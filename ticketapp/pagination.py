@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+# Keyset pagination used by every router-registered list endpoint.
+# The cursor encodes the last seen primary key, so each page is a single
+# indexed range scan (WHERE id < cursor ORDER BY id DESC LIMIT n) and no
+# COUNT(*) is ever issued, no matter how large the table grows.
+#
+# Views that allow ?ordering= on another column (a date, a price) get a
+# composite keyset (column, id): the id makes every position unique, so
+# large runs of equal values page correctly without DRF's offset fallback.
+# NULL sorts as the largest value (last ascending, first descending, the
+# order of PostgreSQL's indexes), a row holding it has its id as position.
+class DefaultCursorPagination(CursorPagination):
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = settings.REST_FRAMEWORK.get('MAX_PAGE_SIZE', 500)
+    ordering = '-id'  # primary key: unique, indexed and never changes
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        first = ordering[0]
+        if first.lstrip('-') in ('id', 'pk'):
+            return (first,)
+        return (first, '-id' if first.startswith('-') else 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(request, queryset, view)
+        if len(ordering) == 1:
+            return super().paginate_queryset(queryset, request, view)
+
+        # Same flow as CursorPagination.paginate_queryset, with a (column, id) position
+        # instead of position + offset.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        queryset = queryset.order_by(*self.order_expressions(self.reverse_ordering(ordering) if reverse else ordering))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.after_position(current_position, reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = self._get_position_from_instance(results[-1], ordering) if len(results) > len(self.page) else None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def reverse_ordering(self, ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    def order_expressions(self, ordering):
+        column, tiebreak = ordering
+        if column.startswith('-'):
+            return F(column[1:]).desc(nulls_first=True), tiebreak
+        return F(column).asc(nulls_last=True), tiebreak
+
+    def after_position(self, position, reverse):
+        """Rows strictly after `position` in the (possibly reversed) ordering, NULL counting as the largest value."""
+        field = self.ordering[0]
+        attr = field.lstrip('-')
+        lookup = 'lt' if reverse != field.startswith('-') else 'gt'
+        value, separator, pk = position.rpartition('|')
+        if not separator:  # a NULL row: the others with NULL by id, then (going down) every row with a value
+            after = Q(**{f'{attr}__isnull': True, f'id__{lookup}': pk})
+            return after | Q(**{f'{attr}__isnull': False}) if lookup == 'lt' else after
+        after = Q(**{f'{attr}__{lookup}': value}) | Q(**{attr: value, f'id__{lookup}': pk})
+        return after | Q(**{f'{attr}__isnull': True}) if lookup == 'gt' else after
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        attr = ordering[0].lstrip('-')
+        value, pk = (instance[attr], instance['id']) if isinstance(instance, dict) else (getattr(instance, attr), instance.pk)
+        return str(pk) if value is None else f'{value}|{pk}'
@@ -0,0 +1,86 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+# Formats seen in the free text date columns, day first
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y/%m/%d',
+    '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
+    '%d %B %Y', '%d %b %Y', '%d %B, %Y', '%d %b, %Y',
+    '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y',
+    '%a, %d %b %Y', '%A, %d %B %Y', '%A, %B %d, %Y',
+]
+AMOUNT_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+MAX_AMOUNT = Decimal('9999999999.99')  # fits DecimalField(max_digits=12, decimal_places=2)
+
+
+def parse_date(value):
+    """Best effort date from a string (or date/datetime), None when it can't be read."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value):
+    """First number in a price string such as '150,000 MMK' or '$ 45.50', None when there is none."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        amount = Decimal(str(value))
+    else:
+        match = AMOUNT_RE.search(str(value))
+        if not match:
+            return None
+        try:
+            amount = Decimal(match.group().replace(',', ''))
+        except InvalidOperation:
+            return None
+    if amount < 0 or amount > MAX_AMOUNT:
+        return None
+    return amount.quantize(Decimal('0.01'))
+
+
+def json_leaves(data, key=None):
+    """Yield (key, value) for every scalar in a JSON value, key being the nearest dict key."""
+    if isinstance(data, dict):
+        for k, v in data.items():
+            yield from json_leaves(v, k)
+    elif isinstance(data, list):
+        for item in data:
+            yield from json_leaves(item, key)
+    elif data is not None:
+        yield key, data
+
+
+def dates_in(data):
+    """All dates found in a JSON value (a string, a list of strings, {'start': ..., 'end': ...}, ...)."""
+    return [d for d in (parse_date(value) for _, value in json_leaves(data)) if d is not None]
+
+
+def amounts_in(data):
+    """
+    All prices found in a JSON value. Inside objects only keys mentioning price/amount are read,
+    so labels like {'zone': 'Zone 1', 'price': '50,000'} don't count as prices.
+    """
+    amounts = []
+    for key, value in json_leaves(data):
+        if key is not None and not any(word in str(key).lower() for word in ('price', 'amount')):
+            continue
+        amount = parse_amount(value)
+        if amount is not None:
+            amounts.append(amount)
+    return amounts
@@ -0,0 +1,151 @@
+import asyncio
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import make_password, verify_password
+from django.db import connection
+
+# Password hashing for the login endpoints. The hasher and its cost are a policy set in settings
+# (PASSWORD_HASHER and the PASSWORD_* costs): new hashes use it, hashes made under another hasher or cost
+# still check and are rewritten with the policy after a successful login. The hashing runs on a pool of
+# PASSWORD_HASH_WORKERS threads (hashlib and argon2 release the GIL, so each uses a core) that takes at most
+# PASSWORD_HASH_QUEUE waiting logins more: past that a login is answered 503 at once instead of piling up
+# behind hashes it would time out waiting for. A successful check is remembered in memory for
+# LOGIN_CACHE_SECONDS under an HMAC of the customer, the stored hash and the password, so a customer logging
+# in again with the same password skips the hash; a wrong password is never remembered and always pays it.
+logger = logging.getLogger('ticketapp.passwords')
+
+VERIFIED_MAX_ENTRIES = 10000
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    maxmem = 2 ** 30  # a limit, not an allocation: OpenSSL's default (32 MiB) refuses work factors above 2**14
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_N
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_R
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_P
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_KIB
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing thread is busy and the queue is full."""
+
+
+executor = ThreadPoolExecutor(settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+
+
+def submit(function, *args):
+    """Run function on the hashing pool, raises PasswordHashingBusy when it already has all it takes."""
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(function, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+verified = OrderedDict()  # HMAC of (customer, stored hash, password) -> monotonic expiry, oldest first
+verified_lock = threading.Lock()
+
+
+def verified_key(user, password):
+    message = f'{user.pk}\0{user.password}\0{password}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, 'sha256').digest()
+
+
+def was_verified(key):
+    with verified_lock:
+        expires = verified.get(key)
+        if expires is not None and expires < time.monotonic():
+            del verified[key]
+            expires = None
+    return expires is not None
+
+
+def remember(key):
+    if settings.LOGIN_CACHE_SECONDS <= 0:
+        return
+    with verified_lock:
+        verified[key] = time.monotonic() + settings.LOGIN_CACHE_SECONDS
+        verified.move_to_end(key)
+        while len(verified) > VERIFIED_MAX_ENTRIES:
+            verified.popitem(last=False)
+
+
+def check_password(user, password):
+    """
+    user.check_password() for the login views: hashed on the pool, answered from memory when the same password
+    was checked recently, rehashed in the background when the policy changed. Raises PasswordHashingBusy.
+    """
+    key = verified_key(user, password)
+    if was_verified(key):
+        return True
+    correct, must_update = submit(verify_password, password, user.password).result()
+    return checked(user, password, key, correct, must_update)
+
+
+async def acheck_password(user, password):
+    key = verified_key(user, password)
+    if was_verified(key):
+        return True
+    correct, must_update = await asyncio.wrap_future(submit(verify_password, password, user.password))
+    return checked(user, password, key, correct, must_update)
+
+
+def checked(user, password, key, correct, must_update):
+    if correct:
+        remember(key)
+        if must_update:
+            try:
+                submit(rehash, user.pk, user.password, password)
+            except PasswordHashingBusy:
+                pass  # the next login tries again
+    return correct
+
+
+def rehash(pk, encoded, password):
+    # An UPDATE conditional on the old hash, so a password changed in the meantime wins. Not save(): the
+    # post_save receiver would take the new hash for a password change and revoke the customer's tokens.
+    from django.contrib.auth import get_user_model
+    try:
+        get_user_model().objects.filter(pk=pk, password=encoded).update(password=make_password(password))
+    except Exception:
+        logger.exception("Rehashing the password of customer %s failed", pk)
+    finally:
+        connection.close()  # pool threads outlive requests, don't leave their connection open
@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+from .cache import get_version
+
+REPLICA = 'replica'
+# public catalog, already eventually consistent through the version cache (ticketapp.cache)
+CATALOG_MODELS = {'ticketapp.banner', 'ticketapp.category', 'ticketapp.event'}
+# admin reporting
+REPORTING_MODELS = {'ticketapp.eventsalessummary'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# set for requests that write, so everything they read comes from the primary
+# (a ContextVar, not a thread local: under ASGI the request hops between threads)
+use_primary = ContextVar('use_primary', default=False)
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. right after a write whose result is read back."""
+    token = use_primary.set(True)
+    try:
+        yield
+    finally:
+        use_primary.reset(token)
+
+
+def recently_written(model):
+    # catalog versions are the nanosecond timestamp of the last change
+    return time.time_ns() - get_version(model) < settings.REPLICA_LAG_SECONDS * 1_000_000_000
+
+
+class ReplicaRouter:
+    """
+    Catalog and reporting reads go to the 'replica' alias when one is configured, everything else to default.
+    Orders, tickets, customers and seats never leave the primary, so their reads always see the latest writes.
+    Catalog reads also stay on the primary inside a transaction, during a writing request and for
+    REPLICA_LAG_SECONDS after a change, so a lagging replica can't put old data back into the catalog cache.
+    """
+
+    def db_for_read(self, model, **hints):
+        label = model._meta.label_lower
+        if REPLICA not in settings.DATABASES or (label not in CATALOG_MODELS and label not in REPORTING_MODELS):
+            return None
+        if use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if label in CATALOG_MODELS and recently_written(model):
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+@sync_and_async_middleware
+def primary_for_writes(get_response):
+    """Pins POST/PUT/PATCH/DELETE requests to the primary (ReplicaRouter)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if request.method in SAFE_METHODS:
+                return await get_response(request)
+            with primary():
+                return await get_response(request)
+    else:
+        def middleware(request):
+            if request.method in SAFE_METHODS:
+                return get_response(request)
+            with primary():
+                return get_response(request)
+    return middleware
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import EventSalesSummary, Ticket
+
+ZERO = Decimal('0.00')
+
+
+def new_deltas():
+    return defaultdict(lambda: [0, ZERO])
+
+
+def add_state(deltas, state, sign):
+    """Count one ticket in `state` = (event_id, status, selling_price_amount), sign is +1 or -1."""
+    event_id, status, amount = state
+    if event_id is None:
+        return
+    delta = deltas[(event_id, status)]
+    delta[0] += sign
+    delta[1] += sign * (amount or ZERO)
+
+
+def apply_deltas(deltas):
+    """
+    Add count/revenue deltas to the summary rows with F() updates, so concurrent writers never lose an increment.
+    The first ticket of an (event, status) pair creates its row; a concurrent creator is caught by the unique constraint.
+    """
+    now = timezone.now()
+    for (event_id, status), (count, revenue) in deltas.items():
+        if not count and not revenue:
+            continue
+        rows = EventSalesSummary.objects.filter(event_id=event_id, status=status)
+        changes = dict(ticket_count=F('ticket_count') + count, revenue=F('revenue') + revenue, updated_at=now)
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                EventSalesSummary.objects.create(event_id=event_id, status=status, ticket_count=count, revenue=revenue, updated_at=now)
+        except IntegrityError:
+            rows.update(**changes)
+
+
+def record_tickets(tickets, sign=1):
+    """Count tickets written without signals (bulk_create), or uncount them with sign=-1."""
+    deltas = new_deltas()
+    for ticket in tickets:
+        add_state(deltas, ticket.sales_state(), sign)
+    apply_deltas(deltas)
+
+
+def change_status(queryset, status):
+    """UPDATE the status of every ticket in queryset and move them between summary rows. Returns the row count."""
+    with transaction.atomic():
+        locked = queryset.select_for_update().exclude(status=status)
+        moved = list(
+            Ticket.objects.filter(id__in=list(locked.values_list('id', flat=True)))
+            .values('event_id', 'status')
+            .annotate(tickets=Count('id'), amount=Coalesce(Sum('selling_price_amount'), Value(ZERO)))
+        )
+        updated = queryset.update(status=status, updated_at=timezone.now())
+        deltas = new_deltas()
+        for row in moved:
+            if row['event_id'] is None:
+                continue
+            for key, sign in (((row['event_id'], row['status']), -1), ((row['event_id'], status), 1)):
+                deltas[key][0] += sign * row['tickets']
+                deltas[key][1] += sign * row['amount']
+        apply_deltas(deltas)
+    return updated
+
+
+def rebuild(event_ids=None):
+    """Recompute summary rows from the ticket table with one grouped query. Returns the number of rows written."""
+    with transaction.atomic():
+        summaries = EventSalesSummary.objects.all()
+        tickets = Ticket.objects.filter(event__isnull=False)
+        if event_ids:
+            summaries = summaries.filter(event_id__in=event_ids)
+            tickets = tickets.filter(event_id__in=event_ids)
+        if connection.vendor == 'postgresql':
+            # hold off incremental writers until the new rows are in
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {EventSalesSummary._meta.db_table} IN EXCLUSIVE MODE')
+        summaries.delete()
+        now = timezone.now()
+        rows = (
+            tickets.values('event_id', 'status')
+            .annotate(tickets=Count('id'), amount=Coalesce(Sum('selling_price_amount'), Value(ZERO)))
+            .order_by()
+        )
+        return len(EventSalesSummary.objects.bulk_create(
+            [
+                EventSalesSummary(event_id=row['event_id'], status=row['status'], ticket_count=row['tickets'], revenue=row['amount'], updated_at=now)
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        ))
@@ -0,0 +1,69 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramStrictWordSimilarity
+from django.db import connections, router
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+# Event search. On PostgreSQL every event keeps a tsvector of its name (weight A), location (B) and category
+# name (C) in search_vector, written on save and when a category is renamed, with a GIN index on it and a
+# trigram GIN index on event_name (migration 0013). A search matches the words as prefixes in the vector
+# ("black" or "blackp" find "BLACKPINK"), ranked by ts_rank. Only when nothing matches that way, the name is
+# matched by trigram word similarity for typos ("blakpink", how close is SEARCH_TYPO_THRESHOLD) and ranked by
+# strict word similarity, which unlike the operator's tells "kalomi" from "kaloka" for "kalmi". Each is a
+# single indexed condition (OR-ing them makes the planner fall back to a sequential scan) and the ranking
+# functions only run on the rows the index found.
+# Other databases (SQLite in tests) fall back to icontains on the same three columns.
+SEARCH_CONFIG = 'simple'  # names and places in several languages: no stemming, no stop words
+WORD = re.compile(r"[^\s&|!():*<>'\"\\]+")  # anything tsquery would read as an operator splits words
+
+
+def search_words(term):
+    return WORD.findall(term or '')[:10]
+
+
+def search_vector(name, location, category):
+    """tsvector expression over an event's name, location and category name (columns or Values)."""
+    return (
+        SearchVector(name, weight='A', config=SEARCH_CONFIG)
+        + SearchVector(location, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(category, weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def is_postgresql(model, instance=None):
+    return connections[router.db_for_write(model, instance=instance)].vendor == 'postgresql'
+
+
+def event_vector(event):
+    """The search_vector to save with an event, None where the database has no full-text search."""
+    if not is_postgresql(type(event), event):
+        return None
+    category = event.category.category_name if event.category_id else ''
+    return search_vector(Value(event.event_name or ''), Value(event.event_location or ''), Value(category or ''))
+
+
+def update_vectors(events, category_name):
+    """Rewrite search_vector for a queryset of events that share a category name, in one UPDATE."""
+    if is_postgresql(events.model):
+        return events.update(search_vector=search_vector(F('event_name'), F('event_location'), Value(category_name or '')))
+    return 0
+
+
+def search_events(queryset, term):
+    """Events matching term, annotated with rank (higher is a better match)."""
+    words = search_words(term)
+    if connections[queryset.db].vendor != 'postgresql':
+        matches = Q()
+        in_name = Q()
+        for word in words:
+            matches &= Q(event_name__icontains=word) | Q(event_location__icontains=word) | Q(category__category_name__icontains=word)
+            in_name &= Q(event_name__icontains=word)
+        return queryset.filter(matches).annotate(rank=Case(When(in_name, then=Value(1.0)), default=Value(0.5), output_field=FloatField()))
+    query = SearchQuery(' & '.join(f"'{word}':*" for word in words), search_type='raw', config=SEARCH_CONFIG)
+    # ts_rank and the similarities are float4: cast so the cursor reads back exactly the value it compares with
+    if queryset.filter(search_vector=query).exists():
+        return queryset.filter(search_vector=query).annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+    text = ' '.join(words)
+    return queryset.filter(event_name__trigram_word_similar=text).annotate(
+        rank=Cast(TrigramStrictWordSimilarity(text, 'event_name'), FloatField()),
+    )
@@ -1,6 +1,11 @@
 from rest_framework import serializers
+from rest_framework.fields import SkipField, empty, get_error_detail
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth import get_user_model
-from .models import Banner, Category, Event, Order, Ticket
+from .models import Banner, Category, Event, Order, Ticket, Seat, EventSalesSummary
+from .sales import record_tickets
+from .images import image_variants
 
 Customer = get_user_model()
 
@@ -34,27 +39,203 @@ class ResetPasswordSerializer(serializers.Serializer):
     otp_code = serializers.CharField(max_length=6, min_length=6)
     new_password = serializers.CharField(write_only=True, min_length=8)
 
+class ImageVariantsField(serializers.Field):
+    """Read-only: {reference: {src, srcset, width, height}} for the uploaded images in a JSON image field."""
+    def __init__(self, **kwargs):
+        super().__init__(read_only=True, **kwargs)
+    def to_representation(self, value):
+        return image_variants(value)
+
 class BannerSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='banner_image')
     class Meta:
         model = Banner
         fields = '__all__'
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='category_image')
     class Meta:
         model = Category
         fields = '__all__'
 
 class EventSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='event_image')
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ['search_vector']
+        read_only_fields = ["start_date", "end_date", "sale_starts_on", "min_price", "max_price"]
 
 class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves pks from a dict preloaded by the list serializer, so a batch costs one query per field instead of per row."""
+    preloaded = None
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            return self.preloaded[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+def field_outcome(field, value):
+    """(True, validated value), (False, errors), or None when the field is skipped."""
+    try:
+        return True, field.run_validation(value)
+    except serializers.ValidationError as exc:
+        return False, exc.detail
+    except DjangoValidationError as exc:
+        return False, get_error_detail(exc)
+    except SkipField:
+        return None
+
+class TicketListSerializer(serializers.ListSerializer):
+    """Validates a batch of tickets with TicketSerializer rules and inserts it with one bulk_create."""
+    def validate_each(self, labels=None, seen=None):
+        """
+        Validate every item on its own. Returns ([(index, validated_data)], {index: errors}).
+        labels name the items in duplicate key errors, seen carries (event id, member_code) -> label across batches.
+        """
+        related = [(name, field) for name, field in self.child.fields.items() if isinstance(field, PreloadedPrimaryKeyRelatedField)]
+        for name, field in related:
+            pks = {item.get(name) for item in self.initial_data if isinstance(item, dict)}
+            field.preloaded = field.get_queryset().in_bulk([pk for pk in pks if isinstance(pk, int) or str(pk).isdigit()])
+        if self.field_wise():
+            fields, outcomes = list(self.child._writable_fields), {}
+            run_validation = lambda item: self.validate_fields(item, fields, outcomes)
+        else:
+            run_validation = self.child.run_validation
+        valid, errors = [], {}
+        try:
+            for index, item in enumerate(self.initial_data):
+                try:
+                    valid.append((index, run_validation(item)))
+                except serializers.ValidationError as exc:
+                    errors[index] = exc.detail
+        finally:
+            for name, field in related:
+                field.preloaded = None
+        # the unique validator only looks at the database, a repeated (event, member_code) within the batch is caught here
+        unique, seen = [], {} if seen is None else seen
+        for index, attrs in valid:
+            key = (getattr(attrs.get('event'), 'pk', None), attrs.get('member_code'))
+            if None in key:
+                unique.append((index, attrs))
+            elif key in seen:
+                errors[index] = {'member_code': [f'Also used by {seen[key]} for this event.']}
+            else:
+                seen[key] = labels[index] if labels else f'item {index}'
+                unique.append((index, attrs))
+        return unique, errors
+    def field_wise(self):
+        """True when the child has no rules across fields (validators, validate(), validate_<field>()), each field then stands alone."""
+        child = self.child
+        return (
+            not child.validators and not self.partial
+            and type(child).validate is serializers.Serializer.validate
+            and not any(hasattr(child, f'validate_{field.field_name}') for field in child._writable_fields)
+        )
+    def validate_fields(self, item, fields, outcomes):
+        """
+        child.run_validation(item) for a field-wise child. A batch repeats the same event, zone and status on most
+        items, so the outcome of each field is kept per input value and every distinct value is validated once.
+        """
+        if not isinstance(item, dict):
+            return self.child.run_validation(item)
+        attrs, errors = {}, {}
+        for field in fields:
+            value = item.get(field.field_name, empty)
+            try:
+                key = (field.field_name, type(value), value)  # 1, '1' and True stay apart
+                outcome = outcomes[key] if key in outcomes else outcomes.setdefault(key, field_outcome(field, value))
+            except TypeError:  # unhashable, lists and dicts
+                outcome = field_outcome(field, value)
+            if outcome is None:
+                continue
+            ok, result = outcome
+            if ok:
+                self.child.set_value(attrs, field.source_attrs, result)
+            else:
+                errors[field.field_name] = result
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+    def create(self, validated_data):
+        tickets = [Ticket(**attrs) for attrs in validated_data]
+        for ticket in tickets:
+            ticket.sync_typed_fields()  # bulk_create skips save() and signals
+        tickets = Ticket.objects.bulk_create(tickets, batch_size=500)
+        record_tickets(tickets)
+        return tickets
+
 class TicketSerializer(serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
     class Meta:
         model = Ticket 
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ["selling_price_amount", "customer_payment_amount", "paid_on"]
+        list_serializer_class = TicketListSerializer
+
+class TicketImportSerializer(TicketSerializer):
+    """TicketSerializer rules minus the (event, member_code) uniqueness check: an import updates the ticket holding the key."""
+    class Meta(TicketSerializer.Meta):
+        validators = []
+
+class CheckoutSerializer(serializers.Serializer):
+    """An order with its tickets (POST /api/orders/checkout/). Tickets follow TicketSerializer rules and belong to the order's event."""
+    event = serializers.PrimaryKeyRelatedField(queryset=Event.objects.all())
+    tickets = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=settings.CHECKOUT_MAX_TICKETS)
+
+    def validate(self, attrs):
+        # one pass with related ids loaded in bulk, errors keyed by ticket index; every ticket gets the order's
+        # event first so the (event, member_code) checks run, against the database and within the order
+        items = [dict(item, event=attrs['event'].pk) for item in attrs['tickets']]
+        valid, errors = TicketSerializer(data=items, many=True, context=self.context).validate_each()
+        if errors:
+            raise serializers.ValidationError({'tickets': errors})
+        return dict(attrs, tickets=[ticket for _, ticket in valid])
+
+    def create(self, validated_data):
+        event = validated_data['event']
+        order = Order.objects.create(customer_id=self.context['request'].user.id, event=event)
+        tickets = TicketSerializer(many=True).create([dict(attrs, event=event, order=order) for attrs in validated_data['tickets']])
+        return order, tickets
+
+    def to_representation(self, instance):
+        order, tickets = instance
+        return dict(OrderSerializer(order).data, tickets=TicketSerializer(tickets, many=True).data)
+
+class SeatSerializer(serializers.ModelSerializer):
+    zone = serializers.CharField(source='zone.name', read_only=True)
+    class Meta:
+        model = Seat
+        fields = ["id", "zone", "row", "number", "status", "hold_expires_at"]
+
+class HoldSeatsSerializer(serializers.Serializer):
+    zone = serializers.CharField(max_length=100)
+    quantity = serializers.IntegerField(min_value=1, max_value=10)
+
+class AllocateZonesSerializer(serializers.Serializer):
+    capacity = serializers.DictField(child=serializers.IntegerField(min_value=0), required=False, default=dict)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+class BulkTicketStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    status = serializers.CharField(max_length=20)
+
+class EventSalesSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EventSalesSummary
+        fields = ["status", "ticket_count", "revenue", "updated_at"]
+
+class ImageUploadSerializer(serializers.Serializer):
+    image = serializers.FileField()
+    def validate_image(self, value):
+        if value.size > settings.IMAGE_MAX_UPLOAD_MB * 1024 * 1024:
+            raise serializers.ValidationError(f"Images are limited to {settings.IMAGE_MAX_UPLOAD_MB} MB.")
+        return value
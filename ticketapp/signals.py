@@ -0,0 +1,161 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.db.models import F, SET_NULL
+from django.utils import timezone
+from .authentication import forget_token_version
+from .cache import bump_version
+from .inventory import release_seat
+from .metrics import record_query
+from .models import Banner, Category, Customer, Event, Order, Ticket, Tombstone
+from .sales import add_state, apply_deltas, new_deltas
+from .search import update_vectors
+from .sync import RESOURCE_NAMES, record_moved_tickets
+
+
+@receiver([post_save, post_delete], sender=Banner)
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_catalog(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, instance, signal, created=False, **kwargs):
+    bump_version(Category)
+    if signal is post_delete:
+        # events of a deleted category are set to NULL with a plain UPDATE, which sends no signal
+        update_vectors(Event.objects.filter(category__isnull=True), '')
+        bump_version(Event)
+    elif not created:
+        # the category name is part of its events' search vectors, and of what ?search= finds
+        update_vectors(Event.objects.filter(category=instance), instance.category_name)
+        bump_version(Event)
+
+
+def locked_state(ticket):
+    """
+    (what EventSalesSummary counts for it, order id) of the ticket's row as committed, (None, None) for a new row.
+    The row stays locked until the transaction ends, so a concurrent save waits and then reads what this one leaves.
+    """
+    row = Ticket.objects.select_for_update().filter(pk=ticket.pk).values_list('event_id', 'status', 'selling_price_amount', 'order_id').first()
+    return (None, None) if row is None else (row[:3], row[3])
+
+
+@receiver(pre_delete, sender=Ticket)
+def release_ticket_seat(sender, instance, **kwargs):
+    # runs before the seat's ticket FK is set to NULL, while we can still find it
+    release_seat(instance)
+    instance._sales_state = locked_state(instance)[0]  # the delete runs in a transaction, the lock lasts until post_delete
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_sales_state(sender, instance, **kwargs):
+    # read from the row, not the instance: one loaded before another save would move the counts a second time
+    instance._sales_state, instance._previous_order_id = (None, None) if instance.pk is None else locked_state(instance)
+
+
+@receiver(post_save, sender=Ticket)
+def update_sales_summary(sender, instance, created, **kwargs):
+    old_state = None if created else getattr(instance, '_sales_state', None)
+    new_state = instance.sales_state()
+    if old_state != new_state:
+        deltas = new_deltas()
+        if old_state is not None:
+            add_state(deltas, old_state, -1)
+        add_state(deltas, new_state, 1)
+        apply_deltas(deltas)
+    instance._sales_state = new_state
+
+
+@receiver(post_delete, sender=Ticket)
+def remove_from_sales_summary(sender, instance, **kwargs):
+    state = getattr(instance, '_sales_state', None)
+    if state is not None:  # None: a concurrent delete got the row first and uncounted it
+        deltas = new_deltas()
+        add_state(deltas, state, -1)
+        apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Customer)
+def revoke_tokens_on_auth_change(sender, instance, created, **kwargs):
+    # an instance not loaded from the database has no known previous state: revoke to be safe
+    if created or getattr(instance, '_auth_state', None) == instance.auth_state():
+        return
+    Customer.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+    instance.refresh_from_db(fields=['token_version'])
+    instance._auth_state = instance.auth_state()
+    forget_token_version(instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def forget_deleted_customer(sender, instance, **kwargs):
+    forget_token_version(instance.pk)
+
+
+@receiver(post_delete, sender=Banner)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Ticket)
+def record_tombstone(sender, instance, **kwargs):
+    # /api/sync/ clients that have the row learn it is gone; orders and tickets only reach their customer
+    if sender is Order:
+        customer_id = instance.customer_id
+    elif sender is Ticket:
+        customer_id = Order.objects.filter(pk=instance.order_id).values_list('customer_id', flat=True).first()
+    else:
+        customer_id = None
+    Tombstone.objects.create(resource=RESOURCE_NAMES[sender], object_id=instance.pk, customer_id=customer_id)
+
+
+@receiver(pre_save, sender=Order)
+def remember_customer(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is not None and (update_fields is None or 'customer' in update_fields):
+        instance._previous_customer_id = Order.objects.filter(pk=instance.pk).values_list('customer_id', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Ticket)
+def record_left_scope(sender, instance, created, **kwargs):
+    # an order given to another customer, or a ticket moved to another customer's order, drops out of the
+    # previous customer's /api/sync/ scope: they get a tombstone as if it was deleted
+    if created:
+        return
+    if sender is Ticket:
+        previous_order = getattr(instance, '_previous_order_id', None)
+        instance._previous_order_id = instance.order_id
+        record_moved_tickets([(instance.pk, previous_order, instance.order_id)])
+        return
+    previous = getattr(instance, '_previous_customer_id', None)
+    instance._previous_customer_id = instance.customer_id
+    if previous is None or previous == instance.customer_id:
+        return
+    Tombstone.objects.bulk_create([Tombstone(resource='orders', object_id=instance.pk, customer_id=previous, left_scope=True)] + [
+        Tombstone(resource='tickets', object_id=ticket_id, customer_id=previous, left_scope=True)
+        for ticket_id in Ticket.objects.filter(order=instance).values_list('id', flat=True)
+    ])
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Event)
+@receiver(pre_delete, sender=Order)
+@receiver(pre_delete, sender=Customer)
+def touch_nulled_references(sender, instance, **kwargs):
+    # synced rows pointing at the deleted one are set to NULL with a plain UPDATE, which leaves updated_at alone
+    now = timezone.now()
+    for relation in sender._meta.related_objects:
+        if relation.on_delete is SET_NULL and relation.related_model in RESOURCE_NAMES:
+            relation.related_model.objects.filter(**{relation.field.name: instance}).update(updated_at=now)
+    if sender is Order and instance.customer_id is not None:
+        # its tickets stay but are no longer the customer's
+        Tombstone.objects.bulk_create([
+            Tombstone(resource='tickets', object_id=ticket_id, customer_id=instance.customer_id, left_scope=True)
+            for ticket_id in Ticket.objects.filter(order=instance).values_list('id', flat=True)
+        ])
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    # per request query counts and database time (ticketapp/metrics.py), sent again on every reconnect
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
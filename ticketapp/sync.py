@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .metrics import timer
+from .models import Banner, Category, Event, Order, Ticket, Tombstone
+from .readers import ValuesSerializer, values_serializer
+from .serializers import BannerSerializer, CategorySerializer, EventSerializer, OrderSerializer, TicketSerializer
+
+# The change feed behind /api/sync/. A client keeps the rows it has and sends back the token of its last sync;
+# per resource the token holds where its changed rows stopped ((updated_at, id) of the last one sent) and since
+# when it was told of deletions. Rows come in (updated_at, id) order, SYNC_PAGE_SIZE per resource and response,
+# from the (updated_at, id) indexes. A write commits after its updated_at was taken, so once a resource is
+# caught up its position goes back SYNC_OVERLAP_SECONDS and the next sync sends those rows again rather than
+# miss one committed late. Deletions are Tombstone rows written by signals, kept SYNC_TOMBSTONE_DAYS.
+RESOURCES = {
+    # name: (model, serializer, lookup of the owning customer; None for the public catalog)
+    'banners': (Banner, BannerSerializer, None),
+    'categories': (Category, CategorySerializer, None),
+    'events': (Event, EventSerializer, None),
+    'orders': (Order, OrderSerializer, 'customer_id'),
+    'tickets': (Ticket, TicketSerializer, 'order__customer_id'),
+}
+RESOURCE_NAMES = {model: name for name, (model, _, _) in RESOURCES.items()}
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+SALT = 'ticketapp.sync'
+
+
+class SyncTokenExpired(Exception):
+    """The token is older than the tombstones, the client must sync again from scratch."""
+
+
+def microseconds(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def moment(microseconds):
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+def read_token(token):
+    """{resource: (changed after (updated_at, id), deleted after)} from a since= token."""
+    try:
+        positions = signing.loads(token, salt=SALT)
+        return {
+            name: ((moment(updated), pk), moment(deleted))
+            for name, (updated, pk, deleted) in positions.items() if name in RESOURCES
+        }
+    except (signing.BadSignature, AttributeError, TypeError, ValueError, OverflowError):
+        raise ValidationError({'since': 'Invalid sync token.'})
+
+
+def make_token(positions):
+    return signing.dumps({
+        name: [microseconds(updated), pk, microseconds(deleted)]
+        for name, ((updated, pk), deleted) in positions.items()
+    }, salt=SALT)
+
+
+def record_moved_tickets(moves):
+    """
+    left_scope tombstones for tickets moved to another customer's order, moves being (ticket id, previous order id,
+    order id): the previous customer's sync drops them as if they were deleted. One query, and an INSERT when needed.
+    """
+    moves = [(pk, previous, current) for pk, previous, current in moves if previous is not None and previous != current]
+    if not moves:
+        return
+    owners = dict(Order.objects.filter(pk__in={order for _, *orders in moves for order in orders}).values_list('id', 'customer_id'))
+    left = [
+        Tombstone(resource='tickets', object_id=pk, customer_id=owners[previous], left_scope=True)
+        for pk, previous, current in moves if owners.get(previous) is not None and owners.get(previous) != owners.get(current)
+    ]
+    if left:
+        Tombstone.objects.bulk_create(left)
+
+
+def visible(user, name):
+    return RESOURCES[name][2] is None or user.is_authenticated
+
+
+def changes(user, since=None, resources=None):
+    """
+    The response of /api/sync/: {'since': next token, 'more': whether a resource has more rows waiting,
+    resource: {'changed': [rows], 'deleted': [ids]}} for the resources the user may read, scoped like their views.
+    """
+    positions = read_token(since) if since else {}
+    names = [name.strip() for name in resources.split(',') if name.strip()] if resources else list(RESOURCES)
+    unknown = set(names) - set(RESOURCES)
+    if unknown:
+        raise ValidationError({'resources': f"Unknown resource(s): {', '.join(sorted(unknown))}."})
+    now = timezone.now()
+    expired = now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if any(positions[name][1] < expired for name in names if name in positions):
+        raise SyncTokenExpired()
+    horizon = now - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    staff = user.is_staff or user.is_superuser
+    data, more = {}, False
+    for name in names:
+        if not visible(user, name):
+            continue
+        model, serializer_class, owner = RESOURCES[name]
+        fields = values_serializer(serializer_class).fields
+        rows = model.objects.all()
+        tombstones = Tombstone.objects.filter(resource=name)
+        if owner is not None:
+            if staff:
+                tombstones = tombstones.filter(left_scope=False)
+            else:
+                rows = rows.filter(**{owner: user.id})
+                tombstones = tombstones.filter(customer_id=user.id)
+        position = positions.get(name)
+        if position is not None:
+            (updated, pk), deleted = position
+            rows = rows.filter(Q(updated_at__gt=updated) | Q(updated_at=updated, id__gt=pk))
+            # apply changed rows first: one deleted right after being read is in both
+            gone = sorted(set(tombstones.filter(deleted_at__gt=deleted).values_list('object_id', flat=True)))
+        else:
+            gone = []  # a first sync has nothing to drop
+        columns = {column for _, column, _ in fields} | {'id', 'updated_at'}
+        page = list(rows.order_by('updated_at', 'id').values(*columns)[:settings.SYNC_PAGE_SIZE])
+        if len(page) == settings.SYNC_PAGE_SIZE:
+            more = True
+            changed_after = (page[-1]['updated_at'], page[-1]['id'])
+        else:
+            changed_after = (horizon, 0)
+        positions[name] = (changed_after, horizon)
+        with timer():
+            data[name] = {'changed': ValuesSerializer.represent(page, fields), 'deleted': gone}
+    return {'since': make_token(positions), 'more': more, **data}
@@ -1,3 +1,1062 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import re
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.urls import include, path
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+from . import checks, passwords, urls, views
+from .allocation import allocate
+from .authentication import current_token_version, tokens_for
+from .cache import bump_version, get_version
+from .models import Banner, Category, Customer, Event, IdempotencyKey, OneTimePassword, Order, OutboundEmail, Seat, Ticket, Zone
+from .imports import import_tickets
+from .inventory import SeatUnavailable, claim_seat, create_seats, hold_seats, release_seat
+from .outbox import claim_batch, dispatch_batch, due_mail, queue_mail
+from .routers import REPLICA, primary_for_writes
+from .search import search_events
+from .serializers import EventSerializer
+from .sync import changes
 
-# Create your tests here.
+# MD5 keeps creating users fast, the policy hashers cost up to a second per password
+FAST_HASHING = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+# event search vectors are kept on PostgreSQL only (ticketapp/search.py), at a query per write that touches them
+VECTORS = 1 if connection.vendor == 'postgresql' else 0
+
+
+@FAST_HASHING
+class APITestCase(TestCase):
+    """A verified customer and a superuser, with a cache cleared before every test."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create_user('customer@example.com', 'customer-pass', name='Customer', is_active=True, email_verified=True)
+        cls.admin = Customer.objects.create_superuser('admin@example.com', 'admin-pass', name='Admin')
+
+    def setUp(self):
+        cache.clear()
+        passwords.verified.clear()
+
+    def client_for(self, user):
+        """An APIClient sending the user's access token, its token_version already cached as on a warm worker."""
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for(user).access_token}')
+            current_token_version(user.id)
+        return client
+
+
+class QueryCountTests(APITestCase):
+    """
+    Queries per ViewSet action, for a customer and for an admin. A new query per row or per request in one of
+    these is a regression: update the counts only for a change that means to add or remove a query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.banner = Banner.objects.create(banner_name='Summer', banner_image={'url': 'https://example.com/b.jpg'})
+        cls.category = Category.objects.create(category_name='Concert')
+        cls.event = Event.objects.create(
+            event_name='Open Air', event_location='Park', category=cls.category,
+            event_date=['2026-12-01'], ticket_price={'A': '1,500'},
+        )
+        cls.order = Order.objects.create(customer=cls.customer, event=cls.event)
+        cls.ticket = Ticket.objects.create(passport_name='A', facebook_name='a', event=cls.event, order=cls.order, selling_price='1,500')
+
+    def assertActions(self, user, basename, pk, create, update, counts, own=None):
+        """
+        Run list, retrieve, create, update (PATCH) and destroy, each within its query count. Update and destroy
+        act on the created row, or on own when the user can't see what they created (a customer's new account).
+        """
+        client = self.client_for(user)
+        url = f'/api/{basename}/'
+        with self.assertNumQueries(counts['list']):
+            self.assertEqual(client.get(url).status_code, 200)
+        with self.assertNumQueries(counts['retrieve']):
+            self.assertEqual(client.get(f'{url}{pk}/').status_code, 200)
+        with self.assertNumQueries(counts['create']):
+            response = client.post(url, create, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        created = f"{url}{own or response.data['id']}/"
+        with self.assertNumQueries(counts['update']):
+            response = client.patch(created, update, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        with self.assertNumQueries(counts['destroy']):
+            self.assertEqual(client.delete(created).status_code, 204)
+
+    def test_customers(self):
+        create = {'email': 'new@example.com', 'name': 'New', 'password': 'new-pass'}
+        self.assertActions(self.customer, 'customers', self.customer.id, create, {'name': 'Renamed'},
+                           dict(list=1, retrieve=1, create=2, update=2, destroy=12), own=self.customer.id)
+
+    def test_customers_as_admin(self):
+        create = {'email': 'new@example.com', 'name': 'New', 'password': 'new-pass'}
+        self.assertActions(self.admin, 'customers', self.customer.id, create, {'name': 'Renamed'},
+                           dict(list=1, retrieve=1, create=2, update=2, destroy=12))
+
+    def test_banners(self):
+        for user in (self.customer, self.admin):
+            with self.subTest(user=user.email):
+                cache.clear()
+                self.assertActions(user, 'banners', self.banner.id, {'banner_name': 'Winter'}, {'banner_name': 'Spring'},
+                                   dict(list=1, retrieve=1, create=1, update=2, destroy=3))
+
+    def test_categories(self):
+        for user in (self.customer, self.admin):
+            with self.subTest(user=user.email):
+                cache.clear()
+                self.assertActions(user, 'categories', self.category.id, {'category_name': 'Theatre'}, {'category_name': 'Opera'},
+                                   dict(list=1, retrieve=1, create=1, update=2 + VECTORS, destroy=5 + VECTORS))
+
+    def test_events(self):
+        create = {'event_name': 'Gala', 'event_location': 'Hall', 'category': self.category.id, 'ticket_price': {'VIP': '3,000'}}
+        for user in (self.customer, self.admin):
+            with self.subTest(user=user.email):
+                cache.clear()
+                self.assertActions(user, 'events', self.event.id, create, {'event_name': 'Gala Night'},
+                                   dict(list=1, retrieve=1, create=2, update=2 + VECTORS, destroy=10))
+
+    def test_catalog_reads_are_cached(self):
+        client = self.client_for(None)
+        for url in ('/api/banners/', f'/api/events/{self.event.id}/'):
+            client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(client.get(url).status_code, 200)
+
+    def test_orders(self):
+        for user in (self.customer, self.admin):
+            with self.subTest(user=user.email):
+                self.assertActions(user, 'orders', self.order.id, {'event': self.event.id}, {'event': None},
+                                   dict(list=1, retrieve=1, create=3, update=3, destroy=7))
+
+    def test_tickets(self):
+        create = {'passport_name': 'B', 'facebook_name': 'b', 'event': self.event.id, 'order': self.order.id, 'selling_price': '2,000'}
+        for user in (self.customer, self.admin):
+            with self.subTest(user=user.email):
+                self.assertActions(user, 'tickets', self.ticket.id, create, {'passport_name': 'C'},
+                                   dict(list=1, retrieve=1, create=6, update=6, destroy=8))
+
+
+class CatalogCacheTests(APITestCase):
+    """Catalog responses are validated by ETag only, so a write in the same second as a response is never a 304."""
+
+    def setUp(self):
+        super().setUp()
+        self.event = Event.objects.create(event_name='Open Air', event_location='Park')
+
+    def test_write_changes_the_etag(self):
+        client = APIClient()
+        first = client.get('/api/events/')
+        self.assertNotIn('Last-Modified', first)
+        self.assertEqual(client.get('/api/events/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.event.event_name = 'Renamed'
+        self.event.save()
+        second = client.get('/api/events/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['results'][0]['event_name'], 'Renamed')
+
+    def test_if_modified_since_alone_is_never_a_304(self):
+        client = APIClient()
+        client.get('/api/events/')
+        response = client.get('/api/events/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_check_refuses_a_process_cache_with_several_workers(self):
+        self.assertEqual(checks.shared_version_cache(None), [])
+        with override_settings(WEB_CONCURRENCY=4):
+            self.assertEqual([error.id for error in checks.shared_version_cache(None)], ['ticketapp.E001'])
+
+
+class CursorPaginationTests(APITestCase):
+    """Keyset pages over a column with ties and NULLs: every row once, in the same order both ways."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        prices = ['200', '100', None, '100', '100', None, '300']
+        cls.events = [
+            Event.objects.create(event_name=f'Open Air {index}', event_location='Park', ticket_price=price)
+            for index, price in enumerate(prices)
+        ]
+        Event.objects.create(event_name='Jazz Night', event_location='Open Stage')
+
+    def walk(self, url):
+        """Ids of every page following next, then of every page going back with previous from the last one."""
+        client, forward, backward = APIClient(), [], []
+        pages = []
+        while url:
+            page = client.get(url).json()
+            pages.append([row['id'] for row in page['results']])
+            forward += pages[-1]
+            url, previous = page['next'], page['previous']
+        while previous:
+            page = client.get(previous).json()
+            backward = [row['id'] for row in page['results']] + backward
+            previous = page['previous']
+        self.assertEqual(backward, forward[:len(forward) - len(pages[-1])])
+        return forward
+
+    def expected(self, descending):
+        priced = sorted((event for event in self.events if event.min_price is not None), key=lambda event: (event.min_price, event.id))
+        unpriced = [event for event in self.events if event.min_price is None]
+        ids = [event.id for event in priced + unpriced]
+        return ids[::-1] if descending else ids
+
+    def test_ascending_with_ties_and_nulls(self):
+        self.assertEqual(self.walk('/api/events/?search=Air&page_size=2&ordering=min_price'), self.expected(False))
+
+    def test_descending_with_ties_and_nulls(self):
+        self.assertEqual(self.walk('/api/events/?search=Air&page_size=2&ordering=-min_price'), self.expected(True))
+
+    def test_search_rank(self):
+        # on SQLite a name match ranks above a location match, ties newest first
+        ids = self.walk('/api/events/?search=open&page_size=3')
+        jazz = Event.objects.get(event_name='Jazz Night').id
+        self.assertEqual(sorted(ids), sorted([event.id for event in self.events] + [jazz]))
+        if connection.vendor != 'postgresql':
+            self.assertEqual(ids, [event.id for event in reversed(self.events)] + [jazz])
+
+    def test_invalid_cursor(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/events/?ordering=min_price&cursor=garbage').status_code, 404)
+        cursor = base64.b64encode(b'p=cheap%7Cfirst').decode()
+        self.assertEqual(client.get(f'/api/events/?ordering=min_price&cursor={cursor}').status_code, 404)
+
+
+class EventSearchTests(TestCase):
+    """?search= matches every word in the name, location or category name, name matches first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        concerts = Category.objects.create(category_name='Concerts')
+        cls.tour = Event.objects.create(event_name='BLACKPINK World Tour', event_location='Yangon', category=concerts)
+        cls.stage = Event.objects.create(event_name='Jazz Night', event_location='Blackpool Stage', category=concerts)
+        cls.fair = Event.objects.create(event_name='Book Fair', event_location='Yangon')
+
+    def search(self, term):
+        return [(event.id, event.rank) for event in search_events(Event.objects.all(), term).order_by('-rank', '-id')]
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'PostgreSQL uses the full-text and trigram indexes')
+    def test_fallback(self):
+        self.assertEqual(self.search('black'), [(self.tour.id, 1.0), (self.stage.id, 0.5)])
+        self.assertEqual(self.search('concerts yangon'), [(self.tour.id, 0.5)])
+        self.assertEqual(self.search('fair "yangon"'), [(self.fair.id, 0.5)])
+        self.assertEqual(self.search('opera'), [])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'needs pg_trgm')
+    def test_typo(self):
+        self.assertEqual([pk for pk, _ in self.search('black')], [self.tour.id, self.stage.id])
+        self.assertEqual([pk for pk, _ in self.search('blakpink')], [self.tour.id])
+
+
+class FastReadTests(APITestCase):
+    """The .values() list path answers exactly what the ModelSerializer would, and ?fields= picks keys from it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(category_name='Concerts')
+        image = {'cover': 'images/0123456789abcdef0123-800x600.jpg', 'gallery': ['https://example.com/a.png']}
+        Event.objects.create(
+            event_name='Open Air', event_location='Park', category=category, event_image=image,
+            event_date=['2026-11-01', '2026-11-02'], sale_date='2026-10-01', ticket_price=[{'zone': 'VIP', 'price': '150,000'}],
+        )
+        Event.objects.create(event_name='Book Fair', event_location='Library')
+
+    def test_list_matches_the_model_serializer(self):
+        expected = json.loads(JSONRenderer().render(EventSerializer(Event.objects.order_by('-id'), many=True).data))
+        self.assertEqual(APIClient().get('/api/events/').json()['results'], expected)
+        self.assertIn('srcset', expected[1]['image_variants']['images/0123456789abcdef0123-800x600.jpg'])
+
+    def test_sparse_fields(self):
+        client = APIClient()
+        rows = client.get('/api/events/?fields=event_name, min_price').json()['results']
+        self.assertEqual(rows, [{'event_name': 'Book Fair', 'min_price': None}, {'event_name': 'Open Air', 'min_price': '150000.00'}])
+        event = Event.objects.get(event_name='Open Air')
+        self.assertEqual(client.get(f'/api/events/{event.id}/?fields=image_variants').json().keys(), {'image_variants'})
+
+    def test_unknown_field(self):
+        response = APIClient().get('/api/events/?fields=event_name,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': 'Unknown field(s): secret.'})
+
+
+class SalesSummaryTests(TestCase):
+    """EventSalesSummary follows ticket writes, also those made through instances loaded before another write."""
+
+    def setUp(self):
+        self.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        self.ticket = Ticket.objects.create(passport_name='A', facebook_name='a', event=self.event, selling_price='1,500')
+
+    def summary(self):
+        return {
+            row.status: (row.ticket_count, row.revenue)
+            for row in self.event.sales.all() if row.ticket_count
+        }
+
+    def test_saves_from_stale_instances(self):
+        first, second = Ticket.objects.get(pk=self.ticket.pk), Ticket.objects.get(pk=self.ticket.pk)
+        first.status = 'Paid'
+        first.save()
+        second.status = 'Cancelled'
+        second.save()
+        self.assertEqual(self.summary(), {'Cancelled': (1, Decimal('1500.00'))})
+
+    def test_delete_from_stale_instance(self):
+        stale = Ticket.objects.get(pk=self.ticket.pk)
+        self.ticket.status = 'Paid'
+        self.ticket.selling_price = '2,000'
+        self.ticket.save()
+        stale.delete()
+        self.assertEqual(self.summary(), {})
+
+
+class BulkTicketTests(APITestCase):
+    """A partial bulk create inserts only the tickets that got their seat."""
+
+    def setUp(self):
+        super().setUp()
+        self.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        zone = Zone.objects.create(event=self.event, name='VIP')
+        self.seats = [Seat.objects.create(event=self.event, zone=zone, row='A', number=str(number)) for number in (1, 2)]
+        Seat.objects.filter(pk=self.seats[1].pk).update(status=Seat.STATUS_SOLD)
+
+    def item(self, name, seat):
+        return {'passport_name': name, 'facebook_name': name, 'event': self.event.id, 'selling_price': '1,000', 'zone': 'VIP', 'row': 'A', 'seat': seat}
+
+    def test_partial_inserts_the_winners_only(self):
+        response = self.client_for(self.admin).post('/api/tickets/bulk/?partial=true', [self.item('A', '1'), self.item('B', '2')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.data['errors']), [1])
+        self.assertEqual(list(Ticket.objects.values_list('passport_name', flat=True)), ['A'])
+        self.assertEqual(Seat.objects.get(pk=self.seats[0].pk).ticket.passport_name, 'A')
+        self.assertEqual([(row.status, row.ticket_count) for row in self.event.sales.all() if row.ticket_count], [('Pending', 1)])
+
+    def test_conflict_rejects_the_batch(self):
+        response = self.client_for(self.admin).post('/api/tickets/bulk/', [self.item('A', '1'), self.item('B', '2')], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertEqual(Seat.objects.get(pk=self.seats[0].pk).status, Seat.STATUS_AVAILABLE)
+
+
+class OutboxTests(TestCase):
+    """send_queued_mail claims due mail in a short transaction and sends it outside of it."""
+
+    def setUp(self):
+        # the worker loop drops database connections between batches, which would end the test's transaction
+        patcher = mock.patch('ticketapp.management.commands.send_queued_mail.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sends_due_mail(self):
+        queue_mail('Hello', 'Body', 'noreply@example.com', ['customer@example.com'])
+        call_command('send_queued_mail', '--once', stdout=StringIO())
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello'])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.body), (OutboundEmail.STATUS_SENT, 1, ''))
+
+    def test_failed_send_is_retried_later(self):
+        queue_mail('Hello', 'Body', 'noreply@example.com', ['customer@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            call_command('send_queued_mail', '--once', stdout=StringIO())
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboundEmail.STATUS_PENDING, 1, 'refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertFalse(due_mail().exists())
+
+    def test_body_is_kept_for_retries_and_blanked_on_giving_up(self):
+        queue_mail('Hello', 'Code 123456', 'noreply@example.com', ['customer@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            for attempt in range(settings.EMAIL_OUTBOX_MAX_ATTEMPTS):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now())
+                dispatch_batch(mail.get_connection())
+                email = OutboundEmail.objects.get()
+                self.assertEqual(email.body, '' if attempt == settings.EMAIL_OUTBOX_MAX_ATTEMPTS - 1 else 'Code 123456')
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+
+    def test_failed_send_reopens_the_connection(self):
+        for subject in ('First', 'Second'):
+            queue_mail(subject, 'Body', 'noreply@example.com', ['customer@example.com'])
+        connection = mail.get_connection()
+        calls = []
+        connection.open = lambda: calls.append('open')
+        connection.close = lambda: calls.append('close')
+        with mock.patch.object(connection, 'send_messages', side_effect=[OSError('reset'), 1]):
+            self.assertEqual(dispatch_batch(connection), (1, 1))
+        self.assertEqual(calls, ['open', 'close', 'open'])
+
+    def test_claimed_mail_is_not_due(self):
+        queue_mail('Hello', 'Body', 'noreply@example.com', ['customer@example.com'])
+        self.assertEqual(len(claim_batch(10)), 1)
+        self.assertEqual(claim_batch(10), [])  # another dispatcher finds nothing while the first one sends
+
+
+class ThrottleTests(APITestCase):
+    """The auth and OTP endpoints answer 429 past their per-IP and per-email rates, before any query."""
+
+    RATES = {
+        'login_ip': '5/min', 'login_email': '3/min',
+        'otp_send_ip': '5/hour', 'otp_send_email': '2/hour',
+        'otp_verify_ip': '5/hour', 'otp_verify_email': '3/hour',
+    }
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, self.RATES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def assertThrottled(self, url, bodies, allowed):
+        """The first `allowed` bodies get through, the next one is refused without touching the database."""
+        for body in bodies[:allowed]:
+            self.assertNotEqual(self.client.post(url, body, format='json').status_code, 429)
+        with self.assertNumQueries(0):
+            response = self.client.post(url, bodies[allowed], format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_login_per_email(self):
+        body = {'email': self.customer.email, 'password': 'wrong-pass'}
+        self.assertThrottled('/api/auth/login/', [body] * 4, 3)
+
+    def test_login_per_ip(self):
+        bodies = [{'email': f'user{i}@example.com', 'password': 'wrong-pass'} for i in range(6)]
+        self.assertThrottled('/api/auth/login/', bodies, 5)
+
+    def test_login_throttle_ignores_email_case(self):
+        bodies = [{'email': email, 'password': 'wrong-pass'} for email in ('a@example.com', 'A@example.com', ' a@EXAMPLE.com', 'a@example.com')]
+        self.assertThrottled('/api/auth/login/', bodies, 3)
+
+    def test_otp_send_per_email(self):
+        body = {'email': self.customer.email}
+        self.assertThrottled('/api/auth/forgot-password/', [body] * 3, 2)
+
+    def test_otp_verify_per_email(self):
+        body = {'email': self.customer.email, 'otp_code': '000000', 'new_password': 'new-password'}
+        self.assertThrottled('/api/auth/reset-password/', [body] * 4, 3)
+
+    def test_otp_verify_per_ip(self):
+        bodies = [{'email': f'user{i}@example.com', 'otp_code': '000000'} for i in range(6)]
+        self.assertThrottled('/api/auth/verify-email/', bodies, 5)
+
+
+class AsyncURLConf:
+    """The API with the async views routed first, as ticketanywhere.asgi serves it."""
+    urlpatterns = [path('api/', include(urls.async_urlpatterns() + urls.urlpatterns))]
+
+
+class AsyncViewTests(APITestCase):
+    """The async catalog and auth views answer what the DRF views answer, cache, 304s and throttles included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = Event.objects.create(event_name='Open Air', event_location='Park')
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, ThrottleTests.RATES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def routes(self, method):
+        """(URLconf, request function) for the DRF views, then for the async views."""
+        return [
+            (settings.ROOT_URLCONF, sync_to_async(getattr(self.client, method))),
+            (AsyncURLConf, getattr(self.async_client, method)),
+        ]
+
+    async def both(self, method, url, data=None):
+        """(DRF response, async view response) to the same request, each from a cleared cache."""
+        responses = []
+        for urlconf, request in self.routes(method):
+            await cache.aclear()
+            with override_settings(ROOT_URLCONF=urlconf):
+                responses.append(await request(url, data, content_type='application/json') if data is not None else await request(url))
+        return responses
+
+    async def test_catalog(self):
+        for url in ('/api/events/', f'/api/events/{self.event.id}/', '/api/categories/', '/api/events/0/'):
+            expected, response = await self.both('get', url)
+            self.assertEqual(response.status_code, expected.status_code)
+            self.assertEqual(response.json(), expected.json())
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            first = await self.async_client.get('/api/events/')  # fills the cache from the DRF view
+            cached = await self.async_client.get('/api/events/')
+            not_modified = await self.async_client.get('/api/events/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual((cached.json(), cached['ETag']), (first.json(), first['ETag']))
+        self.assertEqual((not_modified.status_code, not_modified['ETag']), (304, first['ETag']))
+
+    async def test_login(self):
+        for password in ('customer-pass', 'wrong-pass', ''):
+            expected, response = await self.both('post', '/api/auth/login/', {'email': self.customer.email, 'password': password})
+            self.assertEqual(response.status_code, expected.status_code)
+            body, expected = response.json(), expected.json()
+            self.assertEqual(body.keys(), expected.keys())
+            self.assertEqual(body.get('user'), expected.get('user'))
+            self.assertEqual(body.get('error'), expected.get('error'))
+
+    async def test_throttled_login(self):
+        body = {'email': self.customer.email, 'password': 'wrong-pass'}
+        responses = []
+        for urlconf, post in self.routes('post'):
+            await cache.aclear()
+            with override_settings(ROOT_URLCONF=urlconf):
+                statuses = [(await post('/api/auth/login/', body, content_type='application/json')).status_code for _ in range(3)]
+                self.assertEqual(statuses, [401] * 3)
+                responses.append(await post('/api/auth/login/', body, content_type='application/json'))
+        expected, response = responses
+        self.assertEqual((response.status_code, response['Retry-After']), (429, expected['Retry-After']))
+        self.assertEqual(response.json(), expected.json())
+
+
+class OneTimePasswordTests(APITestCase):
+    """OTPs are stored hashed, expire after OTP_TTL_SECONDS and stop working after OTP_MAX_ATTEMPTS wrong guesses."""
+
+    def setUp(self):
+        super().setUp()
+        self.pending = Customer.objects.create_user('pending@example.com', 'pending-pass', name='Pending')
+
+    def test_code_is_stored_hashed(self):
+        code = self.pending.generate_otp('verification')
+        otp = OneTimePassword.objects.get(customer=self.pending)
+        self.assertRegex(code, r'^\d{6}$')
+        self.assertNotEqual(otp.code_hash, code)
+        self.assertEqual(otp.code_hash, OneTimePassword.objects.hash_code(self.pending.pk, 'verification', code))
+
+    def test_hash_is_bound_to_customer_and_purpose(self):
+        code = self.pending.generate_otp('verification')
+        self.assertFalse(self.pending.verify_otp(code, 'password_reset'))
+        self.assertTrue(self.pending.verify_otp(code, 'verification'))
+
+    def test_expired_code_is_refused(self):
+        code = self.pending.generate_otp('verification')
+        OneTimePassword.objects.filter(customer=self.pending).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(self.pending.verify_otp(code, 'verification'))
+
+    def test_code_stops_working_after_max_attempts(self):
+        code = self.pending.generate_otp('verification')
+        wrong = f'{(int(code) + 1) % 1000000:06d}'
+        for _ in range(settings.OTP_MAX_ATTEMPTS):
+            self.assertFalse(self.pending.verify_otp(wrong, 'verification'))
+        self.assertFalse(self.pending.verify_otp(code, 'verification'))
+        # a new code starts over
+        self.assertTrue(self.pending.verify_otp(self.pending.generate_otp('verification'), 'verification'))
+
+    def test_resend_replaces_the_code(self):
+        first = self.pending.generate_otp('verification')
+        second = self.pending.generate_otp('verification')
+        self.assertEqual(OneTimePassword.objects.filter(customer=self.pending).count(), 1)
+        if first != second:
+            self.assertFalse(self.pending.verify_otp(first, 'verification'))
+        self.assertTrue(self.pending.verify_otp(second, 'verification'))
+
+    def test_verify_email(self):
+        code = self.pending.generate_otp('verification')
+        response = self.client.post('/api/auth/verify-email/', {'email': self.pending.email, 'otp_code': code}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.pending.refresh_from_db()
+        self.assertTrue(self.pending.email_verified and self.pending.is_active)
+        self.assertFalse(OneTimePassword.objects.filter(customer=self.pending).exists())
+
+    def test_verify_email_with_expired_code(self):
+        code = self.pending.generate_otp('verification')
+        OneTimePassword.objects.update(expires_at=timezone.now())
+        response = self.client.post('/api/auth/verify-email/', {'email': self.pending.email, 'otp_code': code}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.pending.refresh_from_db()
+        self.assertFalse(self.pending.email_verified)
+
+    def test_purge_expired(self):
+        self.pending.generate_otp('verification')
+        self.customer.generate_otp('password_reset')
+        OneTimePassword.objects.filter(customer=self.pending).update(expires_at=timezone.now())
+        self.assertEqual(OneTimePassword.objects.purge_expired(), 1)
+        self.assertEqual(list(OneTimePassword.objects.values_list('customer', flat=True)), [self.customer.pk])
+
+
+class TokenRevocationTests(APITestCase):
+    """Access and refresh tokens carry token_version, a password reset bumps it and so revokes them."""
+
+    def assertRevoked(self, response):
+        # 403 rather than 401: SessionAuthentication is listed first and has no WWW-Authenticate challenge
+        self.assertEqual((response.status_code, response.data['code']), (403, 'token_not_valid'))
+
+    def reset_password(self, user, password):
+        self.assertEqual(self.client.post('/api/auth/forgot-password/', {'email': user.email}, format='json').status_code, 200)
+        code = re.search(r'\b(\d{6})\b', OutboundEmail.objects.latest('id').body).group(1)
+        body = {'email': user.email, 'otp_code': code, 'new_password': password}
+        self.assertEqual(self.client.post('/api/auth/reset-password/', body, format='json').status_code, 200)
+
+    def test_password_reset_revokes_tokens(self):
+        refresh = tokens_for(self.customer)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.assertEqual(client.get('/api/orders/').status_code, 200)
+
+        self.reset_password(self.customer, 'brand-new-pass')
+
+        self.assertRevoked(client.get('/api/orders/'))
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual((response.status_code, response.data['code']), (401, 'token_not_valid'))
+        # tokens issued after the reset work
+        self.customer.refresh_from_db()
+        self.assertEqual(self.client_for(self.customer).get('/api/orders/').status_code, 200)
+
+    def test_refresh_before_reset(self):
+        refresh = tokens_for(self.customer)
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_losing_staff_revokes_tokens(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get('/api/orders/export/').status_code, 200)
+        admin = Customer.objects.get(pk=self.admin.pk)
+        admin.is_staff = admin.is_superuser = False
+        admin.save()
+        self.assertRevoked(client.get('/api/orders/export/'))
+
+    def test_unrelated_change_keeps_tokens(self):
+        client = self.client_for(self.customer)
+        customer = Customer.objects.get(pk=self.customer.pk)  # loaded, so the save knows what changed
+        customer.name = 'Renamed'
+        customer.save()
+        self.assertEqual(client.get('/api/orders/').status_code, 200)
+
+
+class IdempotencyKeyTests(APITestCase):
+    """A checkout retried with the same Idempotency-Key gets the stored response back instead of a second order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = Event.objects.create(event_name='Open Air', event_location='Park')
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.customer)
+
+    def checkout(self, key, passport_name='A'):
+        body = {'event': self.event.id, 'tickets': [{'passport_name': passport_name, 'facebook_name': 'a'}]}
+        return self.client.post('/api/orders/checkout/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response(self):
+        first = self.checkout('key-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+        replay = self.checkout('key-1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), 1)
+
+    def test_reuse_with_another_body_is_refused(self):
+        self.assertEqual(self.checkout('key-1').status_code, 201)
+        self.assertEqual(self.checkout('key-1', passport_name='B').status_code, 422)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_keys_are_per_customer(self):
+        self.assertEqual(self.checkout('key-1').status_code, 201)
+        self.client = self.client_for(self.admin)
+        response = self.checkout('key-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_failed_checkout_releases_the_key(self):
+        body = {'event': self.event.id, 'tickets': [{'facebook_name': 'a'}]}
+        response = self.client.post('/api/orders/checkout/', body, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.checkout('key-1').status_code, 201)
+
+    def test_without_key_every_request_is_an_order(self):
+        self.checkout(None)
+        self.checkout(None)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class CheckoutMemberCodeTests(APITestCase):
+    """A checkout can't repeat a member_code within the order or reuse one already taken for the event."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        Ticket.objects.create(passport_name='A', facebook_name='a', event=cls.event, member_code='M-1')
+
+    def checkout(self, *codes):
+        tickets = [{'passport_name': 'B', 'facebook_name': 'b', 'member_code': code} for code in codes]
+        return self.client_for(self.customer).post('/api/orders/checkout/', {'event': self.event.id, 'tickets': tickets}, format='json')
+
+    def test_repeated_within_the_order(self):
+        response = self.checkout('M-2', 'M-2')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['tickets']), ['1'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_taken_for_the_event(self):
+        response = self.checkout('M-2', 'M-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['tickets']), ['1'])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+@FAST_HASHING
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs row level locking')
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+    """Two requests with the same key at once: the second waits for the first and replays its response."""
+
+    def test_concurrent_reuse(self):
+        cache.clear()
+        customer = Customer.objects.create_user('customer@example.com', 'customer-pass', name='Customer', is_active=True, email_verified=True)
+        event = Event.objects.create(event_name='Open Air', event_location='Park')
+        token = f'Bearer {tokens_for(customer).access_token}'
+        body = {'event': event.id, 'tickets': [{'passport_name': 'A', 'facebook_name': 'a'}]}
+        started, responses = threading.Barrier(2), []
+        real_seated_zones = views.seated_zones
+
+        def slow_seated_zones(tickets):
+            time.sleep(0.3)  # keep the first checkout's transaction open while the second one arrives
+            return real_seated_zones(tickets)
+
+        def checkout():
+            try:
+                started.wait()
+                client = APIClient()
+                responses.append(client.post('/api/orders/checkout/', body, format='json', HTTP_AUTHORIZATION=token, HTTP_IDEMPOTENCY_KEY='key-1'))
+            finally:
+                connection.close()
+
+        with mock.patch.object(views, 'seated_zones', slow_seated_zones):
+            threads = [threading.Thread(target=checkout) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(response.status_code for response in responses), [201, 201])
+        self.assertEqual(sorted(response.get('Idempotent-Replayed', '') for response in responses), ['', 'true'])
+        self.assertEqual(responses[0].json(), responses[1].json())
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@FAST_HASHING
+class SeatInventoryTests(TestCase):
+    """Holds, claims and releases only ever move a seat between states a buyer may take it from."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        cls.zone = Zone.objects.create(event=cls.event, name='VIP')
+        create_seats(cls.zone, ['A'], 3)
+        cls.first, cls.second = (
+            Customer.objects.create_user(f'{name}@example.com', 'customer-pass', name=name) for name in ('first', 'second')
+        )
+
+    def ticket(self, number, **fields):
+        return Ticket(passport_name='A', facebook_name='a', event=self.event, zone='VIP', row='A', seat=str(number), **fields)
+
+    def seat(self, number):
+        return Seat.objects.get(zone=self.zone, row='A', number=str(number))
+
+    def test_hold_past_availability_reports_what_is_left(self):
+        hold_seats(self.event, 'VIP', 2, self.first)
+        with self.assertRaisesMessage(SeatUnavailable, 'Only 1 seats left in VIP.'):
+            hold_seats(self.event, 'VIP', 2, self.second)
+        self.assertEqual(Seat.objects.filter(held_by=self.second).count(), 0)
+
+    def test_hold_blocks_others_until_it_expires(self):
+        held = hold_seats(self.event, 'VIP', 1, self.first)[0]
+        with self.assertRaises(SeatUnavailable):
+            claim_seat(self.ticket(held.number), self.second)
+        Seat.objects.filter(pk=held.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(claim_seat(self.ticket(held.number), self.second))
+        self.assertEqual(self.seat(held.number).status, Seat.STATUS_SOLD)
+
+    def test_holder_claims_their_own_hold(self):
+        held = hold_seats(self.event, 'VIP', 1, self.first)[0]
+        self.assertTrue(claim_seat(self.ticket(held.number), self.first))
+        self.assertIsNone(self.seat(held.number).held_by_id)
+
+    def test_double_claim_fails(self):
+        claim_seat(self.ticket(1))
+        with self.assertRaisesMessage(SeatUnavailable, 'Seat VIP A-1 is not available.'):
+            claim_seat(self.ticket(1))
+
+    def test_release_puts_the_seat_back_on_sale(self):
+        ticket = self.ticket(1)
+        ticket.save()
+        claim_seat(ticket)
+        self.assertEqual(self.seat(1).ticket_id, ticket.pk)
+        self.assertEqual(release_seat(ticket), 1)
+        seat = self.seat(1)
+        self.assertEqual((seat.status, seat.ticket_id), (Seat.STATUS_AVAILABLE, None))
+        self.assertTrue(claim_seat(self.ticket(1)))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs row level locking')
+class ConcurrentSeatHoldTests(TransactionTestCase):
+    """Two holds racing for the same seats: SKIP LOCKED gives each different seats, never one seat twice."""
+
+    def test_concurrent_holds(self):
+        event = Event.objects.create(event_name='Open Air', event_location='Park')
+        create_seats(Zone.objects.create(event=event, name='VIP'), ['A'], 3)
+        started, outcomes = threading.Barrier(2), []
+
+        def hold():
+            try:
+                started.wait()
+                outcomes.append(len(hold_seats(event, 'VIP', 2)))
+            except SeatUnavailable:
+                outcomes.append(0)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=hold) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), [0, 2])
+        self.assertEqual(Seat.objects.filter(status=Seat.STATUS_HELD).count(), 2)
+
+
+@override_settings(REPLICA_LAG_SECONDS=0)
+class ReplicaRouterTests(SimpleTestCase):
+    """Which alias ReplicaRouter picks, with a 'replica' alias mirroring default as DB_REPLICA_HOST configures it."""
+
+    def setUp(self):
+        replica = dict(settings.DATABASES['default'], TEST={'MIRROR': 'default'})
+        patcher = mock.patch.dict(settings.DATABASES, {REPLICA: replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        for model in (Category, Event):
+            get_version(model)  # a version missing from the cache is made on the spot and counts as a change
+
+    def test_catalog_reads_go_to_the_replica(self):
+        self.assertEqual(Event.objects.all().db, REPLICA)
+        self.assertEqual(Category.objects.all().db, REPLICA)
+
+    def test_writes_and_locks_stay_on_the_primary(self):
+        self.assertEqual(router.db_for_write(Event), 'default')
+        self.assertEqual(Event.objects.select_for_update().db, 'default')
+        self.assertEqual(Order.objects.all().db, 'default')
+
+    def test_recent_changes_are_read_from_the_primary(self):
+        bump_version(Event)
+        with override_settings(REPLICA_LAG_SECONDS=60):
+            self.assertEqual(Event.objects.all().db, 'default')
+        self.assertEqual(Category.objects.all().db, REPLICA)
+
+    def test_writing_requests_read_from_the_primary(self):
+        def view(request):
+            return HttpResponse(Event.objects.all().db)
+
+        middleware = primary_for_writes(view)
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get('/api/events/')).content, REPLICA.encode())
+        self.assertEqual(middleware(factory.post('/api/events/')).content, b'default')
+        self.assertEqual(Event.objects.all().db, REPLICA)
+
+
+class AllocationTests(TestCase):
+    """Ballot allocation: earliest priority date first, each ticket its first preference with room left."""
+
+    def setUp(self):
+        self.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        create_seats(Zone.objects.create(event=self.event, name='VIP'), ['A'], 1)
+        self.tickets = {
+            name: Ticket.objects.create(
+                passport_name=name, facebook_name=name, event=self.event, priority_date=priority,
+                fst_pt=preferences[0], snd_pt=preferences[1], trd_pt=preferences[2],
+            )
+            for name, priority, preferences in [
+                ('late', None, ('A', 'B', 'C')),  # no priority date: ranked last
+                ('third', '2026-01-03', ('A', 'B', 'C')),
+                ('second', '2026-01-02', ('A', 'B', 'C')),
+                ('first', '2026-01-01', ('A', 'B', 'C')),
+                ('vip', '2025-12-31', ('vip', 'A', None)),
+            ]
+        }
+
+    def zones(self):
+        return {ticket.passport_name: (ticket.zone, ticket.row, ticket.seat) for ticket in Ticket.objects.all()}
+
+    def test_overflow_into_later_preferences(self):
+        report = allocate(self.event, capacity={'A': 1, 'B': 1, 'C': 1})
+        self.assertEqual((report['allocated'], report['unallocated']), (4, 1))
+        self.assertEqual(report['by_preference'], {'fst_pt': 2, 'snd_pt': 1, 'trd_pt': 1})
+        self.assertEqual(self.zones(), {
+            'vip': ('VIP', 'A', '1'), 'first': ('A', None, None), 'second': ('B', None, None),
+            'third': ('C', None, None), 'late': (None, None, None),
+        })
+        seat = Seat.objects.get()
+        self.assertEqual((seat.status, seat.ticket_id), (Seat.STATUS_SOLD, self.tickets['vip'].id))
+
+    def test_capacity_counts_tickets_already_in_the_zone(self):
+        Ticket.objects.create(passport_name='earlier', facebook_name='e', event=self.event, zone='A')
+        allocate(self.event, capacity={'A': 1, 'B': 1, 'C': 1})
+        self.assertEqual(self.zones()['first'], ('B', None, None))
+
+    def test_dry_run_writes_nothing(self):
+        before = self.zones()
+        report = allocate(self.event, capacity={'A': 1, 'B': 1, 'C': 1}, dry_run=True)
+        self.assertEqual((report['allocated'], report['dry_run']), (4, True))
+        self.assertEqual(self.zones(), before)
+        self.assertEqual(Seat.objects.get().status, Seat.STATUS_AVAILABLE)
+
+
+class ExportTests(APITestCase):
+    """Exports filter whole days and write CSV cells that spreadsheet apps won't run as formulas."""
+
+    def export(self, url):
+        response = self.client_for(self.admin).get(url)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_orders_by_day(self):
+        times = ['2026-03-01 00:00', '2026-03-01 23:59:59.999999', '2026-03-02 00:00', '2026-02-28 23:59:59']
+        for moment in times:
+            order = Order.objects.create(customer=self.customer)
+            Order.objects.filter(pk=order.pk).update(order_time=timezone.make_aware(datetime.fromisoformat(moment)))
+        rows = self.export('/api/orders/export/?date_from=2026-03-01&date_to=2026-03-01')
+        self.assertEqual([row[1][:10] for row in rows[1:]], ['2026-03-01', '2026-03-01'])
+
+    def test_formulas_are_escaped(self):
+        event = Event.objects.create(event_name='Open Air', event_location='Park')
+        names = ['=HYPERLINK("http://evil")', '+1', '-2', '@SUM(A1)', '\tTab', '\rReturn', 'Plain', "'quoted"]
+        for index, name in enumerate(names):
+            Ticket.objects.create(passport_name=name, facebook_name='a', event=event, member_code=f'M{index}')
+        rows = self.export('/api/tickets/export/')
+        column = rows[0].index('passport_name')
+        self.assertEqual(
+            [row[column] for row in rows[1:]],
+            ["'=HYPERLINK(\"http://evil\")", "'+1", "'-2", "'@SUM(A1)", "'\tTab", "'\rReturn", 'Plain', "'quoted"],
+        )
+        self.assertEqual(rows[1][rows[0].index('event')], str(event.id))  # numbers are left alone
+
+    def test_escaped_export_imports_back(self):
+        event = Event.objects.create(event_name='Open Air', event_location='Park')
+        Ticket.objects.create(passport_name='-Dash', facebook_name='=fb', event=event, member_code='M1')
+        rows = self.export('/api/tickets/export/')
+        rows[1][rows[0].index('passport_name')] = "'-Dash Renamed"
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        report = import_tickets(io.BytesIO(buffer.getvalue().encode()), 'csv')
+        self.assertEqual((report['updated'], report['errors']), (1, {}))
+        ticket = Ticket.objects.get()
+        self.assertEqual((ticket.passport_name, ticket.facebook_name), ('-Dash Renamed', '=fb'))
+
+
+class TicketImportTests(TestCase):
+    """Rows matched on (event, member_code) update the ticket, blank cells leave its stored values alone."""
+
+    def setUp(self):
+        self.event = Event.objects.create(event_name='Open Air', event_location='Park')
+
+    def run_import(self, *lines):
+        text = 'event,member_code,passport_name,facebook_name,status,selling_price,zone,row,seat\n' + ''.join(f'{line}\n' for line in lines)
+        return import_tickets(io.BytesIO(text.encode()), 'csv')
+
+    def test_blank_cells_keep_stored_values(self):
+        Ticket.objects.create(passport_name='A', facebook_name='a', event=self.event, member_code='M1', status='Paid', selling_price='1,500', zone='VIP')
+        report = self.run_import(f'{self.event.id},M1,A Renamed,a,,,,,')
+        self.assertEqual((report['updated'], report['errors']), (1, {}))
+        ticket = Ticket.objects.get()
+        self.assertEqual(
+            (ticket.passport_name, ticket.status, ticket.selling_price, ticket.selling_price_amount, ticket.zone),
+            ('A Renamed', 'Paid', '1,500', Decimal('1500.00'), 'VIP'),
+        )
+        self.assertEqual(list(self.event.sales.values_list('status', 'ticket_count')), [('Paid', 1)])
+
+    def test_blank_cells_only_is_unchanged(self):
+        Ticket.objects.create(passport_name='A', facebook_name='a', event=self.event, member_code='M1', status='Paid')
+        self.assertEqual(self.run_import(f'{self.event.id},M1,A,a,,,,,')['unchanged'], 1)
+
+    def test_blank_cells_get_defaults_on_insert(self):
+        report = self.run_import(f'{self.event.id},M2,B,b,,,,,')
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(Ticket.objects.get().status, 'Pending')
+
+
+class SyncScopeTests(APITestCase):
+    """Orders and tickets that leave a customer's scope reach their /api/sync/ as deletions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = Customer.objects.create_user('other@example.com', 'other-pass', name='Other', is_active=True, email_verified=True)
+
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(customer=self.customer)
+        self.ticket = Ticket.objects.create(passport_name='A', facebook_name='a', order=self.order)
+        self.since = changes(self.customer, resources='orders,tickets')['since']
+
+    def deleted(self, user, since):
+        data = changes(user, since, resources='orders,tickets')
+        return data['orders']['deleted'], data['tickets']['deleted']
+
+    def test_ticket_moved_to_another_customers_order(self):
+        other_order = Order.objects.create(customer=self.other)
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        ticket.order = other_order
+        ticket.save()
+        self.assertEqual(self.deleted(self.customer, self.since), ([], [self.ticket.pk]))
+        self.assertEqual(self.deleted(self.admin, None), ([], []))  # staff still see it
+
+    def test_ticket_moved_between_own_orders(self):
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        ticket.order = Order.objects.create(customer=self.customer)
+        ticket.save()
+        self.assertEqual(self.deleted(self.customer, self.since), ([], []))
+
+    def test_ticket_moved_by_an_import(self):
+        event = Event.objects.create(event_name='Open Air', event_location='Park')
+        Ticket.objects.filter(pk=self.ticket.pk).update(event=event, member_code='M1')
+
+        def move_to(order):
+            text = f'event,member_code,order,passport_name,facebook_name\n{event.id},M1,{order.id},A,a\n'
+            self.assertEqual(import_tickets(io.BytesIO(text.encode()), 'csv')['updated'], 1)
+
+        move_to(Order.objects.create(customer=self.customer))
+        self.assertEqual(self.deleted(self.customer, self.since), ([], []))
+        move_to(Order.objects.create(customer=self.other))
+        self.assertEqual(self.deleted(self.customer, self.since), ([], [self.ticket.pk]))
+        self.assertEqual(self.deleted(self.admin, None), ([], []))
+
+    def test_order_given_to_another_customer(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.customer = self.other
+        order.save()
+        self.assertEqual(self.deleted(self.customer, self.since), ([self.order.pk], [self.ticket.pk]))
+        self.assertEqual(self.deleted(self.other, None), ([], []))
+
+    def test_order_saved_without_customer_change(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.event = Event.objects.create(event_name='Open Air', event_location='Park')
+        order.save()
+        self.assertEqual(self.deleted(self.customer, self.since), ([], []))
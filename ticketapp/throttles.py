@@ -0,0 +1,43 @@
+import hashlib
+from rest_framework.throttling import SimpleRateThrottle
+
+# Throttles for the unauthenticated auth endpoints. Rates live in
+# REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] and request history in the default
+# cache, so the limits hold across workers when that cache is shared (Redis).
+# DRF checks throttles before the view runs: a rejected request gets a 429
+# with Retry-After without any database query or password hashing.
+
+class IPThrottle(SimpleRateThrottle):
+    """Sliding window per client IP."""
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+class EmailThrottle(SimpleRateThrottle):
+    """Sliding window per email address in the request body, so one account can't be hammered from many IPs."""
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not email:
+            return None
+        ident = hashlib.sha256(str(email).strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+# POST /api/auth/login/ (password check)
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+# register, resend-otp, forgot-password (each sends an email)
+class OTPSendIPThrottle(IPThrottle):
+    scope = 'otp_send_ip'
+
+class OTPSendEmailThrottle(EmailThrottle):
+    scope = 'otp_send_email'
+
+# verify-email, reset-password (guessing a 6 digit code)
+class OTPVerifyIPThrottle(IPThrottle):
+    scope = 'otp_verify_ip'
+
+class OTPVerifyEmailThrottle(EmailThrottle):
+    scope = 'otp_verify_email'
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import BannerViewSet, CategoryViewSet, EventViewSet, CustomerViewSet, OrderViewSet, TicketViewSet, UserRegisterView, custom_login, VerifyEmailOTPView, ResendOTPView, ForgotPasswordView, ResetPasswordView
+from .views import BannerViewSet, CategoryViewSet, EventViewSet, CustomerViewSet, OrderViewSet, TicketViewSet, UserRegisterView, custom_login, VerifyEmailOTPView, ResendOTPView, ForgotPasswordView, ResetPasswordView, ImageUploadView, SyncView
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet, basename='customer')
@@ -20,4 +21,30 @@ urlpatterns = [
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/forgot-password/', ForgotPasswordView.as_view(), name='forgot_password'),
     path('auth/reset-password/', ResetPasswordView.as_view(), name='reset_password'),
-]
\ No newline at end of file
+    path('images/', ImageUploadView.as_view(), name='image_upload'),
+    path('sync/', SyncView.as_view(), name='sync'),
+]
+
+
+def async_urlpatterns():
+    """The same URLs served by the async views (ticketapp/async_views.py), to match before the DRF ones."""
+    from . import async_views
+    catalog = []
+    for prefix, basename, viewset in (('banners', 'banner', BannerViewSet), ('categories', 'category', CategoryViewSet), ('events', 'event', EventViewSet)):
+        # named like the router's routes, which is what the request metrics label them by
+        catalog += [
+            path(f'{prefix}/', async_views.catalog_view(viewset, {'get': 'list', 'post': 'create'}), name=f'{basename}-list'),
+            path(f'{prefix}/<pk>/', async_views.catalog_view(viewset, {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name=f'{basename}-detail'),
+        ]
+    return catalog + [
+        path('auth/register/', async_views.AsyncUserRegisterView.as_view()),
+        path('auth/verify-email/', async_views.AsyncVerifyEmailOTPView.as_view()),
+        path('auth/resend-otp/', async_views.AsyncResendOTPView.as_view()),
+        path('auth/login/', async_views.AsyncLoginView.as_view()),
+        path('auth/forgot-password/', async_views.AsyncForgotPasswordView.as_view()),
+        path('auth/reset-password/', async_views.AsyncResetPasswordView.as_view()),
+    ]
+
+if settings.ASYNC_VIEWS:
+    # ASGI mode
+    urlpatterns = async_urlpatterns() + urlpatterns
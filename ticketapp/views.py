@@ -1,13 +1,31 @@
 from rest_framework import viewsets, permissions, generics, status
 from django.contrib.auth import get_user_model
-from .models import Banner, Category, Event, Customer, Order, Ticket
-from .serializers import CustomerSerializer, BannerSerializer, CategorySerializer, EventSerializer,  OrderSerializer, TicketSerializer, OTPVerificationSerializer, ResendOTPSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
-from rest_framework.exceptions import PermissionDenied
-from django.core.mail import send_mail
+from .models import Banner, Category, Event, Customer, Order, Ticket, IdempotencyKey
+from .serializers import CustomerSerializer, BannerSerializer, CategorySerializer, EventSerializer,  OrderSerializer, TicketSerializer, OTPVerificationSerializer, ResendOTPSerializer, ForgotPasswordSerializer, ResetPasswordSerializer, SeatSerializer, HoldSeatsSerializer, BulkTicketStatusSerializer, EventSalesSummarySerializer, CheckoutSerializer, AllocateZonesSerializer, ImageUploadSerializer
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.filters import OrderingFilter
 from django.conf import settings
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes, action
+from django.db import transaction
+from decimal import Decimal
+import hashlib
+import json
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import customer_for, tokens_for
+from .outbox import queue_mail
+from .passwords import PasswordHashingBusy, check_password
+from .cache import CachedCatalogMixin
+from .readers import FastReadMixin
+from .exports import ExportNegotiation, export_response
+from .filters import EventFilter, TicketFilter
+from .sales import change_status
+from .allocation import AllocationConflict, AllocationError, allocate
+from .search import search_words
+from .throttles import LoginIPThrottle, LoginEmailThrottle, OTPSendIPThrottle, OTPSendEmailThrottle, OTPVerifyIPThrottle, OTPVerifyEmailThrottle
+from .inventory import SeatUnavailable, availability, hold_seats, claim_seat, link_seats, release_seat, seated_zones
+from .images import ImageError, ingest
+from .sync import SyncTokenExpired, changes
+from rest_framework.parsers import MultiPartParser
 
 Customer = get_user_model()
 
@@ -16,10 +34,11 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff or request.user.is_superuser:
             return True
-        if hasattr(obj, "customer"):  # For Order
-            return obj.customer == request.user
-        if hasattr(obj, "order"):  # For Ticket
-            return obj.order.customer == request.user
+        # compare FK ids so the check never loads the Customer row
+        if isinstance(obj, Order):
+            return obj.customer_id == request.user.id
+        if isinstance(obj, Ticket):
+            return obj.order is not None and obj.order.customer_id == request.user.id
         return False
 
 class CustomerViewSet(viewsets.ModelViewSet):
@@ -33,7 +52,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Customer.objects.filter(id=user.id)  # Customer sees only their own account
     def perform_update(self, serializer):
         user = self.request.user
-        if not (user.is_staff or user.is_superuser) and serializer.instance != user.id:
+        if not (user.is_staff or user.is_superuser) and serializer.instance.pk != user.id:
             raise PermissionDenied("You cannot update another user's profile!!!")
         serializer.save()
 
@@ -42,12 +61,13 @@ class UserRegisterView(generics.CreateAPIView):
     serializer_class = CustomerSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
     def create(self ,request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
         user = Customer.objects.get(email=request.data['email'])
         # generate and send otp
         otp_code = user.generate_otp('verification')
-        send_mail(
+        queue_mail(
             'Verify your email - OTP code',
             f'Your verification code is: {otp_code}\n\nDo not share this code with anyone.',
             settings.EMAIL_HOST_USER,
@@ -60,8 +80,9 @@ class UserRegisterView(generics.CreateAPIView):
 
 class VerifyEmailOTPView(generics.GenericAPIView):
     serializer_class = OTPVerificationSerializer
-    permission_class = [permissions.AllowAny]
-    authentication_class = []
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [OTPVerifyIPThrottle, OTPVerifyEmailThrottle]
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -78,7 +99,8 @@ class VerifyEmailOTPView(generics.GenericAPIView):
         if user.verify_otp(otp_code, 'verification'):
             user.email_verified = True
             user.is_active = True
-            user.clear_otp()
+            user.save(update_fields=['email_verified', 'is_active'])
+            user.clear_otp('verification')
             return Response({"message": "Email verified successfully. You can now login."}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Invalid or expired OTP code."}, status=status.HTTP_400_BAD_REQUEST)
@@ -87,6 +109,7 @@ class ResendOTPView(generics.GenericAPIView):
     serializer_class = ResendOTPSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -104,7 +127,7 @@ class ResendOTPView(generics.GenericAPIView):
         
         # Generate new OTP
         otp_code = user.generate_otp('verification')
-        send_mail(
+        queue_mail(
             'Verify Your Email - New OTP Code',
             f'Your new verification code is: {otp_code}\n\nThis code will expire in 10 minutes.\n\nDo not share this code with anyone.',
             settings.EMAIL_HOST_USER,
@@ -117,6 +140,7 @@ class ForgotPasswordView(generics.GenericAPIView):
     serializer_class = ForgotPasswordSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
+    throttle_classes = [OTPSendIPThrottle, OTPSendEmailThrottle]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -134,7 +158,7 @@ class ForgotPasswordView(generics.GenericAPIView):
         
         # Generate OTP for password reset
         otp_code = user.generate_otp('password_reset')
-        send_mail(
+        queue_mail(
             'Password Reset - OTP Code',
             f'Your password reset code is: {otp_code}\n\nThis code will expire in 10 minutes.\n\nIf you did not request this, please ignore this email.',
             settings.EMAIL_HOST_USER,
@@ -147,6 +171,7 @@ class ResetPasswordView(generics.GenericAPIView):
     serializer_class = ResetPasswordSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
+    throttle_classes = [OTPVerifyIPThrottle, OTPVerifyEmailThrottle]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -163,7 +188,8 @@ class ResetPasswordView(generics.GenericAPIView):
         
         if user.verify_otp(otp_code, 'password_reset'):
             user.set_password(new_password)
-            user.clear_otp()
+            user.save(update_fields=['password'])
+            user.clear_otp('password_reset')
             return Response({"message": "Password reset successful. You can now login with your new password."}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Invalid or expired OTP code."}, status=status.HTTP_400_BAD_REQUEST)
@@ -171,6 +197,8 @@ class ResetPasswordView(generics.GenericAPIView):
 # Custom login view that accepts email instead of username
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@authentication_classes([])
+@throttle_classes([LoginIPThrottle, LoginEmailThrottle])
 def custom_login(request):
     email = request.data.get('email')
     password = request.data.get('password')
@@ -182,15 +210,19 @@ def custom_login(request):
     except Customer.DoesNotExist:
         return Response({'error': 'Invalid credentials'}, status=401)
     
-    if not user.check_password(password):
-        return Response({'error': 'Invalid credentials'}, status=401)
+    # hashed on the bounded pool and rehashed in the background when the policy changed (ticketapp/passwords.py)
+    try:
+        if not check_password(user, password):
+            return Response({'error': 'Invalid credentials'}, status=401)
+    except PasswordHashingBusy:
+        return Response({'error': 'Too many logins right now, please try again.'}, status=503, headers={'Retry-After': '1'})
     
     # Check if email is verified (if you implement email verification)
     if hasattr(user, 'email_verified') and not user.email_verified:
         return Response({'error': 'Please verify your email first'}, status=403)
     
-    # Generate tokens
-    refresh = RefreshToken.for_user(user)
+    # Generate tokens, the user claims let later requests skip loading the user (ClaimsJWTAuthentication)
+    refresh = tokens_for(user)
 
     return Response({
         'access_token': str(refresh.access_token),
@@ -204,23 +236,97 @@ def custom_login(request):
         }
     })
 
-class BannerViewSet(viewsets.ModelViewSet):
+# Rows changed and deleted since the client's last sync, catalog for everyone, orders and tickets for their customer (ticketapp/sync.py)
+class SyncView(generics.GenericAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            data = changes(request.user, request.query_params.get('since'), request.query_params.get('resources'))
+        except SyncTokenExpired:
+            return Response({'error': 'Sync token expired, sync again without since.'}, status=status.HTTP_410_GONE)
+        return Response(data)
+
+# Admins upload banner, category and event images here and put the returned url in the JSON image field
+class ImageUploadView(generics.GenericAPIView):
+    serializer_class = ImageUploadSerializer
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            image = ingest(serializer.validated_data['image'].read())
+        except ImageError as exc:
+            raise ValidationError({'image': [str(exc)]})
+        return Response(image, status=status.HTTP_201_CREATED)
+
+class BannerViewSet(CachedCatalogMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Banner.objects.all()
     serializer_class = BannerSerializer
     permission_classes = [permissions.AllowAny]
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedCatalogMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(CachedCatalogMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all() 
     serializer_class = EventSerializer
     permission_classes = [permissions.AllowAny]
+    filter_backends = [EventFilter, OrderingFilter]
+    ordering_fields = ['id', 'start_date', 'sale_starts_on', 'min_price']
+
+    @property
+    def ordering(self):
+        # search results come best match first unless ?ordering= asks for something else
+        return ['-rank'] if search_words(self.request.query_params.get('search')) else ['-id']
+
+    # Ticket counts and revenue per status (admin only)
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def sales(self, request, pk=None):
+        event = self.get_object()
+        summaries = list(event.sales.order_by('status'))
+        return Response({
+            'event': event.id,
+            'statuses': EventSalesSummarySerializer(summaries, many=True).data,
+            'ticket_count': sum(summary.ticket_count for summary in summaries),
+            'revenue': str(sum((summary.revenue for summary in summaries), Decimal('0.00'))),
+        })
+
+    # Seats still on sale per zone
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        return Response(availability(self.get_object()))
+
+    # Hold seats for the current user until checkout (or until the hold expires)
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=HoldSeatsSerializer)
+    def hold(self, request, pk=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            seats = hold_seats(self.get_object(), serializer.validated_data['zone'], serializer.validated_data['quantity'], request.user)
+        except SeatUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(SeatSerializer(seats, many=True).data, status=status.HTTP_201_CREATED)
+
+    # Ballot allocation of zones to pending tickets by priority and preference (admin only), see ticketapp/allocation.py
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser], serializer_class=AllocateZonesSerializer)
+    def allocate(self, request, pk=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            report = allocate(self.get_object(), **serializer.validated_data)
+        except AllocationConflict as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except AllocationError as exc:
+            raise ValidationError({'capacity': str(exc)})
+        return Response(report)
 
 # Order : Only login customer or admin
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
@@ -228,18 +334,130 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff or user.is_superuser:
             return Order.objects.all() 
-        return Order.objects.filter(customer=user) 
+        return Order.objects.filter(customer_id=user.id) 
     def perform_create(self, serializer):
-        serializer.save(customer=self.request.user)
+        serializer.save(customer=customer_for(self.request.user))
+
+    # Streaming CSV/JSONL export of all orders (admin only), see ticketapp/exports.py
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], content_negotiation_class=ExportNegotiation)
+    def export(self, request):
+        return export_response(request, 'orders', self.get_queryset())
+
+    # Order and its tickets in one request and one transaction. With an Idempotency-Key header a retry
+    # (same key, same body) gets the stored response back instead of a second order.
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=CheckoutSerializer)
+    def checkout(self, request):
+        key = request.headers.get('Idempotency-Key')
+        if key is not None and not 0 < len(key) <= 255:
+            raise ValidationError({'Idempotency-Key': 'Must be 1 to 255 characters.'})
+        request_hash = hashlib.sha256(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+        with transaction.atomic():
+            if key:
+                stored = IdempotencyKey.objects.claim(request.user.id, key, request_hash)
+                if stored is not None:
+                    if stored.request_hash != request_hash:
+                        return Response({'error': 'Idempotency-Key was already used with a different request.'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                    return Response(stored.response, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            order, tickets = serializer.save()
+            zones = seated_zones(tickets)
+            for index, ticket in enumerate(tickets):
+                if (ticket.event_id, ticket.zone) not in zones:
+                    continue
+                try:
+                    claim_seat(ticket, request.user)
+                except SeatUnavailable as exc:
+                    # raising rolls back the order, its tickets and the key
+                    raise ValidationError({'tickets': {index: {'seat': [str(exc)]}}})
+            data = serializer.data
+            if key:
+                IdempotencyKey.objects.filter(customer_id=request.user.id, key=key).update(order=order, response=data)
+        return Response(data, status=status.HTTP_201_CREATED)
 
 # Ticket : Only login customer or admin
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    filter_backends = [TicketFilter, OrderingFilter]
+    ordering_fields = ['id', 'paid_on', 'selling_price_amount']
+    ordering = ['-id']
     def get_queryset(self):
         user = self.request.user
         if user.is_staff or user.is_superuser:
             return Ticket.objects.all() 
-        return Ticket.objects.filter(order__customer=user)
+        # the order row is needed by IsOwnerOrAdmin, fetch it in the same query
+        return Ticket.objects.select_related('order').filter(order__customer_id=user.id)
+    # Tickets for events with a seat map must claim their seat, in the same transaction as the ticket write
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            self.claim(serializer.save())
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            ticket = serializer.save()
+            if {'event', 'zone', 'row', 'seat'} & serializer.validated_data.keys():
+                release_seat(ticket)
+                self.claim(ticket)
+    def claim(self, ticket):
+        try:
+            claim_seat(ticket, self.request.user)
+        except SeatUnavailable as exc:
+            raise ValidationError({'seat': str(exc)})
+
+    # Streaming CSV/JSONL export of all tickets (admin only), see ticketapp/exports.py
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], content_negotiation_class=ExportNegotiation)
+    def export(self, request):
+        return export_response(request, 'tickets', self.get_queryset())
+
+    # Bulk endpoints (admin only). ?partial=true writes the valid items and reports the rest,
+    # otherwise any error rejects the whole batch.
+    def bulk_options(self, request, items):
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'error': 'Expected a non-empty list.'})
+        if len(items) > settings.BULK_TICKET_MAX_BATCH:
+            raise ValidationError({'error': f'At most {settings.BULK_TICKET_MAX_BATCH} items per request.'})
+        return request.query_params.get('partial') in ('1', 'true', 'True')
+
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[permissions.IsAdminUser])
+    def bulk_create(self, request):
+        partial = self.bulk_options(request, request.data)
+        serializer = self.get_serializer(data=request.data, many=True)
+        valid, errors = serializer.validate_each()
+        if errors and not partial:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # seats are claimed first so only the tickets that got theirs are inserted
+            candidates = [(index, attrs, Ticket(**attrs)) for index, attrs in valid]
+            zones = seated_zones([ticket for _, _, ticket in candidates])
+            winners, seated = [], []
+            for index, attrs, ticket in candidates:
+                if (ticket.event_id, ticket.zone) in zones:
+                    try:
+                        claim_seat(ticket)
+                    except SeatUnavailable as exc:
+                        if not partial:
+                            transaction.set_rollback(True)
+                            return Response({'errors': {index: {'seat': [str(exc)]}}}, status=status.HTTP_400_BAD_REQUEST)
+                        errors[index] = {'seat': [str(exc)]}
+                        continue
+                    seated.append(len(winners))
+                winners.append(attrs)
+            created = serializer.create(winners)
+            link_seats([created[position] for position in seated])
+        return Response({'created': self.get_serializer(created, many=True).data, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status', permission_classes=[permissions.IsAdminUser])
+    def bulk_status(self, request):
+        serializer = BulkTicketStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['ids'])
+        partial = self.bulk_options(request, list(ids))
+        found = set(self.get_queryset().filter(id__in=ids).values_list('id', flat=True))
+        errors = {'ids': sorted(ids - found), 'error': 'Tickets not found.'} if ids - found else {}
+        if errors and not partial:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        # one UPDATE ... WHERE id IN (...) for the whole batch
+        updated = change_status(self.get_queryset().filter(id__in=found), serializer.validated_data['status'])
+        return Response({'updated': updated, 'errors': errors})
     